@@ -0,0 +1,246 @@
+import importlib.util
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import pandas as pd
+
+from ecr_writer import EcrTextWriter
+from esi_engine import ESI_TEXT_COLUMNS
+from excel_writer import ESI_EXCEL_LAYOUT, PF_EXCEL_LAYOUT, ExcelOutputWriter
+from pf_engine import PF_OUTPUT_COLUMNS
+
+# "eager" writes the .xlsx and .txt outputs while processing. "lazy" only
+# writes a canonical Parquet file next to where the .txt would be; the Excel
+# and text renditions are produced on first download and kept in
+# ARTIFACT_CACHE_DIR. Lazy mode needs pyarrow and falls back to eager without it.
+OUTPUT_ARTIFACT_MODE = os.environ.get("OUTPUT_ARTIFACT_MODE", "eager")
+
+ARTIFACT_CACHE_DIR = Path(os.environ.get("ARTIFACT_CACHE_DIR", "artifact_cache"))
+# Renditions are evicted least recently used first once the cache is larger
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("ARTIFACT_CACHE_MAX_BYTES", 1 << 30))
+
+# Excel layout and float_format of each scheme's output workbook
+EXCEL_OPTIONS = {
+    "pf": (PF_EXCEL_LAYOUT, None),
+    "esi": (ESI_EXCEL_LAYOUT, "%.0f"),
+}
+
+# Columns of each scheme's "#~#" text file
+TEXT_COLUMNS = {"pf": PF_OUTPUT_COLUMNS, "esi": ESI_TEXT_COLUMNS}
+
+
+def lazy_artifacts_enabled() -> bool:
+    return (
+        OUTPUT_ARTIFACT_MODE == "lazy"
+        and importlib.util.find_spec("pyarrow") is not None
+    )
+
+
+def canonical_path(text_path: Path) -> Path:
+    return Path(text_path).with_suffix(".parquet")
+
+
+class OutputWriter:
+    """Writes the outputs of one processed file a chunk of rows at a time.
+
+    Eager mode streams each chunk into the .xlsx and .txt outputs, lazy mode
+    into the canonical Parquet file. Nothing is created until the first
+    chunk, so a file that fails before producing any rows leaves no outputs;
+    ``abort`` removes the partial outputs of one that fails later.
+    """
+
+    def __init__(self, excel_path: Path, text_path: Path, scheme: str):
+        self.excel_path = Path(excel_path)
+        self.text_path = Path(text_path)
+        self.scheme = scheme
+        self.lazy = lazy_artifacts_enabled()
+        self._writers = None
+
+    def _open(self, columns) -> None:
+        if self.lazy:
+            self._writers = [_CanonicalWriter(canonical_path(self.text_path))]
+            return
+        layout, float_format = EXCEL_OPTIONS[self.scheme]
+        excel = ExcelOutputWriter(self.excel_path, columns, layout, float_format)
+        try:
+            text = EcrTextWriter(self.text_path, TEXT_COLUMNS[self.scheme])
+        except BaseException:
+            excel.abort()
+            raise
+        self._writers = [excel, text]
+
+    def write(self, output_df: pd.DataFrame) -> None:
+        if self._writers is None:
+            self._open(output_df.columns)
+        for writer in self._writers:
+            writer.write(output_df)
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """Returns the Excel write stats, or None in lazy mode."""
+        if self._writers is None:
+            raise ValueError("No output rows were written")
+        results = [writer.close() for writer in self._writers]
+        return None if self.lazy else results[0]
+
+    def abort(self) -> None:
+        for writer in self._writers or []:
+            writer.abort()
+        self._writers = None
+
+
+class _CanonicalWriter:
+    # Text columns are typed from the first chunk on, so a chunk whose names
+    # are all blank (read as float) still fits the file's schema. The ECR
+    # numbers are always integers, so only a text column can be all blank.
+    def __init__(self, path: Path):
+        self.path = path
+        self._writer = None
+
+    def write(self, output_df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        text = [
+            column
+            for column in output_df.columns
+            if output_df[column].dtype.kind not in "iufb" or output_df[column].isna().all()
+        ]
+        table = pa.Table.from_pandas(
+            output_df.astype({column: object for column in text}), preserve_index=False
+        )
+        if self._writer is None:
+            schema = pa.schema(
+                [
+                    field.with_type(pa.large_string()) if field.name in text else field
+                    for field in table.schema
+                ],
+                metadata=table.schema.metadata,
+            )
+            self._writer = pq.ParquetWriter(self.path, schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self.path.unlink(missing_ok=True)
+
+
+def write_outputs(
+    output_df: pd.DataFrame, excel_path: Path, text_path: Path, scheme: str
+) -> Optional[Dict[str, Any]]:
+    """Write the outputs of one processed file.
+
+    Returns the Excel write stats, or None in lazy mode where only the
+    canonical file is written. The record keeps the usual "excel,text"
+    paths either way; ``resolve_artifact`` finds or renders them.
+    """
+    writer = OutputWriter(excel_path, text_path, scheme)
+    try:
+        writer.write(output_df)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+def artifacts_available(excel_path: Path, text_path: Path) -> bool:
+    return (Path(excel_path).exists() and Path(text_path).exists()) or canonical_path(
+        text_path
+    ).exists()
+
+
+def read_canonical(text_path: Path, columns=None) -> pd.DataFrame:
+    return pd.read_parquet(canonical_path(text_path), columns=columns)
+
+
+def iter_canonical(text_path: Path) -> Iterator[pd.DataFrame]:
+    """The canonical file one row group (one chunk as processed) at a time."""
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(canonical_path(text_path))
+    for index in range(parquet.num_row_groups):
+        yield parquet.read_row_group(index).to_pandas()
+
+
+def _evict(keep: Path) -> None:
+    # Other workers render and evict in the same directory: a file can go
+    # between listing and stat, and partial renditions (".<uuid>.<ext>")
+    # are still being written
+    entries = []
+    for path in ARTIFACT_CACHE_DIR.rglob("*"):
+        if path == keep or path.name.startswith("."):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.is_file():
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    try:
+        total += keep.stat().st_size
+    except FileNotFoundError:
+        pass
+    for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= ARTIFACT_CACHE_MAX_BYTES:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def render_artifact(text_path: Path, kind: str, scheme: str, name: str) -> Path:
+    """Render the ``kind`` ("excel" or "text") rendition from the canonical file.
+
+    Renditions are cached under ARTIFACT_CACHE_DIR/<scheme>/ by output file
+    name; a hit refreshes the file's mtime, which is what eviction orders by.
+    The canonical file is streamed a row group at a time into the rendition,
+    which is written to a temporary name and moved into place, so a
+    concurrent download never sees a partial file.
+    """
+    cached = ARTIFACT_CACHE_DIR / scheme / name
+    if cached.exists():
+        os.utime(cached)
+        return cached
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    partial = cached.with_name(f".{uuid.uuid4()}{cached.suffix}")
+    writer = None
+    try:
+        for output_df in iter_canonical(text_path):
+            if writer is None:
+                if kind == "excel":
+                    layout, float_format = EXCEL_OPTIONS[scheme]
+                    writer = ExcelOutputWriter(partial, output_df.columns, layout, float_format)
+                else:
+                    writer = EcrTextWriter(partial, TEXT_COLUMNS[scheme])
+            writer.write(output_df)
+        writer.close()
+        os.replace(partial, cached)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    finally:
+        partial.unlink(missing_ok=True)
+    _evict(cached)
+    return cached
+
+
+def resolve_artifact(
+    excel_path: Path, text_path: Path, kind: str, scheme: str
+) -> Optional[Path]:
+    """Return a file holding the requested rendition, or None if there is none.
+
+    An eagerly written output is served as is; otherwise it is rendered from
+    the canonical file (see ``render_artifact``).
+    """
+    path = Path(excel_path if kind == "excel" else text_path)
+    if path.exists():
+        return path
+    if not canonical_path(text_path).exists():
+        return None
+    return render_artifact(text_path, kind, scheme, path.name)
@@ -0,0 +1,223 @@
+"""Compare the dashboard rollup reads with the per-count queries they replaced.
+
+Run from the backend directory:
+
+    python benchmarks/bench_dashboard.py --rows 100000 --rows 1000000
+
+For each ``--rows`` builds a throwaway SQLite database with that many
+records in each of processed_files_pf / processed_files_esi and rebuilds
+the dashboard rollups from them, then computes the /dashboard counts for an
+admin and for one user, with and without a year filter, both the old way
+(totals per status per table, two monthly group-bys, three remittance
+counts, two delay histograms over the raw tables) and with
+``dashboard_counts``. The results must be identical.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from sqlalchemy import Integer, case, create_engine, extract, func, text
+from sqlalchemy.orm import Session
+
+from dashboard_rollup import rebuild_dashboard_rollups
+from file_queries import created_in_period, dashboard_counts
+from models import Base, ProcessedFileESI, ProcessedFilePF
+
+
+def populate(engine, rows: int, users: int) -> None:
+    rng = np.random.default_rng(0)
+    first_day = date(2023, 1, 1)
+    with engine.begin() as connection:
+        for table in ("processed_files_pf", "processed_files_esi"):
+            for start in range(0, rows, 100_000):
+                size = min(100_000, rows - start)
+                offsets = rng.integers(0, 3 * 365, size)
+                seconds = rng.integers(0, 86_400, size)
+                statuses = rng.choice(["success", "error", "processing"], size, p=[0.85, 0.1, 0.05])
+                submitted = rng.random(size) < 0.6
+                delays = rng.integers(0, 30, size)
+                user_ids = rng.integers(1, users + 1, size)
+                batch = []
+                for i in range(size):
+                    created = first_day + timedelta(days=int(offsets[i]))
+                    second = int(seconds[i])
+                    remitted = created + timedelta(days=int(delays[i]))
+                    batch.append(
+                        {
+                            "user_id": int(user_ids[i]),
+                            "filename": f"branch{start + i}.xlsx",
+                            "status": str(statuses[i]),
+                            "upload_date": created.isoformat(),
+                            "created_at": f"{created} {second // 3600:02d}:"
+                            f"{second // 60 % 60:02d}:{second % 60:02d}",
+                            "remittance_submitted": int(submitted[i]),
+                            "remittance_date": f"{remitted} 12:00:00.000000"
+                            if submitted[i]
+                            else None,
+                        }
+                    )
+                connection.execute(
+                    text(
+                        f"INSERT INTO {table} (user_id, filename, status, upload_date, "
+                        "created_at, remittance_submitted, remittance_date) VALUES "
+                        "(:user_id, :filename, :status, :upload_date, :created_at, "
+                        ":remittance_submitted, :remittance_date)"
+                    ),
+                    batch,
+                )
+        connection.execute(text("ANALYZE"))
+
+
+def legacy_dashboard_counts(db: Session, user_id=None, year=None):
+    """The counts as /dashboard computed them before, one query each."""
+    pf_query = db.query(ProcessedFilePF)
+    esi_query = db.query(ProcessedFileESI)
+    if user_id is not None:
+        pf_query = pf_query.filter(ProcessedFilePF.user_id == user_id)
+        esi_query = esi_query.filter(ProcessedFileESI.user_id == user_id)
+    if year:
+        pf_query = pf_query.filter(created_in_period(ProcessedFilePF.created_at, year))
+        esi_query = esi_query.filter(created_in_period(ProcessedFileESI.created_at, year))
+
+    totals = {}
+    for scheme, model, query in (
+        ("pf", ProcessedFilePF, pf_query),
+        ("esi", ProcessedFileESI, esi_query),
+    ):
+        totals[scheme] = {
+            "total": query.count(),
+            "success": query.filter(model.status == "success").count(),
+            "error": query.filter(model.status == "error").count(),
+        }
+
+    monthly = defaultdict(
+        lambda: {
+            "pf_total": 0,
+            "pf_success": 0,
+            "pf_error": 0,
+            "esi_total": 0,
+            "esi_success": 0,
+            "esi_error": 0,
+            "remittance_submitted": 0,
+        }
+    )
+    for scheme, model in (("pf", ProcessedFilePF), ("esi", ProcessedFileESI)):
+        monthly_query = db.query(
+            extract("month", model.created_at).label("month"),
+            func.count().label("total"),
+            func.sum(case((model.status == "success", 1), else_=0)).label("success"),
+            func.sum(case((model.status == "error", 1), else_=0)).label("error"),
+            func.sum(case((model.remittance_submitted == True, 1), else_=0)).label(
+                "remittance"
+            ),
+        )
+        if user_id is not None:
+            monthly_query = monthly_query.filter(model.user_id == user_id)
+        for month in monthly_query.group_by("month").all():
+            monthly[month.month][f"{scheme}_total"] += month.total
+            monthly[month.month][f"{scheme}_success"] += month.success
+            monthly[month.month][f"{scheme}_error"] += month.error
+            if scheme == "pf":
+                monthly[month.month]["remittance_submitted"] += month.remittance
+
+    remittance_query = db.query(ProcessedFilePF)
+    if user_id is not None:
+        remittance_query = remittance_query.filter(ProcessedFilePF.user_id == user_id)
+    submitted = remittance_query.filter(ProcessedFilePF.remittance_submitted == True)
+    # The old endpoint ran this count twice, for total_submitted and pending
+    submitted.count()
+    # The old endpoint compared remittance_date <= created_at + timedelta(days=7),
+    # which SQLite evaluates as text against a number and never counts; the
+    # rollups count remittances within 7 days by julianday, as here
+    remittance = {
+        "submitted": submitted.count(),
+        "timely": remittance_query.filter(
+            ProcessedFilePF.remittance_submitted == True,
+            func.julianday(ProcessedFilePF.remittance_date)
+            <= func.julianday(ProcessedFilePF.created_at) + 7,
+        ).count(),
+    }
+
+    delays = []
+    for scheme, model in (("PF", ProcessedFilePF), ("ESI", ProcessedFileESI)):
+        delay_query = db.query(
+            func.cast(
+                func.julianday(model.remittance_date) - func.julianday(model.created_at),
+                Integer,
+            ).label("delay_days"),
+            func.count().label("count"),
+        ).filter(model.remittance_submitted == True, model.remittance_date.isnot(None))
+        if user_id is not None:
+            delay_query = delay_query.filter(model.user_id == user_id)
+        for d in delay_query.group_by("delay_days").all():
+            delays.append({"days": int(d.delay_days), "count": d.count, "type": scheme})
+
+    return {**totals, "monthly": monthly, "remittance": remittance, "delays": delays}
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def comparable(counts):
+    return {
+        **counts,
+        "monthly": {m: counts["monthly"][m] for m in range(1, 13)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, action="append")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows or [100_000]:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{Path(tmp) / 'dashboard.db'}")
+            Base.metadata.create_all(bind=engine)
+            populate(engine, rows, args.users)
+            with Session(engine) as db:
+                start = time.perf_counter()
+                rebuild_dashboard_rollups(db)
+                db.commit()
+                print(
+                    f"{rows} rows per table, rollups rebuilt in "
+                    f"{time.perf_counter() - start:.1f} s"
+                )
+                for label, user_id, year in (
+                    ("admin, all years", None, None),
+                    ("admin, 2024", None, 2024),
+                    ("one user, all years", 7, None),
+                    ("one user, 2024", 7, 2024),
+                ):
+                    expected, before = timed(
+                        lambda: legacy_dashboard_counts(db, user_id, year), args.repeat
+                    )
+                    counts, after = timed(
+                        lambda: dashboard_counts(db, user_id, year), args.repeat
+                    )
+                    if comparable(counts) != comparable(expected):
+                        raise SystemExit(f"{label}: rollup counts differ")
+                    print(
+                        f"  {label:<20} before {before * 1000:8.1f} ms  "
+                        f"after {after * 1000:8.1f} ms"
+                    )
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
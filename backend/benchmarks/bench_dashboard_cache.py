@@ -0,0 +1,166 @@
+"""Check the /dashboard response cache and time a hit against a miss.
+
+Run from the backend directory (exits with status 1 when a stale or missing
+response is served):
+
+    python benchmarks/bench_dashboard_cache.py --rows 100000
+
+Builds a throwaway SQLite database of ``--rows`` records per processed-file
+table and serves dashboards the way the endpoint does: a cache lookup, and
+on a miss the rollup counts and top users, stored for the next request. The
+cache runs on a LocalCacheBackend standing in for the shared Redis backend.
+Checks that a repeated request is a hit, that invalidating one user drops
+their dashboard and the admin's but not other users', that a response
+computed before an invalidation is never served after it, that committing
+a record invalidates its owner's dashboard while a rolled back one does
+not, that entries expire with the TTL, and that the hit/miss counters
+are kept in the backend rather than in the worker.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import dashboard_cache
+from bench_dashboard import populate, timed
+from dashboard_cache import (
+    LocalCacheBackend,
+    dashboard_cache_key,
+    dashboard_cache_stats,
+    get_cached_dashboard,
+    invalidate_dashboard,
+    maintain_dashboard_cache,
+    set_dashboard_cache_backend,
+    store_dashboard,
+)
+from dashboard_rollup import rebuild_dashboard_rollups
+from file_queries import dashboard_counts, top_users_by_files
+from models import Base, ProcessedFilePF
+from schemas import DashboardStats
+
+
+def compute(db: Session, owner_id, year) -> DashboardStats:
+    counts = dashboard_counts(db, owner_id, year)
+    user_activity = {}
+    if owner_id is None:
+        user_activity = {
+            "top_users": [
+                {"username": u.username, "pf_files": u.pf_files, "esi_files": u.esi_files}
+                for u in top_users_by_files(db, limit=5)
+            ]
+        }
+    totals = {k: counts["pf"][k] + counts["esi"][k] for k in ("total", "success", "error")}
+    return DashboardStats(
+        total_files=totals["total"],
+        success_files=totals["success"],
+        error_files=totals["error"],
+        recent_files=[],
+        monthly_stats={str(m): counts["monthly"][m] for m in range(1, 13)},
+        remittance_stats=counts["remittance"],
+        user_activity=user_activity,
+        remittance_delays=counts["delays"],
+    )
+
+
+def serve(db: Session, owner_id, year=None):
+    """A dashboard as the endpoint serves it, and whether it came from the cache."""
+    role = "admin" if owner_id is None else "user"
+    key = dashboard_cache_key(role, owner_id, year)
+    cached = get_cached_dashboard(key)
+    if cached is not None:
+        return cached, True
+    stats = compute(db, owner_id, year)
+    store_dashboard(key, stats)
+    return stats, False
+
+
+def expect(label: str, hit: bool, expected: bool) -> None:
+    if hit != expected:
+        raise SystemExit(f"{label}: expected a {'hit' if expected else 'miss'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    set_dashboard_cache_backend(LocalCacheBackend())
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'dashboard.db'}")
+        Base.metadata.create_all(bind=engine)
+        populate(engine, args.rows, args.users)
+        with Session(engine) as db:
+            rebuild_dashboard_rollups(db)
+            db.commit()
+
+            first, hit = serve(db, 7)
+            expect("first request", hit, False)
+            second, hit = serve(db, 7)
+            expect("repeated request", hit, True)
+            if second != first:
+                raise SystemExit("cached dashboard differs from the computed one")
+            serve(db, None)
+            serve(db, 8)
+
+            invalidate_dashboard(7)
+            expect("user after their invalidation", serve(db, 7)[1], False)
+            expect("admin after a user's invalidation", serve(db, None)[1], False)
+            expect("other user after a user's invalidation", serve(db, 8)[1], True)
+
+            # A request that read its key, then lost a race with a write
+            key = dashboard_cache_key("user", 7, 2024)
+            invalidate_dashboard(7)
+            store_dashboard(key, compute(db, 7, 2024))
+            expect("response computed before an invalidation", serve(db, 7, 2024)[1], False)
+
+            # Writes through a listened session factory, as the endpoints' are
+            factory = sessionmaker(bind=engine)
+            maintain_dashboard_cache(factory)
+            serve(db, 7)
+            serve(db, 8)
+            with factory() as writer:
+                writer.add(ProcessedFilePF(user_id=8, filename="x.xlsx", status="error"))
+                writer.flush()
+                writer.rollback()
+            expect("user after a rolled back write", serve(db, 8)[1], True)
+            with factory() as writer:
+                writer.add(ProcessedFilePF(user_id=7, filename="x.xlsx", status="error"))
+                writer.commit()
+            expect("user after a committed write", serve(db, 7)[1], False)
+            expect("other user after a committed write", serve(db, 8)[1], True)
+
+            ttl = dashboard_cache.DASHBOARD_CACHE_TTL_SECONDS
+            dashboard_cache.DASHBOARD_CACHE_TTL_SECONDS = 0.05
+            try:
+                serve(db, 9)
+                time.sleep(0.1)
+                expect("request after the TTL", serve(db, 9)[1], False)
+            finally:
+                dashboard_cache.DASHBOARD_CACHE_TTL_SECONDS = ttl
+            # Counters live in the backend, so workers sharing Redis report the same
+            stats = dashboard_cache_stats()
+            shared_hits = dashboard_cache.get_dashboard_cache_backend().get("dashboard:stats:hits")
+            if stats["hits"] != int(shared_hits):
+                raise SystemExit("cache stats are not read from the backend")
+            print(f"ok: {stats}")
+
+            for label, owner_id in (("admin", None), ("one user", 7)):
+                _, miss = timed(lambda: compute(db, owner_id, None), args.repeat)
+                serve(db, owner_id)
+                _, hit = timed(lambda: serve(db, owner_id), args.repeat)
+                print(
+                    f"  {label:<9} miss {miss * 1000:7.2f} ms  hit {hit * 1000:7.3f} ms"
+                )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Time the batch-level cross-file duplicate UAN check.
+
+Run from the backend directory:
+
+    python benchmarks/bench_duplicate_uans.py --uans 50000 200000 800000 --files 300
+
+The UANs are spread over ``--files`` workbooks with 1% of employees repeated
+in a second file; the time should grow linearly with the number of UANs.
+"digests" times the first pass over the UAN hashes the workers return,
+"exact" the second over the UANs whose hash is shared with another file.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from id_validation import (
+    find_cross_file_duplicates,
+    find_shared_digests,
+    hash_ids,
+    id_digests,
+)
+
+
+def batch_uans(total: int, files: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    uans = rng.choice(np.arange(100_000_000_000, 100_000_000_000 + 10 * total), total, replace=False)
+    uans = uans.astype(str)
+    repeated = rng.choice(total, total // 100, replace=False)
+    uans[repeated[: len(repeated) // 2]] = uans[repeated[len(repeated) // 2 :]]
+    file_of_row = rng.integers(0, files, total)
+    ids_by_file = {}
+    for file_number in range(files):
+        ids = uans[file_of_row == file_number].tolist()
+        ids_by_file[f"branch_{file_number}.xlsx"] = (ids, list(range(2, len(ids) + 2)))
+    return ids_by_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uans", type=int, nargs="+", default=[50_000, 200_000, 800_000])
+    parser.add_argument("--files", type=int, default=300)
+    args = parser.parse_args()
+
+    for total in args.uans:
+        ids_by_file = batch_uans(total, args.files)
+        digests = {file: id_digests(ids) for file, (ids, _) in ids_by_file.items()}
+        start = time.perf_counter()
+        shared = find_shared_digests(digests)
+        middle = time.perf_counter()
+        candidates = {}
+        for file, file_digests in shared.items():
+            ids, rows = ids_by_file[file]
+            hit = np.isin(hash_ids(ids), file_digests)
+            candidates[file] = (np.asarray(ids)[hit].tolist(), np.asarray(rows)[hit].tolist())
+        duplicates = find_cross_file_duplicates(candidates)
+        end = time.perf_counter()
+        print(
+            f"{total:>8} UANs in {args.files} files  digests {(middle - start) * 1000:8.1f} ms  "
+            f"exact {(end - middle) * 1000:8.1f} ms  {len(duplicates)} duplicated UANs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare cross-file questions on the Parquet ECR store with reopening the xlsx outputs.
+
+Run from the backend directory:
+
+    python benchmarks/bench_ecr_store.py --files 36 --rows 2000
+
+Writes one PF output per file spread over twelve months, both as an output
+workbook and as a store fragment, then answers "total EPF contribution for
+March" and "history of one UAN" both ways. The answers must agree.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+import ecr_store
+from bench_pf_engine import projected_pf_frame
+from ecr_store import commit_store_fragment, query_store, write_store_fragment
+from excel_writer import PF_EXCEL_LAYOUT, write_output_excel
+from pf_engine import build_pf_ecr
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=36)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ecr_store.ECR_STORE_DIR = str(Path(tmp) / "ecr_store")
+        workbooks = []
+        for record_id in range(1, args.files + 1):
+            upload_date = date(2025, (record_id - 1) % 12 + 1, 1)
+            projected = projected_pf_frame(args.rows, seed=record_id)
+            projected["UAN No"] = projected["UAN No"].fillna("100100000001")
+            output_df = build_pf_ecr(projected, wage_dates=upload_date)
+            path = Path(tmp) / f"out_{record_id}.xlsx"
+            write_output_excel(output_df, path, PF_EXCEL_LAYOUT)
+            workbooks.append((record_id, upload_date, path))
+            fragment = write_store_fragment(output_df, "pf", upload_date, path.stem)
+            commit_store_fragment(fragment, record_id)
+
+        def march_total_xlsx():
+            return sum(
+                int(pd.read_excel(path, usecols=["EPF CONTRI REMITTED"]).sum().iloc[0])
+                for _, upload_date, path in workbooks
+                if upload_date.month == 3
+            )
+
+        def march_total_store():
+            frame = query_store("pf", ["EPF CONTRI REMITTED"], year=2025, month=3)
+            return int(frame["EPF CONTRI REMITTED"].sum())
+
+        def uan_history_xlsx():
+            rows = []
+            for record_id, _, path in workbooks:
+                frame = pd.read_excel(path, dtype={"UAN No": str})
+                rows.extend([record_id] * int((frame["UAN No"] == "100100000001").sum()))
+            return sorted(rows)
+
+        def uan_history_store():
+            frame = query_store(
+                "pf", ["record_id"], where=ds.field("UAN No") == "100100000001"
+            )
+            return sorted(frame["record_id"].tolist())
+
+        for question, by_xlsx, by_store in (
+            ("EPF total for March", march_total_xlsx, march_total_store),
+            ("history of one UAN", uan_history_xlsx, uan_history_store),
+        ):
+            expected, xlsx_time = timed(by_xlsx)
+            answer, store_time = timed(by_store)
+            if answer != expected:
+                raise SystemExit(f"{question}: store {answer} != xlsx {expected}")
+            print(
+                f"{question:<22} xlsx {xlsx_time * 1000:9.1f} ms  "
+                f"store {store_time * 1000:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Compare ecr_writer.write_ecr_text with the row-wise "#~#" join it replaced.
+
+Run from the backend directory:
+
+    python benchmarks/bench_ecr_writer.py --rows 100000
+
+Before timing, both writers are run on PF and ESI outputs and on frames with
+blanks, floats, infinities and all-numeric columns; the files must be
+byte-for-byte identical. Peak memory is measured with tracemalloc.
+"""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from bench_pf_engine import projected_pf_frame
+from ecr_writer import write_ecr_text
+from esi_engine import build_esi_ecr
+from pf_engine import build_pf_ecr
+
+
+def legacy_write(output_df: pd.DataFrame, path: Path) -> None:
+    # The text output code previously inlined in each pipeline
+    output_lines = ["#~#".join(map(str, row)) for row in output_df.values.tolist()]
+    header_line = "#~#".join(output_df.columns)
+    output_lines.insert(0, header_line)
+    with open(path, "w") as f:
+        f.write("\n".join(output_lines))
+
+
+def sample_frames(rows: int) -> dict:
+    rng = np.random.default_rng(1)
+    projected = projected_pf_frame(rows)
+    pf = build_pf_ecr(projected, wage_dates=date(2025, 3, 1))
+    esi = build_esi_ecr(
+        projected.rename(columns={"UAN No": "ESI No", "Gross Wages": "ESI Gross", "LOP Days": "Worked Days"}),
+        wage_dates=date(2025, 3, 1),
+    )
+    floats = rng.normal(0, 1e6, rows)
+    floats[rng.random(rows) < 0.05] = np.nan
+    floats[:3] = [np.inf, -np.inf, 1e16]
+    odd = pd.DataFrame(
+        {
+            "Name": np.where(rng.random(rows) < 0.1, None, projected["Employee Name"]),
+            "Amount": floats,
+            "Flag": rng.random(rows) < 0.5,
+            "Count": rng.integers(-5, 5, rows),
+            "Big": rng.integers(np.iinfo(np.int64).min, np.iinfo(np.int64).max, rows),
+            "Unsigned": rng.integers(0, 2**64 - 1, rows, dtype=np.uint64),
+        }
+    )
+    odd.loc[:2, "Name"] = ["Śrīnivās", "José Müller", "ராமன்"]
+    odd.loc[:1, "Big"] = [np.iinfo(np.int64).min, np.iinfo(np.int64).max]
+    numeric = pd.DataFrame({"Count": rng.integers(0, 100, rows), "Amount": floats})
+    return {"pf": pf, "esi": esi, "mixed": odd, "numeric": numeric, "empty": pf.iloc[:0]}
+
+
+def best_time(writer, output_df: pd.DataFrame, path: Path, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        writer(output_df, path)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def peak_memory(writer, output_df: pd.DataFrame, path: Path) -> int:
+    # Traced separately: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    writer(output_df, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path, fast_path = Path(tmp) / "legacy.txt", Path(tmp) / "fast.txt"
+        for name, frame in sample_frames(5000).items():
+            legacy_write(frame, legacy_path)
+            write_ecr_text(frame, fast_path, chunk_size=1234)
+            if legacy_path.read_bytes() != fast_path.read_bytes():
+                raise SystemExit(f"Output differs for the {name} frame")
+
+        for rows in args.rows:
+            output_df = sample_frames(rows)["pf"]
+            for label, writer, path in (
+                ("legacy", legacy_write, legacy_path),
+                ("writer", write_ecr_text, fast_path),
+            ):
+                elapsed = best_time(writer, output_df, path, args.repeat)
+                peak = peak_memory(writer, output_df, path)
+                print(
+                    f"{rows:>8} rows  {label}  {elapsed * 1000:8.1f} ms  "
+                    f"peak {peak / 2**20:7.1f} MiB"
+                )
+            if legacy_path.read_bytes() != fast_path.read_bytes():
+                raise SystemExit(f"Output differs at {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare Excel engines on synthetic PF payroll workbooks.
+
+Run from the backend directory:
+
+    python benchmarks/bench_excel_engines.py --rows 1000 10000 40000
+
+Reports each engine's parse time and the growth in peak resident memory
+of a fresh process that streams the workbook chunk by chunk, which is what
+excel_reader.DEFAULT_EXCEL_ENGINES trades off: calamine is fastest but
+loads the whole sheet, openpyxl read-only keeps memory flat.
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from excel_reader import (
+    EXCEL_ENGINES,
+    PF_COLUMN_DTYPES,
+    PF_REQUIRED_COLUMNS,
+    excel_engine_candidates,
+    iter_excel_chunks,
+    read_required_columns,
+)
+
+
+def write_pf_workbook(path: Path, rows: int, extra_columns: int = 100, seed: int = 0):
+    """Write a payroll sheet with the PF columns buried among allowance columns."""
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(seed)
+    header = ["Sl No", "UAN No", "Employee Name", "Total Salary", "PF Gross", "LOP"]
+    header += [f"Allowance {i}" for i in range(extra_columns)]
+    uans = rng.integers(100_000_000_000, 999_999_999_999, rows)
+    gross = rng.uniform(8_000, 60_000, rows).round(2)
+    pf_gross = np.minimum(gross, rng.uniform(5_000, 40_000, rows)).round(2)
+    lop = rng.choice([0, 0, 0, 0.5, 1, 1.5, 2], rows)
+    extras = rng.uniform(0, 5_000, (rows, extra_columns)).round(2)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for i in range(rows):
+        sheet.append(
+            [i + 1, int(uans[i]), f"Employee {i}", gross[i], pf_gross[i], lop[i]]
+            + extras[i].tolist()
+        )
+    workbook.save(path)
+
+
+def time_call(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _high_water_mark() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("VmHWM not reported")
+
+
+def streamed_peak_bytes(path: Path, engine: str) -> int:
+    """Peak RSS growth while streaming ``path``; run in a fresh process (Linux)."""
+    import importlib
+
+    importlib.import_module(EXCEL_ENGINES[engine][1])
+    # Reset the high-water mark, which a spawned process inherits from its parent
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    before = _high_water_mark()
+    columns = [aliases[0] for aliases in PF_REQUIRED_COLUMNS.values()]
+    for _ in iter_excel_chunks(path, columns, engines=[engine]):
+        pass
+    return _high_water_mark() - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 40_000])
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'rows':>8} {'engine':>18} {'seconds':>9} {'peak MB':>8}")
+        context = multiprocessing.get_context("spawn")
+        for rows in args.rows:
+            path = Path(tmp) / f"pf_{rows}.xlsx"
+            write_pf_workbook(path, rows)
+            timings = {
+                "pd.read_excel": time_call(
+                    lambda: pd.read_excel(path, dtype={"UAN No": str}), args.repeat
+                )
+            }
+            peaks = {}
+            for engine in excel_engine_candidates(path, list(EXCEL_ENGINES)):
+                timings[engine] = time_call(
+                    lambda: read_required_columns(
+                        path, PF_REQUIRED_COLUMNS, PF_COLUMN_DTYPES, engines=[engine]
+                    ),
+                    args.repeat,
+                )
+                with context.Pool(1) as pool:
+                    peaks[engine] = pool.apply(streamed_peak_bytes, (path, engine))
+            for engine, seconds in sorted(timings.items(), key=lambda item: item[1]):
+                peak = f"{peaks[engine] / 2**20:8.1f}" if engine in peaks else f"{'':>8}"
+                print(f"{rows:>8} {engine:>18} {seconds:>9.3f} {peak}")
+
+if __name__ == "__main__":
+    main()
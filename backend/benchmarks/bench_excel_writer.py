@@ -0,0 +1,81 @@
+"""Compare the constant-memory xlsxwriter output with pandas/openpyxl to_excel.
+
+Run from the backend directory:
+
+    python benchmarks/bench_excel_writer.py --rows 10000 100000
+
+Both engines first write PF and ESI outputs (ESI with float_format="%.0f",
+plus a float column so the rounding is exercised); the workbooks must read
+back to the same frames. Then the write time and the peak traced memory of
+each engine are printed per file size.
+"""
+import argparse
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+import excel_writer
+from bench_pf_engine import projected_pf_frame
+from esi_engine import build_esi_ecr
+from excel_writer import ESI_EXCEL_LAYOUT, PF_EXCEL_LAYOUT, write_output_excel
+from pf_engine import build_pf_ecr
+
+
+def sample_outputs(rows: int) -> dict:
+    projected = projected_pf_frame(rows)
+    pf = build_pf_ecr(projected, wage_dates=date(2025, 3, 1))
+    esi = build_esi_ecr(
+        projected.rename(
+            columns={"UAN No": "ESI No", "Gross Wages": "ESI Gross", "LOP Days": "Worked Days"}
+        ),
+        wage_dates=date(2025, 3, 1),
+    )
+    return {"pf": (pf, PF_EXCEL_LAYOUT, None), "esi": (esi, ESI_EXCEL_LAYOUT, "%.0f")}
+
+
+def check_equivalence(tmp: Path) -> None:
+    outputs = sample_outputs(2000)
+    esi, layout, float_format = outputs["esi"]
+    esi = esi.assign(RATE=np.linspace(-2.5, 2.5, len(esi)), BLANK=np.nan)
+    esi.loc[:1, "RATE"] = [np.inf, -np.inf]
+    outputs["esi_floats"] = (esi, layout, float_format)
+    for name, (output_df, layout, float_format) in outputs.items():
+        frames = []
+        for engine in ("openpyxl", "xlsxwriter"):
+            path = tmp / f"{name}_{engine}.xlsx"
+            write_output_excel(output_df, path, layout, float_format, engine=engine)
+            frames.append(pd.read_excel(path, dtype={"UAN No": str, "ESI No": str}))
+        pd.testing.assert_frame_equal(*frames, obj=name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        check_equivalence(Path(tmp))
+        for rows in args.rows:
+            for scheme, (output_df, layout, float_format) in sample_outputs(rows).items():
+                for engine in ("openpyxl", "xlsxwriter"):
+                    path = Path(tmp) / f"{scheme}_{engine}.xlsx"
+                    excel_writer.EXCEL_WRITE_TRACE_MEMORY = False
+                    stats = write_output_excel(output_df, path, layout, float_format, engine=engine)
+                    excel_writer.EXCEL_WRITE_TRACE_MEMORY = True
+                    peak = write_output_excel(
+                        output_df, path, layout, float_format, engine=engine
+                    )["peak_memory_bytes"]
+                    print(
+                        f"{rows:>8} rows  {scheme:<3}  {engine:<10}  "
+                        f"{stats['seconds'] * 1000:9.0f} ms  peak {peak / 2**20:7.1f} MiB"
+                    )
+
+
+if __name__ == "__main__":
+    main()
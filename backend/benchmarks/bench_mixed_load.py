@@ -0,0 +1,112 @@
+"""Measure light-endpoint latency while a large PF folder job is running.
+
+Run from the backend directory:
+
+    python benchmarks/bench_mixed_load.py --files 8 --rows 5000
+
+Requests go through httpx's ASGI transport, i.e. on the same event loop as
+the app, so any handler that blocks the loop shows up as a latency spike on
+/users/me while /process_folder_pf is in flight.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx
+
+from bench_excel_engines import write_pf_workbook
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def probe(client, stop, latencies, interval=0.01):
+    # Latency is measured from when the request was due, so time spent waiting
+    # for a blocked event loop to schedule it is included.
+    due = time.perf_counter()
+    while not stop.is_set():
+        await client.get("/users/me")
+        latencies.append((time.perf_counter() - due) * 1000)
+        due = max(due + interval, time.perf_counter())
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+
+async def run(folder: Path, probes: int):
+    import models
+    import newmain
+    import utils
+
+    class BenchUser:
+        id = 1
+        username = "bench"
+        email = "bench@example.com"
+        full_name = "Bench"
+        role = models.Role.ADMIN
+        created_at = updated_at = newmain.datetime.now()
+
+    for dependency in (utils.get_current_user, utils.require_hr_or_admin):
+        newmain.app.dependency_overrides[dependency] = BenchUser
+
+    transport = httpx.ASGITransport(app=newmain.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        idle = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, idle))
+        await asyncio.sleep(probes * 0.012)
+        stop.set()
+        await task
+
+        busy = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, busy))
+        start = time.perf_counter()
+        response = await client.post(
+            "/process_folder_pf",
+            data={"folder_path": str(folder), "upload_date": "2025-03-01"},
+        )
+        job_seconds = time.perf_counter() - start
+        stop.set()
+        await task
+
+    print(f"folder job: HTTP {response.status_code} in {job_seconds:.1f}s")
+    print(f"{'phase':>6} {'n':>5} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for phase, samples in (("idle", idle), ("busy", busy)):
+        print(
+            f"{phase:>6} {len(samples):>5} {statistics.median(samples):>8.1f} "
+            f"{percentile(samples, 99):>8.1f} {max(samples):>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--probes", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app keeps its SQLite database and outputs relative to the cwd
+        os.chdir(tmp)
+        os.environ.setdefault("PARSE_CACHE_DIR", str(Path(tmp) / "parsed_cache"))
+        folder = Path(tmp) / "payroll"
+        folder.mkdir()
+        for i in range(args.files):
+            write_pf_workbook(folder / f"branch_{i}.xlsx", args.rows, seed=i)
+        asyncio.run(run(folder, args.probes))
+
+
+if __name__ == "__main__":
+    main()
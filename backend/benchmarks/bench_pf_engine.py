@@ -0,0 +1,113 @@
+"""Compare pf_engine.build_pf_ecr with the per-endpoint PF computation it replaced.
+
+Run from the backend directory:
+
+    python benchmarks/bench_pf_engine.py --rows 1000 10000 100000
+
+Both versions run on the same column-projected frame (as returned by
+read_required_columns_cached), and their outputs must be identical before the
+timings are printed.
+"""
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from pf_engine import build_pf_ecr
+
+
+def legacy_pf_ecr(df: pd.DataFrame, column_mapping: dict) -> pd.DataFrame:
+    # The computation previously inlined in each PF endpoint
+    uan_no = df[column_mapping["UAN No"]].astype(str).str.replace("-", "")
+    member_name = df[column_mapping["Employee Name"]]
+    gross_wages = df[column_mapping["Gross Wages"]].fillna(0).round().astype(int)
+    epf_wages = df[column_mapping["EPF Wages"]].fillna(0).round().astype(int)
+    lop_days_raw = df[column_mapping["LOP Days"]]
+
+    def custom_round(x):
+        if pd.isna(x):
+            return 0
+        decimal_part = x - int(x)
+        if decimal_part >= 0.5:
+            return math.ceil(x)
+        else:
+            return math.floor(x)
+
+    lop_days = lop_days_raw.apply(custom_round)
+    eps_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
+    edli_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
+    epf_contrib_remitted = (epf_wages * 0.12).round().astype(int)
+    eps_contrib_remitted = (eps_wages * 0.0833).round().astype(int)
+    epf_eps_diff_remitted = (epf_contrib_remitted - eps_contrib_remitted).astype(int)
+    return pd.DataFrame(
+        {
+            "UAN No": uan_no,
+            "MEMBER NAME": member_name,
+            "GROSS WAGES": gross_wages,
+            "EPF Wages": epf_wages,
+            "EPS Wages": eps_wages,
+            "EDLI WAGES": edli_wages,
+            "EPF CONTRI REMITTED": epf_contrib_remitted,
+            "EPS CONTRI REMITTED": eps_contrib_remitted,
+            "EPF EPS DIFF REMITTED": epf_eps_diff_remitted,
+            "NCP DAYS": lop_days,
+            "REFUND OF ADVANCES": 0,
+        }
+    )
+
+
+def projected_pf_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    uans = rng.integers(100_000_000_000, 999_999_999_999, rows).astype(str).astype(object)
+    gross = rng.uniform(8_000, 60_000, rows).round(2)
+    epf = np.minimum(gross, rng.uniform(-500, 40_000, rows)).round(2)
+    return pd.DataFrame(
+        {
+            "UAN No": np.where(rng.random(rows) < 0.02, np.nan, uans),
+            "Employee Name": [f"Employee {i}" for i in range(rows)],
+            "Gross Wages": gross,
+            "EPF Wages": np.where(rng.random(rows) < 0.05, np.nan, epf),
+            "LOP Days": np.where(
+                rng.random(rows) < 0.2, np.nan, rng.choice([0, 0.5, 1, 1.5, 2], rows)
+            ),
+        }
+    )
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        df = projected_pf_frame(rows)
+        column_mapping = {field: field for field in df.columns}
+        pd.testing.assert_frame_equal(
+            build_pf_ecr(df, column_mapping), legacy_pf_ecr(df, column_mapping)
+        )
+        legacy_time = best_of(lambda: legacy_pf_ecr(df, column_mapping), args.repeat)
+        engine_time = best_of(lambda: build_pf_ecr(df, column_mapping), args.repeat)
+        print(
+            f"{rows:>8} rows  legacy {legacy_time * 1000:8.2f} ms  "
+            f"engine {engine_time * 1000:7.2f} ms  x{legacy_time / engine_time:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Time rounding.round_half_up_days against the per-cell custom_round it replaced.
+
+Run from the backend directory:
+
+    python benchmarks/bench_rounding.py --rows 100000
+
+That both give the same result is tested in tests/test_rounding.py.
+"""
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from rounding import round_half_up_days
+
+
+def custom_round(x):
+    # The function previously defined inline in each pipeline
+    if pd.isna(x):
+        return 0
+    decimal_part = x - int(x)
+    if decimal_part >= 0.5:
+        return math.ceil(x)
+    else:
+        return math.floor(x)
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    for rows in args.rows:
+        # Realistic LOP column: mostly whole or half days, some blanks
+        series = pd.Series(
+            np.where(
+                rng.random(rows) < 0.2,
+                np.nan,
+                rng.choice([0, 0.5, 1, 1.5, 2, 2.4, 3.6], rows),
+            )
+        )
+        apply_time = best_of(lambda: series.apply(custom_round), args.repeat)
+        vector_time = best_of(lambda: round_half_up_days(series), args.repeat)
+        print(
+            f"{rows:>8} rows  apply {apply_time * 1000:8.2f} ms  "
+            f"vectorised {vector_time * 1000:7.2f} ms  "
+            f"x{apply_time / vector_time:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
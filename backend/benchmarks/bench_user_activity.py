@@ -0,0 +1,164 @@
+"""Check that the dashboard's top-users query is correct and scales linearly with file count.
+
+Run from the backend directory (exits with status 1 on a wrong count or
+a growth rate outside the allowed band):
+
+    python benchmarks/bench_user_activity.py --files 100000 --files 800000
+
+Grows one SQLite database through each ``--files`` count of records per
+processed-file table, spread over ``--users`` users, and times
+``top_users_by_files`` at each size: ``--warmup`` untimed runs, then the
+median of ``--repeat`` timed ones. Its counts must match the number of
+records inserted for every user. The log-log slope of runtime against file
+count, fitted over every size, must lie between ``--min-slope`` and
+``--max-slope``. The old query, which outer-joined users to both
+tables at once, is timed up to ``--legacy-max`` files to show its PF x ESI
+fan-out; its counts come out multiplied.
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import Session
+
+from file_queries import top_users_by_files
+from models import Base, ProcessedFileESI, ProcessedFilePF, UserModel
+
+
+def legacy_top_users(db: Session, limit: int = 5):
+    return (
+        db.query(
+            UserModel.username,
+            func.count(ProcessedFilePF.id).label("pf_files"),
+            func.count(ProcessedFileESI.id).label("esi_files"),
+        )
+        .outerjoin(ProcessedFilePF, UserModel.id == ProcessedFilePF.user_id)
+        .outerjoin(ProcessedFileESI, UserModel.id == ProcessedFileESI.user_id)
+        .group_by(UserModel.username)
+        .order_by(func.count(ProcessedFilePF.id).desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def add_users(engine, users: int) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO users (id, username, hashed_password, email, full_name, "
+                "role, disabled, updated_at) VALUES (:id, :username, 'x', :email, "
+                ":username, 'USER', 0, :updated_at)"
+            ),
+            [
+                {
+                    "id": user_id,
+                    "username": f"user{user_id:04d}",
+                    "email": f"user{user_id}@example.com",
+                    "updated_at": datetime(2025, 1, 1),
+                }
+                for user_id in range(1, users + 1)
+            ],
+        )
+
+
+def add_files(engine, rng, count: int, users: int, inserted: dict) -> None:
+    with engine.begin() as connection:
+        for scheme, table in (("pf", "processed_files_pf"), ("esi", "processed_files_esi")):
+            # Uneven activity: user n is picked in proportion to 1 / (n + 5)
+            weights = 1 / (np.arange(1, users + 1) + 5)
+            user_ids = rng.choice(np.arange(1, users + 1), count, p=weights / weights.sum())
+            inserted[scheme].update(user_ids.tolist())
+            connection.execute(
+                text(
+                    f"INSERT INTO {table} (user_id, status, created_at, "
+                    "remittance_submitted) VALUES (:user_id, 'success', "
+                    "'2025-03-01 10:00:00', 0)"
+                ),
+                [{"user_id": int(user_id)} for user_id in user_ids],
+            )
+
+
+def timed(fn, repeat: int, warmup: int = 0):
+    # Warm-up runs fill the page cache; the median ignores one-off stalls
+    for _ in range(warmup):
+        fn()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    return result, statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, action="append")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--legacy-max", type=int, default=25_000)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=7)
+    # Allowed log-log slope of runtime against file count; 1 is linear
+    parser.add_argument("--min-slope", type=float, default=0.0)
+    parser.add_argument("--max-slope", type=float, default=1.2)
+    args = parser.parse_args()
+    sizes = sorted(args.files or [25_000, 50_000, 100_000, 200_000, 400_000, 800_000])
+
+    rng = np.random.default_rng(0)
+    inserted = {"pf": Counter(), "esi": Counter()}
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'activity.db'}")
+        Base.metadata.create_all(bind=engine)
+        add_users(engine, args.users)
+        loaded = 0
+        for size in sizes:
+            add_files(engine, rng, size - loaded, args.users, inserted)
+            loaded = size
+            with engine.begin() as connection:
+                connection.execute(text("ANALYZE"))
+            with Session(engine) as db:
+                top, seconds = timed(lambda: top_users_by_files(db), args.repeat, args.warmup)
+                for row in top_users_by_files(db, limit=args.users):
+                    user_id = int(row.username[4:])
+                    expected = (inserted["pf"][user_id], inserted["esi"][user_id])
+                    if (row.pf_files, row.esi_files) != expected:
+                        raise SystemExit(
+                            f"{row.username}: counted {(row.pf_files, row.esi_files)}, "
+                            f"inserted {expected}"
+                        )
+                line = f"{size:>8} files/table  per-table counts {seconds * 1000:8.1f} ms"
+                if size <= args.legacy_max:
+                    legacy, legacy_seconds = timed(lambda: legacy_top_users(db), 1)
+                    line += (
+                        f"  old join {legacy_seconds * 1000:9.1f} ms "
+                        f"(top user counted {legacy[0].pf_files}, "
+                        f"has {top[0].pf_files})"
+                    )
+                print(line)
+            timings.append((size, seconds))
+        engine.dispose()
+
+    if len({size for size, _ in timings}) > 1:
+        # Least-squares fit over every size, so one noisy point cannot decide it
+        log_sizes = np.log([size for size, _ in timings])
+        log_seconds = np.log([seconds for _, seconds in timings])
+        slope = np.polyfit(log_sizes, log_seconds, 1)[0]
+        print(f"runtime ~ files^{slope:.2f}")
+        if not args.min_slope <= slope < args.max_slope:
+            raise SystemExit(
+                f"runtime grows as files^{slope:.2f}, outside "
+                f"[{args.min_slope}, {args.max_slope})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Fail if a consolidated ECR reports more NCP days than the month has.
+
+Run from the backend directory (exits with status 1 on a failure):
+
+    python benchmarks/check_consolidation_ncp_days.py
+
+Consolidates two PF outputs for March that share UANs. One UAN adds up to
+35 NCP days and must be capped at 31 and listed in the manifest; one adds
+up to exactly 31 and a third to 12, and both must pass through unchanged.
+"""
+import json
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+
+import artifacts
+from artifacts import write_outputs
+from ecr_consolidation import consolidate_pf_records
+from pf_engine import build_pf_ecr
+
+UPLOAD_DATE = date(2025, 3, 1)
+
+
+def pf_output(tmp: Path, name: str, lop_days: dict) -> SimpleNamespace:
+    fields = pd.DataFrame(
+        {
+            "UAN No": list(lop_days),
+            "Employee Name": [f"Member {uan[-2:]}" for uan in lop_days],
+            "Gross Wages": [20000] * len(lop_days),
+            "EPF Wages": [15000] * len(lop_days),
+            "LOP Days": list(lop_days.values()),
+        }
+    )
+    output_df = build_pf_ecr(fields, uan_no=fields["UAN No"], wage_dates=UPLOAD_DATE)
+    excel_path, text_path = tmp / f"{name}.xlsx", tmp / f"{name}.txt"
+    write_outputs(output_df, excel_path, text_path, "pf")
+    return SimpleNamespace(id=len(name), filename=f"{name}.xlsx", filepath=f"{excel_path},{text_path}")
+
+
+def main():
+    artifacts.OUTPUT_ARTIFACT_MODE = "eager"
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        records = [
+            pf_output(tmp, "branch_a", {"100100000001": 20, "100100000002": 16, "100100000003": 12}),
+            pf_output(tmp, "branch_b", {"100100000001": 15, "100100000002": 15}),
+        ]
+        result = consolidate_pf_records(records, UPLOAD_DATE, tmp, tmp)
+        lines = Path(result["output_files"][1]).read_text().split("\n")
+        header = lines[0].split("#~#")
+        ncp = {
+            row[0]: int(row[header.index("NCP DAYS")])
+            for row in (line.split("#~#") for line in lines[1:])
+        }
+        expected = {"100100000001": 31, "100100000002": 31, "100100000003": 12}
+        if ncp != expected:
+            raise SystemExit(f"NCP days {ncp}, expected {expected}")
+        with open(result["manifest_file"]) as f:
+            capped = json.load(f)["capped_ncp_days"]
+        if capped != [{"uan": "100100000001", "ncp_days": 35, "capped_to": 31}]:
+            raise SystemExit(f"manifest reports {capped}")
+        if result["capped_ncp_days"] != 1:
+            raise SystemExit(f"result reports {result['capped_ncp_days']} capped UANs")
+    print(f"ok: NCP days capped at 31 and reported: {capped}")
+
+
+if __name__ == "__main__":
+    main()
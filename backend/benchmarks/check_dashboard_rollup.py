@@ -0,0 +1,121 @@
+"""Fail if the incrementally maintained dashboard rollups drift from a rebuild.
+
+Run from the backend directory (exits with status 1 on a mismatch):
+
+    python benchmarks/check_dashboard_rollup.py --steps 300
+
+Applies random inserts, status changes, remittance submissions, deletions
+and rolled-back transactions to a throwaway SQLite database through a
+sessionmaker of its own (the rollups listen on every session), then
+compares the rollup tables with ``rebuild_dashboard_rollups``. Also reports what the maintenance adds to
+committing one processed-file record.
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from dashboard_rollup import ROLLUP_MODELS, rebuild_dashboard_rollups
+from models import Base, DashboardDelayRollup, DashboardRollup
+
+
+def snapshot(db):
+    return {
+        table.name: sorted(db.execute(select(table)).all())
+        for table in (DashboardRollup.__table__, DashboardDelayRollup.__table__)
+    }
+
+
+def new_record(rng: random.Random, model):
+    record = model(
+        user_id=rng.choice([1, 2, 3, None]),
+        filename=f"branch{rng.randrange(10**6)}.xlsx",
+        status=rng.choice(["success", "success", "error", "processing"]),
+        upload_date=date(2025, rng.randint(1, 12), 1),
+    )
+    # Most records keep the server default (now); the rest land in other months
+    if rng.random() < 0.7:
+        record.created_at = datetime(2024, 1, 1) + timedelta(
+            seconds=rng.randrange(2 * 365 * 86_400)
+        )
+    return record
+
+
+def mutate(db, rng: random.Random) -> None:
+    model = rng.choice(list(ROLLUP_MODELS.values()))
+    action = rng.random()
+    existing = db.query(model).all()
+    if action < 0.4 or not existing:
+        db.add_all(new_record(rng, model) for _ in range(rng.randint(1, 5)))
+    elif action < 0.6:
+        record = rng.choice(existing)
+        record.remittance_submitted = True
+        record.remittance_date = date(2024, 1, 1) + timedelta(days=rng.randrange(800))
+    elif action < 0.75:
+        rng.choice(existing).status = rng.choice(["success", "error"])
+    elif action < 0.85:
+        db.delete(rng.choice(existing))
+    elif action < 0.95:
+        # A column the rollups do not count
+        rng.choice(existing).message = "touched"
+    else:
+        rng.choice(existing).user_id = rng.choice([1, 2, 3, None])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'rollup.db'}")
+        Base.metadata.create_all(bind=engine)
+        plain = sessionmaker(
+            bind=engine, autocommit=False, autoflush=False, info={"dashboard_rollups": False}
+        )
+        maintained = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+        with maintained() as db:
+            for step in range(args.steps):
+                mutate(db, rng)
+                if rng.random() < 0.1:
+                    # Flushed, then rolled back: the rollup changes go with it
+                    db.flush()
+                    db.rollback()
+                else:
+                    db.commit()
+            maintained_counts = snapshot(db)
+            rebuild_dashboard_rollups(db)
+            rebuilt_counts = snapshot(db)
+            db.rollback()
+        if maintained_counts != rebuilt_counts:
+            raise SystemExit("maintained dashboard rollups differ from a rebuild")
+        print(
+            f"ok: {args.steps} steps, "
+            f"{len(rebuilt_counts['dashboard_rollups'])} rollup rows match a rebuild"
+        )
+
+        for label, factory in (("without rollups", plain), ("with rollups", maintained)):
+            model = ROLLUP_MODELS["pf"]
+            with factory() as db:
+                start = time.perf_counter()
+                for _ in range(200):
+                    db.add(new_record(rng, model))
+                    db.commit()
+                elapsed = time.perf_counter() - start
+            print(f"commit one record {label:<16} {elapsed / 200 * 1000:6.2f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
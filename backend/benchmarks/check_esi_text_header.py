@@ -0,0 +1,73 @@
+"""Fail if the ESI "#~#" text file carries more than the ESIC upload columns.
+
+Run from the backend directory (exits with status 1 on a failure):
+
+    python benchmarks/check_esi_text_header.py
+
+Converts a small ESI workbook in eager mode and renders it in lazy mode. The
+text file must keep the four columns the ESIC portal takes, while the Excel
+report also has the eligibility and contribution columns.
+"""
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+
+import artifacts
+import ecr_store
+import parse_cache
+from esi_engine import ESI_OUTPUT_COLUMNS
+from file_processing import convert_esi_workbook
+
+ESIC_HEADER = "ESI No#~#MEMBER NAME#~#ESI GROSS#~#WORKED DAYS"
+
+
+def check(label: str, excel_path: Path, text_path: Path) -> None:
+    lines = text_path.read_text().split("\n")
+    if lines[0] != ESIC_HEADER:
+        raise SystemExit(f"{label}: text header is {lines[0]!r}")
+    widths = {len(line.split("#~#")) for line in lines[1:]}
+    if widths != {4}:
+        raise SystemExit(f"{label}: text rows have {sorted(widths)} fields")
+    columns = list(pd.read_excel(excel_path).columns)
+    if columns != ESI_OUTPUT_COLUMNS:
+        raise SystemExit(f"{label}: Excel columns are {columns}")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        parse_cache.PARSE_CACHE_DIR = tmp / "parsed_cache"
+        ecr_store.ECR_STORE_DIR = ""
+        artifacts.ARTIFACT_CACHE_DIR = tmp / "artifact_cache"
+        workbook = tmp / "esi.xlsx"
+        pd.DataFrame(
+            {
+                "ESI N0": [str(2000000000 + n) for n in range(6)],
+                "Employee Name": [f"Emp {n}" for n in range(6)],
+                "ESI Gross": [15000, 18000, 21000, 25000, 9000, 12000],
+                "Worked days": [26, 26, 25, 30, 12, 26],
+            }
+        ).to_excel(workbook, index=False)
+
+        for mode in ("eager", "lazy"):
+            artifacts.OUTPUT_ARTIFACT_MODE = mode
+            output_dir = tmp / mode
+            output_dir.mkdir()
+            result = convert_esi_workbook(workbook, output_dir, output_dir, date(2025, 3, 1))
+            if result["status"] != "success":
+                raise SystemExit(f"{mode}: {result['message']}")
+            excel_path, text_path = map(Path, result["output_files"])
+            if mode == "lazy":
+                excel_path = artifacts.render_artifact(text_path, "excel", "esi", excel_path.name)
+                text_path = artifacts.render_artifact(text_path, "text", "esi", text_path.name)
+            check(mode, excel_path, text_path)
+    print(f"ok: ESI text header {ESIC_HEADER!r} in eager and lazy mode")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Fail if an incremental run reuses a record it should not, or loses entries.
+
+Run from the backend directory (exits with status 1 on a failure):
+
+    python benchmarks/check_folder_manifest.py
+
+A workbook recorded in the folder manifest may only be skipped for the user
+whose record produced it, and only while that record's outputs exist. Two
+runs over the same folder that save their manifests at the same time must
+both keep their entries.
+"""
+import sys
+import tempfile
+import threading
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import folder_manifest
+from folder_manifest import FolderManifest
+from models import Base, ProcessedFilePF
+
+UPLOAD_DATE = date(2025, 3, 1)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        folder_manifest.MANIFEST_DIR = tmp / "manifests"
+        folder = tmp / "in"
+        folder.mkdir()
+        workbooks = []
+        for n in range(40):
+            workbook = folder / f"branch{n}.xlsx"
+            workbook.write_bytes(f"workbook {n}".encode())
+            workbooks.append(workbook)
+        outputs = tmp / "out"
+        outputs.mkdir()
+
+        engine = create_engine(f"sqlite:///{tmp / 'manifest.db'}")
+        Base.metadata.create_all(bind=engine)
+        with Session(engine) as db:
+            records = []
+            for workbook in workbooks:
+                excel_path = outputs / f"{workbook.stem}.xlsx"
+                text_path = outputs / f"{workbook.stem}.txt"
+                excel_path.touch()
+                text_path.touch()
+                records.append(
+                    ProcessedFilePF(
+                        user_id=1,
+                        filename=workbook.name,
+                        filepath=f"{excel_path},{text_path}",
+                        status="success",
+                    )
+                )
+            db.add_all(records)
+            db.commit()
+
+            # Two runs over halves of the folder, saving at the same time
+            runs = [FolderManifest("pf", folder, UPLOAD_DATE) for _ in range(2)]
+            for half, manifest in enumerate(runs):
+                for workbook, record in list(zip(workbooks, records))[half::2]:
+                    manifest.mark_processed(workbook, record.id)
+            threads = [threading.Thread(target=manifest.save) for manifest in runs]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            saved = FolderManifest("pf", folder, UPLOAD_DATE).files
+            if len(saved) != len(workbooks):
+                raise SystemExit(f"concurrent saves kept {len(saved)} of {len(workbooks)} entries")
+
+            manifest = FolderManifest("pf", folder, UPLOAD_DATE)
+            changed, unchanged = manifest.split_unchanged(workbooks, db, ProcessedFilePF, 1)
+            if changed or len(unchanged) != len(workbooks):
+                raise SystemExit(f"owner: {len(changed)} workbooks not reused")
+            changed, unchanged = manifest.split_unchanged(workbooks, db, ProcessedFilePF, 2)
+            if unchanged:
+                raise SystemExit(f"another user reused {len(unchanged)} records")
+
+            (outputs / "branch0.xlsx").unlink()
+            changed, _ = manifest.split_unchanged(workbooks, db, ProcessedFilePF, 1)
+            if changed != [workbooks[0]]:
+                raise SystemExit(f"missing outputs: {[path.name for path in changed]} reprocessed")
+        engine.dispose()
+    print("ok: reuse limited to the owner's records with outputs; concurrent saves merged")
+
+
+if __name__ == "__main__":
+    main()
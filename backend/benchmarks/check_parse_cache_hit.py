@@ -0,0 +1,61 @@
+"""Fail if a parse cache hit loses the engine that read the workbook.
+
+Run from the backend directory (exits with status 1 on a failure):
+
+    python benchmarks/check_parse_cache_hit.py
+
+Converts the same PF workbook twice with Parquet cache entries and twice
+with pickle entries. Every run must report the engine that parsed the
+workbook in ``excel_engine``; ``parse_cache_hit`` must be false on the
+first run and true on the second.
+"""
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+
+import artifacts
+import ecr_store
+import parse_cache
+from file_processing import convert_pf_workbook
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        ecr_store.ECR_STORE_DIR = ""
+        artifacts.OUTPUT_ARTIFACT_MODE = "eager"
+        workbook = tmp / "branch.xlsx"
+        pd.DataFrame(
+            {
+                "UAN No": [str(100100000000 + n) for n in range(5)],
+                "Employee Name": [f"Member {n}" for n in range(5)],
+                "Total Salary": [20000] * 5,
+                "PF Gross": [15000] * 5,
+                "LOP": [0, 1, 0, 2, 0],
+            }
+        ).to_excel(workbook, index=False)
+
+        for entry_format, use_parquet in (("parquet", True), ("pickle", False)):
+            parse_cache._use_parquet = lambda: use_parquet
+            parse_cache.PARSE_CACHE_DIR = tmp / f"parsed_{entry_format}"
+            reported = []
+            for run in range(2):
+                output_dir = tmp / f"{entry_format}_{run}"
+                output_dir.mkdir()
+                result = convert_pf_workbook(workbook, output_dir, output_dir, date(2025, 3, 1))
+                if result["status"] != "success":
+                    raise SystemExit(f"{entry_format}: {result['message']}")
+                reported.append((result["excel_engine"], result["parse_cache_hit"]))
+            engine = reported[0][0]
+            if engine in (None, "cache") or reported != [(engine, False), (engine, True)]:
+                raise SystemExit(f"{entry_format}: runs reported {reported}")
+    print(f"ok: a cache hit reports excel_engine={engine!r} and parse_cache_hit=True")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Fail if rejects or cross-file duplicates name the wrong spreadsheet row.
+
+Run from the backend directory (exits with status 1 on a failure):
+
+    python benchmarks/check_source_rows.py
+
+Writes two PF workbooks with blank lines between their data rows and
+sharing two UANs, converts them twice (parsed, then from the parse cache)
+at a chunk size that splits them, and checks that the rejects CSV and the
+cross-file duplicate report carry the row numbers a user sees in Excel.
+On the second run the first workbook is passed as reused (its UAN index
+only) and a third, index-less file must be reported as not checked.
+"""
+import concurrent.futures
+import os
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Small chunks, so the blank lines fall inside and between chunks
+os.environ["EXCEL_CHUNK_SIZE"] = "2"
+
+import pandas as pd
+from openpyxl import Workbook
+
+import artifacts
+import ecr_store
+import parse_cache
+from file_processing import convert_pf_workbook, find_batch_duplicate_uans
+
+HEADER = ["UAN No", "Employee Name", "Gross Salary", "PF Gross", "LOP"]
+# Sheet row -> UAN; the rows in between are left blank
+BRANCH_A = {
+    2: "100100000001",
+    4: "12345",
+    5: "100100000002",
+    9: "ABC",
+    10: "100100000003",
+    14: "100100000004",
+}
+BRANCH_B = {3: "100100000003", 6: "100100000004", 7: "100100000009"}
+
+
+def write_workbook(path: Path, rows: dict) -> Path:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row, uan in rows.items():
+        for column, value in enumerate([uan, f"Member {row}", 20000, 15000, 0], start=1):
+            sheet.cell(row=row, column=column, value=value)
+    workbook.save(path)
+    return path
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        parse_cache.PARSE_CACHE_DIR = tmp / "parsed_cache"
+        ecr_store.ECR_STORE_DIR = ""
+        artifacts.OUTPUT_ARTIFACT_MODE = "eager"
+        branch_a = str(write_workbook(tmp / "branch_a.xlsx", BRANCH_A))
+        branch_b = str(write_workbook(tmp / "branch_b.xlsx", BRANCH_B))
+
+        expected_rejects = [4, 9]
+        expected_duplicates = [
+            {
+                "id": uan,
+                "occurrences": [{"file": branch_a, "row": row_a}, {"file": branch_b, "row": row_b}],
+            }
+            for uan, row_a, row_b in [("100100000003", 10, 3), ("100100000004", 14, 6)]
+        ]
+        executor = concurrent.futures.ThreadPoolExecutor(2)
+        for run in ("parsed", "cached"):
+            output_dir = tmp / run
+            output_dir.mkdir()
+            indexes, digests = {}, {}
+            for path in (branch_a, branch_b):
+                result = convert_pf_workbook(Path(path), output_dir, output_dir, date(2025, 3, 1))
+                if result["status"] != "success":
+                    raise SystemExit(f"{run}: {result['message']}")
+                indexes[path] = result["uan_index"]
+                digests[path] = result["uan_digests"]
+                if path == branch_a:
+                    rejects = pd.read_csv(result["rejects_file"])["ROW"].tolist()
+                    if rejects != expected_rejects:
+                        raise SystemExit(f"{run}: rejects at rows {rejects}, expected {expected_rejects}")
+            expected_skipped = []
+            if run == "cached":
+                # Reused from an earlier batch: no digests, only the index
+                del digests[branch_a]
+                indexes[str(tmp / "old.xlsx")] = str(tmp / "old_uans.npz")
+                expected_skipped = [str(tmp / "old.xlsx")]
+            duplicates, skipped = find_batch_duplicate_uans(indexes, executor.submit, digests)
+            if duplicates != expected_duplicates:
+                raise SystemExit(f"{run}: duplicates {duplicates}")
+            if skipped != expected_skipped:
+                raise SystemExit(f"{run}: duplicate check skipped {skipped}")
+        executor.shutdown()
+    print(f"ok: rejects at rows {expected_rejects}, duplicates at their sheet rows")
+
+
+if __name__ == "__main__":
+    main()
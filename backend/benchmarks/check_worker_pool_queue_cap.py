@@ -0,0 +1,86 @@
+"""Fail if the shared worker pool lets its queue of waiting tasks grow unbounded.
+
+Run from the backend directory (exits with status 1 on a failure):
+
+    python benchmarks/check_worker_pool_queue_cap.py
+
+Holds the only worker busy, then checks that a batch whose tasks would not
+fit in the per-user or global queue is refused with 429/503, that a
+submission past a batch's reservation is refused once the queue is full,
+and that the slots come back once the tasks have run.
+"""
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from worker_pool import PoolSaturatedError, SharedWorkerPool
+
+release = threading.Event()
+
+
+def wait(value: int) -> int:
+    release.wait(10)
+    return value
+
+
+def refused(open_or_submit, *args) -> int:
+    try:
+        open_or_submit(*args)
+    except PoolSaturatedError as e:
+        return e.status_code
+    return 0
+
+
+def main():
+    failures = []
+    pool = SharedWorkerPool(
+        "thread",
+        max_workers=1,
+        max_batches=8,
+        max_batches_per_user=8,
+        max_queued=6,
+        max_queued_per_user=4,
+    )
+    try:
+        if refused(pool.open_batch, 1, 5) != 429:
+            failures.append("a batch larger than the per-user queue was admitted")
+        first = pool.open_batch(1, 4)
+        if refused(pool.open_batch, 1, 1) != 429:
+            failures.append("a user's reserved slots were not counted")
+        if refused(pool.open_batch, 2, 3) != 503:
+            failures.append("the global queue cap was not enforced")
+        second = pool.open_batch(2, 2)
+
+        futures = [first.submit(wait, value) for value in range(4)]
+        stats = pool.stats()
+        if stats["running"] != 1 or stats["queued"] != 3:
+            failures.append(f"expected 1 running and 3 queued, got {stats}")
+        third = pool.open_batch(1, 1)
+        if refused(first.submit, wait, 4) != 429:
+            failures.append("a task past the batch's reservation was queued")
+
+        release.set()
+        futures += [second.submit(wait, 5), third.submit(wait, 6)]
+        results = sorted(future.result(timeout=10) for future in futures)
+        if results != [0, 1, 2, 3, 5, 6]:
+            failures.append(f"unexpected results {results}")
+        for batch in (first, second, third):
+            batch.close()
+        stats = pool.stats()
+        if stats["queued"] or stats["reserved"]:
+            failures.append(f"slots not released: {stats}")
+    finally:
+        release.set()
+        pool.shutdown()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("ok: queue capped per user and globally, slots released")
+
+
+if __name__ == "__main__":
+    main()
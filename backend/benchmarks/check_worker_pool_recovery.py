@@ -0,0 +1,66 @@
+"""Fail if the shared worker pool stays unusable after a worker process dies.
+
+Run from the backend directory (exits with status 1 on a failure):
+
+    python benchmarks/check_worker_pool_recovery.py
+
+Kills a pool process the way the OOM killer would, mid-batch. Only the
+workbooks that were running in the dead executor may fail; the rest of that
+batch, queued behind them, and a batch submitted afterwards must complete.
+"""
+import os
+import signal
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from worker_pool import SharedWorkerPool
+
+
+def square(value: int) -> int:
+    time.sleep(0.05)
+    return value * value
+
+
+def die() -> None:
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def main():
+    pool = SharedWorkerPool(kind="process", max_workers=2, max_batches=4)
+    try:
+        with pool.open_batch(user_id=1) as batch:
+            killed = batch.submit(die)
+            queued = [batch.submit(square, n) for n in range(6)]
+            try:
+                killed.result(timeout=30)
+            except BrokenProcessPool:
+                pass
+            else:
+                raise SystemExit("the killed worker's task did not fail")
+            outcomes = []
+            for future in queued:
+                try:
+                    outcomes.append(future.result(timeout=30))
+                except BrokenProcessPool:
+                    outcomes.append(None)
+        # At most the one task running beside the killed one goes down with it
+        lost = outcomes.count(None)
+        if lost > 1:
+            raise SystemExit(f"{lost} queued tasks failed with the dead worker")
+
+        with pool.open_batch(user_id=2) as batch:
+            futures = [batch.submit(square, n) for n in range(8)]
+            results = [future.result(timeout=30) for future in futures]
+        if results != [n * n for n in range(8)]:
+            raise SystemExit(f"batch after the crash returned {results}")
+        print(f"ok: {lost} in-flight task lost, later batch completed: {pool.stats()}")
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import importlib.util
+import logging
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import ProcessedFileESI, ProcessedFilePF, SessionLocal, UserModel
+from schemas import DashboardStats
+
+# /dashboard responses are cached per role, owner and year for
+# DASHBOARD_CACHE_TTL_SECONDS (0 turns the cache off), and dropped when a
+# commit writes a processed file or a user. DASHBOARD_CACHE_BACKEND "redis"
+# shares the cache between workers through DASHBOARD_CACHE_URL (needs the
+# redis package) and is the default when a URL is set; "local" keeps one
+# cache (and one set of hit/miss counters) per worker, which only suits a
+# single worker. A requested Redis that
+# cannot be used fails at startup rather than falling back to "local",
+# where workers would serve each other's stale dashboards.
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get("DASHBOARD_CACHE_TTL_SECONDS", 60))
+DASHBOARD_CACHE_URL = os.environ.get("DASHBOARD_CACHE_URL", "")
+DASHBOARD_CACHE_BACKEND = os.environ.get(
+    "DASHBOARD_CACHE_BACKEND", "redis" if DASHBOARD_CACHE_URL else "local"
+)
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "dashboard:"
+# Expired entries are only swept once the local cache holds this many
+_LOCAL_SWEEP_SIZE = 1024
+
+
+class LocalCacheBackend:
+    """In-process cache backend; also the stand-in for the shared one in checks.
+
+    A backend stores strings under string keys with an optional TTL in
+    seconds and has an atomic ``incr`` for counters that never expire.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= _LOCAL_SWEEP_SIZE:
+                self._entries = {
+                    k: entry
+                    for k, entry in self._entries.items()
+                    if entry[1] is None or entry[1] > now
+                }
+            self._entries[key] = (value, None if ttl is None else now + ttl)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value, _ = self._entries.get(key, ("0", None))
+            value = str(int(value) + 1)
+            self._entries[key] = (value, None)
+            return int(value)
+
+
+class RedisCacheBackend:
+    """Cache backend shared by every worker pointed at the same Redis."""
+
+    def __init__(self, url: str):
+        if not url:
+            raise RuntimeError("DASHBOARD_CACHE_BACKEND=redis needs DASHBOARD_CACHE_URL")
+        if importlib.util.find_spec("redis") is None:
+            raise RuntimeError("DASHBOARD_CACHE_BACKEND=redis needs the redis package")
+        import redis
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        try:
+            self._client.ping()
+        except redis.RedisError as e:
+            raise RuntimeError(f"Cannot reach the dashboard cache at {url}: {e}") from e
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self._client.set(key, value, ex=None if ttl is None else max(1, math.ceil(ttl)))
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+# Hit/miss counters live in the backend, so with Redis they cover every worker
+_COUNTERS = ("hits", "misses")
+
+
+def get_dashboard_cache_backend():
+    """The configured backend, connected on first use.
+
+    Raises RuntimeError when Redis was asked for but cannot be used; call it
+    at startup so that happens before the first request.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if DASHBOARD_CACHE_BACKEND == "redis":
+                _backend = RedisCacheBackend(DASHBOARD_CACHE_URL)
+            elif DASHBOARD_CACHE_BACKEND == "local":
+                _backend = LocalCacheBackend()
+            else:
+                raise ValueError(f"Unknown DASHBOARD_CACHE_BACKEND: {DASHBOARD_CACHE_BACKEND}")
+            logger.info("Dashboard cache backend: %s", type(_backend).__name__)
+        return _backend
+
+
+def set_dashboard_cache_backend(backend) -> None:
+    """Use ``backend`` from now on, e.g. a LocalCacheBackend standing in for Redis."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def dashboard_cache_enabled() -> bool:
+    return DASHBOARD_CACHE_TTL_SECONDS > 0
+
+
+def _scope(owner_id: Optional[int]) -> str:
+    # None is an admin's dashboard over every user's records
+    return "all" if owner_id is None else f"user:{owner_id}"
+
+
+def dashboard_cache_key(role: str, owner_id: Optional[int], year: Optional[int]) -> str:
+    """Cache key of a dashboard, tied to the current generation of its scope.
+
+    Read the key before computing the dashboard: an invalidation in the
+    meantime moves the scope to a new generation, so a response computed
+    from older data is stored under a key nothing reads any more.
+    """
+    scope = _scope(owner_id)
+    generation = get_dashboard_cache_backend().get(f"{_PREFIX}generation:{scope}") or "0"
+    return f"{_PREFIX}{role}:{scope}:{year or 'all'}:{generation}"
+
+
+def get_cached_dashboard(key: str) -> Optional[DashboardStats]:
+    if not dashboard_cache_enabled():
+        return None
+    backend = get_dashboard_cache_backend()
+    value = backend.get(key)
+    backend.incr(f"{_PREFIX}stats:{'hits' if value is not None else 'misses'}")
+    return None if value is None else DashboardStats.model_validate_json(value)
+
+
+def store_dashboard(key: str, stats: DashboardStats) -> None:
+    if dashboard_cache_enabled():
+        get_dashboard_cache_backend().set(
+            key, stats.model_dump_json(), DASHBOARD_CACHE_TTL_SECONDS
+        )
+
+
+def invalidate_dashboard(user_id: Optional[int]) -> None:
+    """Drop the cached dashboards that count records of ``user_id``.
+
+    That is the user's own dashboard and every admin dashboard.
+    """
+    backend = get_dashboard_cache_backend()
+    backend.incr(f"{_PREFIX}generation:all")
+    if user_id is not None:
+        backend.incr(f"{_PREFIX}generation:{_scope(user_id)}")
+
+
+# Records whose owner's dashboards a commit drops; a UserModel only changes
+# the admin dashboards (its "owner" is None)
+_INVALIDATING = (ProcessedFilePF, ProcessedFileESI, UserModel)
+_OWNERS = "dashboard_cache_owners"
+
+
+def _note_owners(session: Session, flush_context) -> None:
+    # new / dirty / deleted still show what this flush wrote here
+    owners = session.info.setdefault(_OWNERS, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, _INVALIDATING):
+            continue
+        if isinstance(obj, UserModel):
+            owners.add(None)
+            continue
+        owners.add(obj.user_id)
+        # A record moved to another user leaves the old owner's counts too
+        owners.update(inspect(obj).attrs.user_id.history.deleted)
+
+
+def _invalidate_committed(session: Session) -> None:
+    # After the commit, so a dashboard computed meanwhile from the old data
+    # is stored under a generation nothing reads any more
+    for owner in session.info.pop(_OWNERS, ()):
+        invalidate_dashboard(owner)
+
+
+def _forget_owners(session: Session) -> None:
+    session.info.pop(_OWNERS, None)
+
+
+def maintain_dashboard_cache(session_factory) -> None:
+    """Invalidate dashboards on commits of sessions from ``session_factory``.
+
+    Covers every ORM write of a processed file or user, whichever endpoint
+    or background job makes it. Bulk query.update()/delete() and raw SQL
+    skip the flush; invalidate those with ``invalidate_dashboard``.
+    """
+    if not event.contains(session_factory, "after_flush", _note_owners):
+        event.listen(session_factory, "after_flush", _note_owners)
+        event.listen(session_factory, "after_commit", _invalidate_committed)
+        event.listen(session_factory, "after_rollback", _forget_owners)
+
+
+def dashboard_cache_stats() -> dict:
+    """Hit and miss counts of every worker sharing the backend.
+
+    With the "local" backend that is this worker since it started.
+    """
+    backend = get_dashboard_cache_backend()
+    counters = {name: int(backend.get(f"{_PREFIX}stats:{name}") or 0) for name in _COUNTERS}
+    lookups = counters["hits"] + counters["misses"]
+    return {
+        **counters,
+        "hit_rate": counters["hits"] / lookups if lookups else None,
+        "backend": type(backend).__name__,
+        "ttl_seconds": DASHBOARD_CACHE_TTL_SECONDS,
+    }
+
+
+maintain_dashboard_cache(SessionLocal)
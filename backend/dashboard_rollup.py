@@ -0,0 +1,244 @@
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from sqlalchemy import (
+    Integer,
+    and_,
+    bindparam,
+    case,
+    delete,
+    event,
+    func,
+    inspect,
+    literal,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import (
+    Base,
+    DashboardDelayRollup,
+    DashboardRollup,
+    ProcessedFileESI,
+    ProcessedFilePF,
+    SessionLocal,
+    engine,
+)
+
+# The dashboard reads dashboard_rollups / dashboard_delay_rollups instead of
+# the processed-file tables. Every flush of any ORM session takes the old
+# counts of changed records out of the rollups before the flush writes them
+# and adds the new counts back after, in the same transaction. Sessions
+# created with info={"dashboard_rollups": False} are skipped. Bulk
+# query.update()/delete() bypass the flush and need a rebuild; so do rows
+# written with raw SQL.
+#
+# The upserts and the date arithmetic (strftime, julianday) are SQLite's;
+# on any other database the rollups refuse to run rather than miscount.
+ROLLUP_MODELS = {"pf": ProcessedFilePF, "esi": ProcessedFileESI}
+
+# Changing any other column leaves the rollups as they are
+_ROLLED_UP = ("user_id", "status", "created_at", "remittance_submitted", "remittance_date")
+
+_KEY = ("user_id", "scheme", "year", "month")
+_DELAY_KEY = ("user_id", "scheme", "delay_days")
+_COUNTS = ("total", "success", "error", "remittance_submitted", "timely")
+
+
+def _record_rows(model, scheme: str, by_id: bool):
+    # The rollup key and 0/1 flags of each record, or of the records in the
+    # "ids" parameter when by_id
+    submitted = model.remittance_submitted == True
+
+    def flag(*conditions):
+        return case((and_(*conditions), 1), else_=0)
+
+    rows = select(
+        func.coalesce(model.user_id, 0).label("user_id"),
+        literal(scheme).label("scheme"),
+        func.coalesce(func.cast(func.strftime("%Y", model.created_at), Integer), 0).label(
+            "year"
+        ),
+        func.coalesce(func.cast(func.strftime("%m", model.created_at), Integer), 0).label(
+            "month"
+        ),
+        flag(model.status == "success").label("success"),
+        flag(model.status == "error").label("error"),
+        flag(submitted).label("remittance_submitted"),
+        flag(
+            submitted,
+            func.julianday(model.remittance_date) <= func.julianday(model.created_at) + 7,
+        ).label("timely"),
+        case(
+            (
+                and_(
+                    submitted,
+                    model.remittance_date.isnot(None),
+                    model.created_at.isnot(None),
+                ),
+                func.cast(
+                    func.julianday(model.remittance_date)
+                    - func.julianday(model.created_at),
+                    Integer,
+                ),
+            ),
+            else_=None,
+        ).label("delay_days"),
+    )
+    if by_id:
+        rows = rows.where(model.id.in_(bindparam("ids", expanding=True)))
+    return rows.subquery()
+
+
+@lru_cache(maxsize=None)
+def _upserts(scheme: str, by_id: bool, sign: int):
+    # Built once: constructing these per flush costs more than running them
+    rows = _record_rows(ROLLUP_MODELS[scheme], scheme, by_id)
+    key = [rows.c[name] for name in _KEY]
+    counts = select(
+        *key,
+        func.count().label("total"),
+        *(func.sum(rows.c[name]).label(name) for name in _COUNTS[1:]),
+    ).group_by(*key)
+    delay_key = [rows.c.user_id, rows.c.scheme, rows.c.delay_days]
+    delays = (
+        select(*delay_key, func.count().label("count"))
+        .where(rows.c.delay_days.isnot(None))
+        .group_by(*delay_key)
+    )
+    statements = []
+    for table, grouped, names, summed in (
+        (DashboardRollup.__table__, counts, _KEY, _COUNTS),
+        (DashboardDelayRollup.__table__, delays, _DELAY_KEY, ("count",)),
+    ):
+        grouped = grouped.subquery()
+        upsert = insert(table).from_select(
+            [*names, *summed],
+            # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+            select(
+                *(grouped.c[name] for name in names),
+                *(grouped.c[name] * sign for name in summed),
+            ).where(grouped.c[summed[0]] > 0),
+        )
+        statements.append(
+            upsert.on_conflict_do_update(
+                index_elements=list(names),
+                set_={name: table.c[name] + upsert.excluded[name] for name in summed},
+            )
+        )
+    if sign < 0:
+        statements.append(
+            delete(DashboardRollup.__table__).where(DashboardRollup.total == 0)
+        )
+        statements.append(
+            delete(DashboardDelayRollup.__table__).where(DashboardDelayRollup.count == 0)
+        )
+    return statements
+
+
+def _apply(connection, scheme: str, ids: Optional[Sequence[int]], sign: int) -> None:
+    """Add (sign 1) or remove (sign -1) the counts of records ``ids`` of ``scheme``.
+
+    ``ids`` None applies every record of the table.
+    """
+    if connection.dialect.name != "sqlite":
+        raise NotImplementedError(
+            f"Dashboard rollups are only implemented for SQLite, not {connection.dialect.name}"
+        )
+    if ids is None:
+        for statement in _upserts(scheme, False, sign):
+            connection.execute(statement)
+        return
+    ids = list(ids)
+    # Stay well under SQLite's limit on bound parameters
+    for start in range(0, len(ids), 500):
+        for statement in _upserts(scheme, True, sign):
+            connection.execute(statement, {"ids": ids[start : start + 500]})
+
+
+def _changed_ids(session: Session, scheme: str):
+    model = ROLLUP_MODELS[scheme]
+    changed = [
+        obj.id
+        for obj in session.dirty
+        if isinstance(obj, model)
+        and obj.id is not None
+        and any(inspect(obj).attrs[name].history.has_changes() for name in _ROLLED_UP)
+    ]
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, model)]
+    return changed, deleted
+
+
+def _maintained(session: Session) -> bool:
+    return session.info.get("dashboard_rollups", True)
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    if not _maintained(session):
+        return
+    for scheme in ROLLUP_MODELS:
+        changed, deleted = _changed_ids(session, scheme)
+        if changed or deleted:
+            _apply(session.connection(), scheme, changed + deleted, -1)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    # new / dirty and the attribute history still show the pre-flush state here
+    if not _maintained(session):
+        return
+    for scheme, model in ROLLUP_MODELS.items():
+        changed, _ = _changed_ids(session, scheme)
+        added = [obj.id for obj in session.new if isinstance(obj, model)]
+        if changed or added:
+            _apply(session.connection(), scheme, changed + added, 1)
+
+
+def maintain_dashboard_rollups() -> None:
+    """Keep the rollups in step with the flushes of every ORM session.
+
+    Listening on the ``Session`` class rather than one sessionmaker covers
+    sessions from any factory, SessionLocal and ``Session(engine)`` alike.
+    """
+    if not event.contains(Session, "before_flush", _before_flush):
+        event.listen(Session, "before_flush", _before_flush)
+        event.listen(Session, "after_flush", _after_flush)
+
+
+def rebuild_dashboard_rollups(db: Session) -> None:
+    """Recompute both rollup tables from the processed-file tables.
+
+    Runs in the session's transaction; the caller commits.
+    """
+    connection = db.connection()
+    connection.execute(delete(DashboardRollup.__table__))
+    connection.execute(delete(DashboardDelayRollup.__table__))
+    for scheme in ROLLUP_MODELS:
+        _apply(connection, scheme, None, 1)
+
+
+def backfill_dashboard_rollups(db: Session) -> bool:
+    """Build the rollups of a database that has records but no rollups yet."""
+    if db.query(DashboardRollup).first() is not None:
+        return False
+    if all(db.query(model.id).first() is None for model in ROLLUP_MODELS.values()):
+        return False
+    rebuild_dashboard_rollups(db)
+    db.commit()
+    return True
+
+
+maintain_dashboard_rollups()
+
+
+if __name__ == "__main__":
+    # Rebuild after bulk or raw SQL changes; run from the backend directory:
+    #   python dashboard_rollup.py
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[DashboardRollup.__table__, DashboardDelayRollup.__table__],
+    )
+    with SessionLocal() as db:
+        rebuild_dashboard_rollups(db)
+        db.commit()
+        print(f"rebuilt {db.query(DashboardRollup).count()} dashboard rollup rows")
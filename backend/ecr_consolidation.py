@@ -0,0 +1,146 @@
+import calendar
+import json
+import os
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+from artifacts import canonical_path, read_canonical, write_outputs
+from excel_reader import EXCEL_CHUNK_SIZE
+from pf_engine import build_pf_ecr
+
+# Partial aggregates are merged once this many rows are pending, so memory
+# follows the number of distinct UANs rather than the size of the batch.
+CONSOLIDATION_COMPACT_ROWS = int(os.environ.get("CONSOLIDATION_COMPACT_ROWS", 200_000))
+
+# ECR columns that add up across files; contributions are recomputed instead
+_SUMMED_COLUMNS = {
+    "GROSS WAGES": "Gross Wages",
+    "EPF Wages": "EPF Wages",
+    "NCP DAYS": "LOP Days",
+}
+
+
+def _iter_ecr_chunks(text_path: Path, chunk_size: int):
+    columns = ["UAN No", "MEMBER NAME", *_SUMMED_COLUMNS]
+    if not text_path.exists() and canonical_path(text_path).exists():
+        # Lazy mode output: the canonical file holds the same ECR columns
+        frame = read_canonical(text_path, columns=columns)
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start : start + chunk_size].copy()
+        return
+    yield from pd.read_csv(
+        text_path,
+        sep="#~#",
+        engine="python",
+        usecols=columns,
+        dtype={"UAN No": str, "MEMBER NAME": str},
+        keep_default_na=False,
+        chunksize=chunk_size,
+    )
+
+
+def _aggregate(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    combined = pd.concat(parts, ignore_index=True)
+    return combined.groupby("UAN No", sort=False).agg(
+        {"MEMBER NAME": "first", "rows": "sum", **{c: "sum" for c in _SUMMED_COLUMNS}}
+    ).reset_index()
+
+
+def consolidate_pf_records(
+    records: list,
+    upload_date: date,
+    excel_output_dir: Path,
+    text_output_dir: Path,
+    chunk_size: int = EXCEL_CHUNK_SIZE,
+) -> dict:
+    """Merge the ECR outputs of several ProcessedFilePF records into one ECR.
+
+    Each record's "#~#" text output (or its canonical file in lazy artifact
+    mode) is streamed in chunks and reduced by UAN
+    as it is read. An employee found in several files gets one line: wages
+    and NCP days are summed and the EPS/EDLI ceiling and contributions are
+    recomputed by the PF engine on the combined wages. Summed NCP days
+    cannot exceed the days in the month of ``upload_date``: they are capped
+    and the UANs reported. A JSON manifest listing the source records and
+    the capped UANs is written next to the text output.
+    """
+    aggregated = None
+    pending: List[pd.DataFrame] = []
+    pending_rows = 0
+    sources = []
+    for record in records:
+        text_path = Path(record.filepath.split(",")[1])
+        source_rows = 0
+        for chunk in _iter_ecr_chunks(text_path, chunk_size):
+            chunk["rows"] = 1
+            source_rows += len(chunk)
+            pending.append(_aggregate([chunk]))
+            pending_rows += len(pending[-1])
+            if pending_rows >= CONSOLIDATION_COMPACT_ROWS:
+                aggregated = _aggregate(([aggregated] if aggregated is not None else []) + pending)
+                pending, pending_rows = [], 0
+        sources.append(
+            {
+                "record_id": record.id,
+                "filename": record.filename,
+                "text_file": str(text_path),
+                "rows": source_rows,
+            }
+        )
+    if pending or aggregated is None:
+        parts = ([aggregated] if aggregated is not None else []) + pending
+        if not parts:
+            raise ValueError("No processed PF files to consolidate")
+        aggregated = _aggregate(parts)
+
+    # The same UAN in several files (a transfer between branches, or the
+    # same sheet twice) can add up to more NCP days than the month has
+    month_days = calendar.monthrange(upload_date.year, upload_date.month)[1]
+    over = aggregated["NCP DAYS"] > month_days
+    capped = [
+        {"uan": str(uan), "ncp_days": int(days), "capped_to": month_days}
+        for uan, days in zip(aggregated.loc[over, "UAN No"], aggregated.loc[over, "NCP DAYS"])
+    ]
+    aggregated["NCP DAYS"] = aggregated["NCP DAYS"].clip(upper=month_days)
+
+    fields = aggregated.rename(columns=_SUMMED_COLUMNS).rename(
+        columns={"MEMBER NAME": "Employee Name"}
+    )
+    output_df = build_pf_ecr(
+        fields,
+        uan_no=fields["UAN No"],
+        ncp_days=fields["LOP Days"].astype(int),
+        wage_dates=upload_date,
+    )
+
+    unique_id = uuid.uuid4()
+    stem = f"CONSOLIDATED_{upload_date.isoformat()}_{unique_id}"
+    excel_file_path = excel_output_dir / f"{stem}.xlsx"
+    text_file_path = text_output_dir / f"{stem}.txt"
+    manifest_path = text_output_dir / f"{stem}_manifest.json"
+    write_outputs(output_df, excel_file_path, text_file_path, "pf")
+
+    manifest = {
+        "upload_date": upload_date.isoformat(),
+        "created_at": datetime.now().isoformat(),
+        "excel_file": str(excel_file_path),
+        "text_file": str(text_file_path),
+        "employees": int(len(output_df)),
+        "merged_uans": int((aggregated["rows"] > 1).sum()),
+        "capped_ncp_days": capped,
+        "sources": sources,
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return {
+        "output_files": (str(excel_file_path), str(text_file_path)),
+        "manifest_file": str(manifest_path),
+        "employees": manifest["employees"],
+        "merged_uans": manifest["merged_uans"],
+        "capped_ncp_days": len(capped),
+        "sources": len(sources),
+    }
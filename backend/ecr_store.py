@@ -0,0 +1,192 @@
+import importlib.util
+import logging
+import os
+from datetime import date
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import pandas as pd
+
+from esi_engine import ESI_OUTPUT_COLUMNS
+from pf_engine import PF_OUTPUT_COLUMNS
+
+# Every successful PF/ESI output is also appended to a Parquet dataset laid
+# out as <scheme>/year=YYYY/month=M/record_id=N/<output stem>.parquet, so
+# cross-file questions read only the partitions they need. An empty
+# ECR_STORE_DIR turns the store off; it is also off without pyarrow.
+ECR_STORE_DIR = os.environ.get("ECR_STORE_DIR", "ecr_store")
+
+# Fragments written by workers before their record has an id. pyarrow skips
+# paths starting with "_" when discovering the dataset.
+_PENDING = "_pending"
+
+logger = logging.getLogger(__name__)
+
+_OUTPUT_COLUMNS = {"pf": PF_OUTPUT_COLUMNS, "esi": ESI_OUTPUT_COLUMNS}
+_TEXT_COLUMNS = {"UAN No", "ESI No", "MEMBER NAME", "ESI ELIGIBLE"}
+
+
+def store_enabled() -> bool:
+    return bool(ECR_STORE_DIR) and importlib.util.find_spec("pyarrow") is not None
+
+
+def _schema(scheme: str):
+    import pyarrow as pa
+
+    # Fixed column types, so a file whose names are all blank (read as float)
+    # still unifies with the rest of the dataset
+    return pa.schema(
+        [
+            (column, pa.large_string() if column in _TEXT_COLUMNS else pa.int64())
+            for column in _OUTPUT_COLUMNS[scheme]
+        ]
+        + [("upload_date", pa.date32())]
+    )
+
+
+class StoreFragmentWriter:
+    """Writes the output rows of one file as a pending fragment, chunk by chunk.
+
+    ``name`` is the output file stem. ``close`` returns the fragment path to
+    pass to ``commit_store_fragment`` once the record is saved, or None when
+    the store is off. The store is a copy of the outputs: a failed write is
+    logged and drops the fragment rather than failing the file.
+    """
+
+    def __init__(self, scheme: str, upload_date: Optional[date], name: str):
+        self.scheme = scheme
+        self.upload_date = upload_date or date.today()
+        self.path = (
+            Path(ECR_STORE_DIR)
+            / scheme
+            / f"year={self.upload_date.year}"
+            / f"month={self.upload_date.month}"
+            / _PENDING
+            / f"{name}.parquet"
+        )
+        self.enabled = store_enabled()
+        self._writer = None
+
+    def write(self, output_df: pd.DataFrame) -> None:
+        if not self.enabled:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        try:
+            columns = output_df[_OUTPUT_COLUMNS[self.scheme]]
+            # Blank names are nulls whether the chunk read them as text or float
+            text = {column: object for column in _TEXT_COLUMNS if column in columns}
+            table = pa.Table.from_pandas(
+                columns.astype(text).assign(upload_date=self.upload_date),
+                preserve_index=False,
+            ).cast(_schema(self.scheme))
+            if self._writer is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        except Exception:
+            logger.warning("Could not write ECR store fragment %s", self.path, exc_info=True)
+            self.abort()
+
+    def close(self) -> Optional[str]:
+        if not self.enabled or self._writer is None:
+            return None
+        try:
+            self._writer.close()
+        except Exception:
+            logger.warning("Could not write ECR store fragment %s", self.path, exc_info=True)
+            self.abort()
+            return None
+        return str(self.path)
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+            self._writer = None
+        self.enabled = False
+        discard_store_fragment(str(self.path))
+
+
+def write_store_fragment(
+    output_df: pd.DataFrame, scheme: str, upload_date: Optional[date], name: str
+) -> Optional[str]:
+    """Write the output rows of one file as a pending fragment of the store.
+
+    The one-frame form of ``StoreFragmentWriter``.
+    """
+    writer = StoreFragmentWriter(scheme, upload_date, name)
+    writer.write(output_df)
+    return writer.close()
+
+
+def commit_store_fragment(fragment: Optional[str], record_id: int) -> None:
+    """Publish a pending fragment under the partition of its saved record.
+
+    Call after the record is committed. A failure is logged and the
+    fragment dropped; the record is left as it is.
+    """
+    if not fragment:
+        return
+    pending = Path(fragment)
+    target = pending.parent.parent / f"record_id={record_id}" / pending.name
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(pending, target)
+    except OSError:
+        logger.warning("Could not publish ECR store fragment %s", pending, exc_info=True)
+        discard_store_fragment(fragment)
+
+
+def discard_store_fragment(fragment: Optional[str]) -> None:
+    """Delete a pending fragment whose record was never saved."""
+    if not fragment:
+        return
+    try:
+        Path(fragment).unlink(missing_ok=True)
+    except OSError:
+        logger.warning("Could not delete ECR store fragment %s", fragment, exc_info=True)
+
+
+def query_store(
+    scheme: str,
+    columns: Optional[List[str]] = None,
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    record_ids: Optional[Sequence[int]] = None,
+    where=None,
+) -> pd.DataFrame:
+    """Read rows of the store for ``scheme`` ("pf" or "esi").
+
+    ``year``, ``month`` and ``record_ids`` prune partitions before any file
+    is opened; ``where`` is an extra ``pyarrow.dataset`` expression, e.g.
+    ``ds.field("UAN No") == "100100000001"``, pushed down to the Parquet
+    row-group statistics. ``columns`` may include the partition columns
+    ``year``, ``month`` and ``record_id``.
+
+    Total EPF contribution for March 2025::
+
+        query_store("pf", ["EPF CONTRI REMITTED"], year=2025, month=3).sum()
+    """
+    import pyarrow.dataset as ds
+
+    root = Path(ECR_STORE_DIR) / scheme
+    if not root.exists():
+        return pd.DataFrame(columns=columns or [*_OUTPUT_COLUMNS[scheme], "upload_date"])
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    conditions = []
+    if year is not None:
+        conditions.append(ds.field("year") == year)
+    if month is not None:
+        conditions.append(ds.field("month") == month)
+    if record_ids is not None:
+        conditions.append(ds.field("record_id").isin(list(record_ids)))
+    if where is not None:
+        conditions.append(where)
+    condition = None
+    for expression in conditions:
+        condition = expression if condition is None else condition & expression
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
@@ -0,0 +1,137 @@
+import os
+from pathlib import Path
+from typing import List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+ECR_SEPARATOR = "#~#"
+
+# Rows formatted per write; bounds the byte matrices held at once
+ECR_TEXT_CHUNK_ROWS = int(os.environ.get("ECR_TEXT_CHUNK_ROWS", 20_000))
+
+# 10**0 .. 10**19, every power that fits in uint64
+_POWERS_OF_TEN = 10 ** np.arange(20, dtype=np.uint64)
+
+
+def _byte_matrix(cells: np.ndarray) -> np.ndarray:
+    # One row per cell, NUL padded on the right (numpy "S" arrays already are)
+    if cells.dtype.itemsize == 0:
+        return np.zeros((len(cells), 0), dtype=np.uint8)
+    return cells.view(np.uint8).reshape(len(cells), cells.dtype.itemsize)
+
+
+def _format_integers(values: np.ndarray) -> np.ndarray:
+    """Decimal digits of an integer array as a NUL padded byte matrix."""
+    negative = values < 0 if values.dtype.kind == "i" else np.zeros(len(values), bool)
+    magnitude = values.astype(np.uint64)
+    # Two's complement negation in uint64 is exact, including for the minimum int64
+    magnitude[negative] = np.uint64(0) - magnitude[negative]
+    digit_count = np.searchsorted(_POWERS_OF_TEN, magnitude, side="right")
+    digit_count = np.maximum(digit_count, 1)
+    width = int(digit_count.max(initial=1)) + int(negative.any())
+    matrix = np.zeros((len(values), width), dtype=np.uint8)
+    for position in range(int(digit_count.max(initial=1))):
+        digit = (magnitude // _POWERS_OF_TEN[position]) % np.uint64(10)
+        present = position < digit_count
+        matrix[present, width - 1 - position] = digit[present] + ord("0")
+    rows = np.flatnonzero(negative)
+    matrix[rows, width - 1 - digit_count[rows]] = ord("-")
+    return matrix
+
+
+def _format_column(values: np.ndarray, encoding: str) -> np.ndarray:
+    # Same text as str() of each cell: integers are formatted arithmetically,
+    # numpy prints floats ("nan", "inf", shortest repr) and bools like str(),
+    # anything else goes through str() one cell at a time.
+    if values.dtype.kind in "iu":
+        return _format_integers(values)
+    if values.dtype.kind in "fb":
+        return _byte_matrix(values.astype(str).astype("S"))
+    encoded = [str(value).encode(encoding) for value in values]
+    return _byte_matrix(np.array(encoded, dtype="S"))
+
+
+def _column_arrays(output_df: pd.DataFrame) -> List[np.ndarray]:
+    dtypes = list(output_df.dtypes)
+    numeric = [isinstance(dtype, np.dtype) and dtype.kind in "iuf" for dtype in dtypes]
+    # ``.values`` of an all-numeric frame upcasts every cell to the common
+    # dtype (ints alongside a float column print as "5.0"); keep that.
+    common = np.result_type(*dtypes) if dtypes and all(numeric) else None
+    return [
+        output_df.iloc[:, position].to_numpy(
+            dtype=common if common is not None else (dtype if is_numeric else object)
+        )
+        for position, (dtype, is_numeric) in enumerate(zip(dtypes, numeric))
+    ]
+
+
+class EcrTextWriter:
+    """Writes the "#~#" ECR text file a frame of rows at a time.
+
+    The header line is written on opening; each ``write`` appends the rows
+    of a frame, taking only those columns. ``write_ecr_text`` is the
+    one-frame form.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        columns: Sequence[str],
+        chunk_size: int = ECR_TEXT_CHUNK_ROWS,
+    ):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.chunk_size = chunk_size
+        self._file = open(path, "w", buffering=1 << 20)
+        self._file.write(ECR_SEPARATOR.join(map(str, columns)))
+        self._encoding = self._file.encoding
+        self._separator = np.frombuffer(
+            ECR_SEPARATOR.encode(self._encoding), dtype=np.uint8
+        )
+        self._newline = np.frombuffer(b"\n", dtype=np.uint8)
+
+    def write(self, output_df: pd.DataFrame) -> None:
+        output_df = output_df[self.columns]
+        arrays = _column_arrays(output_df)
+        for start in range(0, len(output_df), self.chunk_size):
+            stop = min(start + self.chunk_size, len(output_df))
+            rows = stop - start
+            pieces = [np.broadcast_to(self._newline, (rows, 1))]
+            for position, values in enumerate(arrays):
+                if position:
+                    pieces.append(
+                        np.broadcast_to(self._separator, (rows, len(self._separator)))
+                    )
+                pieces.append(_format_column(values[start:stop], self._encoding))
+            lines = np.hstack(pieces).ravel()
+            self._file.write(lines[lines != 0].tobytes().decode(self._encoding))
+
+    def close(self) -> None:
+        self._file.close()
+
+    def abort(self) -> None:
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+def write_ecr_text(
+    output_df: pd.DataFrame,
+    path: Union[str, Path],
+    chunk_size: int = ECR_TEXT_CHUNK_ROWS,
+) -> None:
+    """Write ``output_df`` as the "#~#" delimited ECR text file.
+
+    Produces the same file as joining ``str`` of every cell of
+    ``output_df.values.tolist()`` row by row: header line first, "\\n"
+    between lines, no trailing newline. Each chunk of rows is laid out as a
+    byte matrix (newline, cells and separators side by side, NUL padded)
+    and the padding is dropped in one pass, so no per-row Python strings are
+    built. Cells containing NUL characters, which spreadsheets cannot hold,
+    are not supported.
+    """
+    writer = EcrTextWriter(path, output_df.columns, chunk_size)
+    try:
+        writer.write(output_df)
+    finally:
+        writer.close()
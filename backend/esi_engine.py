@@ -0,0 +1,88 @@
+from datetime import date
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from rate_tables import rates_for_dates
+from rounding import round_half_up_days
+
+# Column order of the ESI Excel output
+ESI_OUTPUT_COLUMNS = [
+    "ESI No",
+    "MEMBER NAME",
+    "ESI GROSS",
+    "WORKED DAYS",
+    "ESI ELIGIBLE",
+    "EMPLOYEE CONTRIBUTION",
+    "EMPLOYER CONTRIBUTION",
+    "TOTAL CONTRIBUTION",
+]
+# The "#~#" text file is uploaded to the ESIC portal, which takes only the
+# original four columns; eligibility and contributions are for the report
+ESI_TEXT_COLUMNS = ESI_OUTPUT_COLUMNS[:4]
+
+
+def _contribution(gross: pd.Series, rate: pd.Series, eligible: pd.Series) -> pd.Series:
+    # ESIC rounds each share up to the next rupee. Rounding to paise first keeps
+    # float noise (20000 * 0.0075 = 150.00000000000003) from adding a rupee.
+    amount = np.ceil((gross * rate).round(2))
+    return amount.where(eligible, 0).astype("int64")
+
+
+def build_esi_ecr(
+    df: pd.DataFrame,
+    column_mapping: Optional[Dict[str, str]] = None,
+    wage_dates: Union[date, pd.Series, None] = None,
+    esi_no: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """Compute the ESI rows, contributions included, for a filtered ESI frame.
+
+    ``df`` holds only rows with a valid ESI number and gross. An employee is
+    eligible while their ESI gross is within the wage ceiling in effect on
+    ``wage_dates`` (the file's wage period or per-row dates; default today);
+    contributions of ineligible employees are 0. ``esi_no`` replaces the
+    default normalisation (dashes stripped) with already cleaned numbers.
+    """
+    column_mapping = column_mapping or {}
+
+    def column(field: str) -> pd.Series:
+        return df[column_mapping.get(field, field)]
+
+    if esi_no is None:
+        esi_no = column("ESI No").astype(str).str.replace("-", "")
+    esi_gross = column("ESI Gross").fillna(0).round().astype(int)
+    rates = rates_for_dates(
+        "esi", date.today() if wage_dates is None else wage_dates, df.index
+    )
+    eligible = esi_gross <= rates["wage_ceiling"]
+    employee_contribution = _contribution(esi_gross, rates["employee_rate"], eligible)
+    employer_contribution = _contribution(esi_gross, rates["employer_rate"], eligible)
+
+    return pd.DataFrame(
+        {
+            "ESI No": esi_no,
+            "MEMBER NAME": column("Employee Name"),
+            "ESI GROSS": esi_gross,
+            "WORKED DAYS": round_half_up_days(column("Worked Days")),
+            "ESI ELIGIBLE": np.where(eligible, "Y", "N"),
+            "EMPLOYEE CONTRIBUTION": employee_contribution,
+            "EMPLOYER CONTRIBUTION": employer_contribution,
+            "TOTAL CONTRIBUTION": employee_contribution + employer_contribution,
+        },
+        columns=ESI_OUTPUT_COLUMNS,
+    )
+
+
+def esi_totals(output_df: pd.DataFrame) -> Dict[str, int]:
+    """Per-file totals stored on the ProcessedFileESI record."""
+    eligible = output_df["ESI ELIGIBLE"] == "Y"
+    return {
+        "employees": int(len(output_df)),
+        "eligible_employees": int(eligible.sum()),
+        "esi_gross": int(output_df["ESI GROSS"].sum()),
+        "eligible_esi_gross": int(output_df.loc[eligible, "ESI GROSS"].sum()),
+        "employee_contribution": int(output_df["EMPLOYEE CONTRIBUTION"].sum()),
+        "employer_contribution": int(output_df["EMPLOYER CONTRIBUTION"].sum()),
+        "total_contribution": int(output_df["TOTAL CONTRIBUTION"].sum()),
+    }
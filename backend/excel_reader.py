@@ -0,0 +1,416 @@
+import importlib.util
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Number of data rows materialised at once while streaming a sheet.
+EXCEL_CHUNK_SIZE = int(os.environ.get("EXCEL_CHUNK_SIZE", 5000))
+
+# Engines tried in order of preference, e.g. EXCEL_ENGINE="calamine,openpyxl,xlrd";
+# engines that are not installed or cannot read a file type are skipped.
+# openpyxl (read-only) streams .xlsx row by row, so memory stays bounded by
+# EXCEL_CHUNK_SIZE. calamine parses about 6x faster but loads the whole
+# sheet before the first row (benchmarks/bench_excel_engines.py measures
+# both), so it is opt-in; it is also the only engine for .xlsb and .ods.
+DEFAULT_EXCEL_ENGINES = "openpyxl,xlrd"
+EXCEL_ENGINE = os.environ.get("EXCEL_ENGINE", DEFAULT_EXCEL_ENGINES)
+
+# Output field -> accepted header names, in order of preference
+PF_REQUIRED_COLUMNS = {
+    "UAN No": ["UAN No"],
+    "Employee Name": ["Employee Name"],
+    "Gross Wages": ["Total Salary", "Gross Salary"],
+    "EPF Wages": ["PF Gross", "EPF Gross"],
+    "LOP Days": ["LOP", "LOP Days"],
+}
+PF_COLUMN_DTYPES = {
+    "UAN No": str,
+    "Gross Wages": float,
+    "EPF Wages": float,
+    "LOP Days": float,
+}
+
+ESI_REQUIRED_COLUMNS = {
+    "ESI No": ["ESI N0"],
+    "Employee Name": ["Employee Name"],
+    "ESI Gross": ["ESI Gross"],
+    "Worked Days": ["Worked days"],
+}
+ESI_COLUMN_DTYPES = {
+    "ESI No": str,
+    "ESI Gross": float,
+    "Worked Days": float,
+}
+
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing: List[str]):
+        self.missing = missing
+        super().__init__(f"Missing required columns: {', '.join(missing)}")
+
+
+def _convert_cell(value: Any) -> Any:
+    # Same normalisation pandas applies to cell values: integral floats become
+    # ints (so "UAN No" read as str does not end in ".0") and blanks become None.
+    if value is None or value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _iter_calamine_rows(excel_file: Path) -> Iterator[Sequence[Any]]:
+    from python_calamine import CalamineWorkbook
+
+    # calamine parses the whole sheet in Rust before handing Python the first row
+    workbook = CalamineWorkbook.from_path(str(excel_file))
+    try:
+        sheet = workbook.get_sheet_by_index(0)
+        for row in sheet.iter_rows():
+            yield row
+    finally:
+        close = getattr(workbook, "close", None)
+        if close is not None:
+            close()
+
+
+def _iter_xlsx_rows(excel_file: Path) -> Iterator[Sequence[Any]]:
+    from openpyxl import load_workbook
+
+    # read_only keeps only the row being parsed in memory instead of the whole sheet
+    workbook = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        for row in sheet.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def _iter_xls_rows(excel_file: Path) -> Iterator[Sequence[Any]]:
+    import xlrd
+
+    # .xls is capped at 65536 rows, xlrd only loads the first sheet on demand
+    book = xlrd.open_workbook(excel_file, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for row_index in range(sheet.nrows):
+            row = []
+            for cell in sheet.row(row_index):
+                if cell.ctype == xlrd.XL_CELL_DATE:
+                    row.append(xlrd.xldate_as_datetime(cell.value, book.datemode))
+                elif cell.ctype == xlrd.XL_CELL_BOOLEAN:
+                    row.append(bool(cell.value))
+                elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+                    row.append(None)
+                else:
+                    row.append(cell.value)
+            yield row
+    finally:
+        book.release_resources()
+
+
+# name -> (row iterator, module that must be importable, readable suffixes)
+EXCEL_ENGINES = {
+    "calamine": (
+        _iter_calamine_rows,
+        "python_calamine",
+        {".xlsx", ".xlsm", ".xlsb", ".xls", ".ods"},
+    ),
+    "openpyxl": (_iter_xlsx_rows, "openpyxl", {".xlsx", ".xlsm"}),
+    "xlrd": (_iter_xls_rows, "xlrd", {".xls"}),
+}
+
+
+def excel_engine_candidates(
+    excel_file: Path, engines: Optional[Sequence[str]] = None
+) -> List[str]:
+    """Installed engines able to read ``excel_file``, in order of preference."""
+    if engines is None:
+        engines = [name.strip() for name in EXCEL_ENGINE.split(",") if name.strip()]
+    suffix = Path(excel_file).suffix.lower()
+    candidates = []
+    for name in engines:
+        if name not in EXCEL_ENGINES:
+            raise ValueError(f"Unknown Excel engine: {name}")
+        _, module, suffixes = EXCEL_ENGINES[name]
+        if suffix in suffixes and importlib.util.find_spec(module) is not None:
+            candidates.append(name)
+    return candidates
+
+
+def _non_blank_rows(rows: Iterator[Sequence[Any]]) -> Iterator[Tuple[int, List[Any]]]:
+    # Each row comes with its sheet row number (1-based), counted before
+    # blank lines are dropped so that reports point at the real spreadsheet row
+    try:
+        for row_number, row in enumerate(rows, start=1):
+            values = [_convert_cell(value) for value in row]
+            # pandas skips fully blank lines, including the trailing ones openpyxl reports
+            if any(value is not None for value in values):
+                yield row_number, values
+    finally:
+        rows.close()
+
+
+def _prepend_row(first_row: Any, rows: Iterator[Any]) -> Iterator[Any]:
+    try:
+        yield first_row
+        yield from rows
+    finally:
+        rows.close()
+
+
+def _open_numbered_rows(
+    excel_file: Path, engines: Optional[Sequence[str]] = None
+) -> Tuple[str, Iterator[Tuple[int, List[Any]]]]:
+    excel_file = Path(excel_file)
+    candidates = excel_engine_candidates(excel_file, engines)
+    if not candidates:
+        raise ValueError(f"No installed Excel engine can read {excel_file.suffix} files")
+    last_error: Optional[Exception] = None
+    for name in candidates:
+        rows = _non_blank_rows(EXCEL_ENGINES[name][0](excel_file))
+        try:
+            first_row = next(rows, None)
+        except Exception as e:
+            rows.close()
+            last_error = e
+            continue
+        if first_row is None:
+            return name, rows
+        return name, _prepend_row(first_row, rows)
+    raise last_error
+
+
+def _values(rows: Iterator[Tuple[int, List[Any]]]) -> Iterator[List[Any]]:
+    try:
+        for _, values in rows:
+            yield values
+    finally:
+        rows.close()
+
+
+def open_excel_rows(
+    excel_file: Path, engines: Optional[Sequence[str]] = None
+) -> Tuple[str, Iterator[List[Any]]]:
+    """Open the first sheet with the first engine that can read it.
+
+    Returns the engine name and an iterator over the non-blank rows. An engine
+    that fails before producing the first row (corrupt or mislabelled file)
+    falls back to the next candidate.
+    """
+    engine, rows = _open_numbered_rows(excel_file, engines)
+    return engine, _values(rows)
+
+
+def iter_excel_rows(
+    excel_file: Path, engines: Optional[Sequence[str]] = None
+) -> Iterator[List[Any]]:
+    """Yield the non-blank rows of the first sheet as lists of cell values."""
+    _, rows = open_excel_rows(excel_file, engines)
+    return rows
+
+
+def _header_names(header_row: Sequence[Any]) -> List[str]:
+    # Mirror pandas naming for unnamed and duplicated headers
+    names = []
+    seen: Dict[str, int] = {}
+    for index, value in enumerate(header_row):
+        name = f"Unnamed: {index}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def probe_excel_header(
+    excel_file: Path, engines: Optional[Sequence[str]] = None
+) -> Tuple[str, List[str]]:
+    """Return the engine that opened the file and its column names.
+
+    Only the header row is parsed.
+    """
+    engine, rows = open_excel_rows(excel_file, engines)
+    try:
+        header_row = next(rows, None)
+    finally:
+        rows.close()
+    return engine, _header_names(header_row) if header_row is not None else []
+
+
+def read_excel_header(
+    excel_file: Path, engines: Optional[Sequence[str]] = None
+) -> List[str]:
+    """Return the column names of the first sheet without reading the body."""
+    return probe_excel_header(excel_file, engines)[1]
+
+
+def resolve_columns(
+    header: Sequence[str], required_columns: Dict[str, List[str]]
+) -> Tuple[Dict[str, str], List[str]]:
+    """Map each required field to the first alias present in ``header``."""
+    available = set(header)
+    column_mapping = {}
+    missing_columns = []
+    for field, alternatives in required_columns.items():
+        for alt in alternatives:
+            if alt in available:
+                column_mapping[field] = alt
+                break
+        else:
+            missing_columns.append(field)
+    return column_mapping, missing_columns
+
+
+def _build_chunk(
+    rows: List[List[Any]],
+    columns: List[str],
+    dtype: Dict[str, Any],
+    engine: str,
+    row_numbers: Sequence[int] = (),
+) -> pd.DataFrame:
+    # Indexed by sheet row number, so rejects and duplicates name the real row
+    index = pd.Index(row_numbers, dtype="int64")
+    chunk = pd.DataFrame(rows, columns=columns, index=index)
+    # Blank cells are NaN as with pd.read_excel, so a chunk whose column is
+    # entirely blank reads as float, not as a column of None
+    chunk = chunk.where(chunk.notna(), np.nan).infer_objects()
+    chunk.attrs["excel_engine"] = engine
+    for column, column_type in dtype.items():
+        if column not in chunk.columns:
+            continue
+        if column_type is str:
+            # Like pd.read_excel(dtype=str): blanks stay NaN, everything else is str
+            values = chunk[column]
+            chunk[column] = values.astype(str).astype(object).mask(values.isna(), np.nan)
+        else:
+            chunk[column] = chunk[column].astype(column_type)
+    return chunk
+
+
+def iter_excel_chunks(
+    excel_file: Path,
+    usecols: Optional[Sequence[str]] = None,
+    dtype: Optional[Dict[str, Any]] = None,
+    chunk_size: int = EXCEL_CHUNK_SIZE,
+    engines: Optional[Sequence[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Stream the first sheet as DataFrames of at most ``chunk_size`` rows.
+
+    Only the columns named in ``usecols`` are kept (names not present in the
+    header are ignored), so peak memory follows the chunk size and the number
+    of projected columns rather than the size of the sheet. A sheet with a
+    header but no data yields one empty chunk. Each chunk is indexed by the
+    1-based sheet row numbers of its rows, which skip over blank lines. The
+    engine that read the file is recorded in each chunk's
+    ``attrs["excel_engine"]``.
+    """
+    dtype = dtype or {}
+    engine, rows = _open_numbered_rows(excel_file, engines)
+    try:
+        first = next(rows, None)
+        if first is None:
+            return
+        header_row = first[1]
+        names = _header_names(header_row)
+        if usecols is None:
+            positions = list(range(len(names)))
+        else:
+            wanted = set(usecols)
+            positions = [pos for pos, name in enumerate(names) if name in wanted]
+        columns = [names[pos] for pos in positions]
+
+        # Only the projected cells of each row are buffered
+        buffer: List[List[Any]] = []
+        row_numbers: List[int] = []
+        emitted = False
+        for row_number, row in rows:
+            buffer.append([row[pos] if pos < len(row) else None for pos in positions])
+            row_numbers.append(row_number)
+            if len(buffer) >= chunk_size:
+                yield _build_chunk(buffer, columns, dtype, engine, row_numbers)
+                emitted = True
+                buffer, row_numbers = [], []
+        if buffer or not emitted:
+            yield _build_chunk(buffer, columns, dtype, engine, row_numbers)
+    finally:
+        rows.close()
+
+
+def concat_chunks(chunks: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """One frame of streamed chunks, for the callers that need the whole sheet."""
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    # A chunk whose column was entirely blank comes back as object dtype;
+    # the sheet row numbers are kept as the index
+    df = pd.concat(chunks).infer_objects()
+    df.attrs = dict(chunks[0].attrs)
+    return df
+
+
+def read_excel_columns(
+    excel_file: Path,
+    usecols: Optional[Sequence[str]] = None,
+    dtype: Optional[Dict[str, Any]] = None,
+    chunk_size: int = EXCEL_CHUNK_SIZE,
+    engines: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """Read the projected columns of a workbook by concatenating streamed chunks.
+
+    Memory grows with the sheet; the converters use ``iter_excel_chunks``.
+    """
+    return concat_chunks(
+        list(iter_excel_chunks(excel_file, usecols, dtype, chunk_size, engines))
+    )
+
+
+def iter_required_chunks(
+    excel_file: Path,
+    required_columns: Dict[str, List[str]],
+    column_dtypes: Optional[Dict[str, Any]] = None,
+    chunk_size: int = EXCEL_CHUNK_SIZE,
+    engines: Optional[Sequence[str]] = None,
+) -> Tuple[Dict[str, str], Iterator[pd.DataFrame]]:
+    """Probe the header, then stream only the columns matched by the alias map.
+
+    Raises ``MissingColumnsError`` before any data row is read when a required
+    field has no matching header. Returns the field -> column mapping and an
+    iterator of chunks keyed by the workbook's own header names (see
+    ``iter_excel_chunks``).
+    """
+    engine, header = probe_excel_header(excel_file, engines)
+    column_mapping, missing_columns = resolve_columns(header, required_columns)
+    if missing_columns:
+        raise MissingColumnsError(missing_columns)
+    dtype = {
+        column_mapping[field]: column_type
+        for field, column_type in (column_dtypes or {}).items()
+        if field in column_mapping
+    }
+    # The body is read with the engine that successfully opened the header
+    chunks = iter_excel_chunks(
+        excel_file, list(column_mapping.values()), dtype, chunk_size, [engine]
+    )
+    return column_mapping, chunks
+
+
+def read_required_columns(
+    excel_file: Path,
+    required_columns: Dict[str, List[str]],
+    column_dtypes: Optional[Dict[str, Any]] = None,
+    chunk_size: int = EXCEL_CHUNK_SIZE,
+    engines: Optional[Sequence[str]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Like ``iter_required_chunks``, with the chunks concatenated into one frame."""
+    column_mapping, chunks = iter_required_chunks(
+        excel_file, required_columns, column_dtypes, chunk_size, engines
+    )
+    return concat_chunks(list(chunks)), column_mapping
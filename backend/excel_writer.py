@@ -0,0 +1,251 @@
+import importlib.util
+import math
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# "xlsxwriter" streams each row to a temporary file as it is written
+# (constant_memory), "openpyxl" is the previous pandas to_excel path. The
+# pandas path is also used when xlsxwriter is not installed.
+EXCEL_OUTPUT_ENGINE = os.environ.get("EXCEL_OUTPUT_ENGINE", "xlsxwriter")
+
+# Set to trace the peak Python memory of each write with tracemalloc. Off by
+# default since tracing slows the write down; the figure is only per file
+# when each workbook is written in its own process (PROCESSING_EXECUTOR=process).
+EXCEL_WRITE_TRACE_MEMORY = os.environ.get("EXCEL_WRITE_TRACE_MEMORY", "") not in ("", "0")
+
+# Column -> (number format, width) of the PF and ESI output workbooks.
+# Identifiers are text so Excel never shows them in scientific notation.
+_TEXT = ("@", 16)
+_NAME = (None, 32)
+_AMOUNT = ("0", 14)
+PF_EXCEL_LAYOUT: Dict[str, Tuple[Optional[str], int]] = {
+    "UAN No": _TEXT,
+    "MEMBER NAME": _NAME,
+    "GROSS WAGES": _AMOUNT,
+    "EPF Wages": _AMOUNT,
+    "EPS Wages": _AMOUNT,
+    "EDLI WAGES": _AMOUNT,
+    "EPF CONTRI REMITTED": _AMOUNT,
+    "EPS CONTRI REMITTED": _AMOUNT,
+    "EPF EPS DIFF REMITTED": _AMOUNT,
+    "NCP DAYS": ("0", 10),
+    "REFUND OF ADVANCES": _AMOUNT,
+}
+ESI_EXCEL_LAYOUT: Dict[str, Tuple[Optional[str], int]] = {
+    "ESI No": _TEXT,
+    "MEMBER NAME": _NAME,
+    "ESI GROSS": _AMOUNT,
+    "WORKED DAYS": ("0", 12),
+    "ESI ELIGIBLE": (None, 12),
+    "EMPLOYEE CONTRIBUTION": _AMOUNT,
+    "EMPLOYER CONTRIBUTION": _AMOUNT,
+    "TOTAL CONTRIBUTION": _AMOUNT,
+}
+
+_ROW_CHUNK = 5000
+
+# Same header style as pandas to_excel
+_HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+
+def _cell_writer(worksheet, dtype, cell_format, float_format: Optional[str]) -> Callable:
+    """Return write(row, col, value) for one column, typed by its dtype.
+
+    Blank cells (None, NaN, NA) are skipped and infinities are written as
+    "inf"/"-inf" like pandas does. ``float_format`` rounds float cells to
+    the formatted value, the meaning it has in ``DataFrame.to_excel``.
+    """
+    write_number = worksheet.write_number
+    write_string = worksheet.write_string
+
+    def write_float(row: int, col: int, value: float) -> None:
+        if math.isnan(value):
+            return
+        if math.isinf(value):
+            write_string(row, col, "inf" if value > 0 else "-inf", cell_format)
+        elif float_format is not None:
+            write_number(row, col, float(float_format % value), cell_format)
+        else:
+            write_number(row, col, value, cell_format)
+
+    if isinstance(dtype, np.dtype) and dtype.kind in "iu":
+        return lambda row, col, value: write_number(row, col, value, cell_format)
+    if isinstance(dtype, np.dtype) and dtype.kind == "f":
+        return write_float
+    if isinstance(dtype, np.dtype) and dtype.kind == "b":
+        return lambda row, col, value: worksheet.write_boolean(row, col, value, cell_format)
+
+    def write_object(row: int, col: int, value: Any) -> None:
+        if isinstance(value, str):
+            write_string(row, col, value, cell_format)
+        elif value is None or value is pd.NA or value is pd.NaT:
+            return
+        elif isinstance(value, (bool, np.bool_)):
+            worksheet.write_boolean(row, col, bool(value), cell_format)
+        elif isinstance(value, (float, np.floating)):
+            write_float(row, col, float(value))
+        elif isinstance(value, (int, np.integer)):
+            write_number(row, col, int(value), cell_format)
+        else:
+            worksheet.write(row, col, value, cell_format)
+
+    return write_object
+
+
+class ExcelOutputWriter:
+    """Writes an output workbook (header row plus data, no index) a frame at a time.
+
+    ``columns`` is the header; each ``write`` appends the rows of a frame
+    with those columns. xlsxwriter streams every frame to disk as it comes.
+    The pandas path cannot append, so it keeps the frames and writes them
+    as one on ``close``. ``write_output_excel`` is the one-frame form.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        columns: Sequence[str],
+        layout: Optional[Dict[str, Tuple[Optional[str], int]]] = None,
+        float_format: Optional[str] = None,
+        engine: str = EXCEL_OUTPUT_ENGINE,
+    ):
+        if engine == "xlsxwriter" and importlib.util.find_spec("xlsxwriter") is None:
+            engine = "openpyxl"
+        self.engine = engine
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.float_format = float_format
+        self._frames = []
+        self._workbook = None
+        self._next_row = 1
+        self._trace = EXCEL_WRITE_TRACE_MEMORY and not tracemalloc.is_tracing()
+        if self._trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        if engine == "xlsxwriter":
+            self._open_xlsxwriter(layout)
+        self._seconds = time.perf_counter() - start
+
+    def _open_xlsxwriter(self, layout) -> None:
+        import xlsxwriter
+
+        # constant_memory flushes every finished row, so rows go out strictly in
+        # order. Cells are written with their type: strings are never turned into
+        # formulas or hyperlinks.
+        self._workbook = xlsxwriter.Workbook(
+            str(self.path),
+            {
+                "constant_memory": True,
+                "strings_to_formulas": False,
+                "strings_to_urls": False,
+                "strings_to_numbers": False,
+            },
+        )
+        self._worksheet = self._workbook.add_worksheet("Sheet1")
+        header_format = self._workbook.add_format(_HEADER_FORMAT)
+        formats = {}
+        self._cell_formats = []
+        for col, name in enumerate(self.columns):
+            num_format, width = (layout or {}).get(name, (None, None))
+            cell_format = None
+            if num_format is not None:
+                if num_format not in formats:
+                    formats[num_format] = self._workbook.add_format({"num_format": num_format})
+                cell_format = formats[num_format]
+            if width is not None:
+                self._worksheet.set_column(col, col, width)
+            self._worksheet.write_string(0, col, str(name), header_format)
+            self._cell_formats.append(cell_format)
+
+    def write(self, output_df: pd.DataFrame) -> None:
+        start = time.perf_counter()
+        if self._workbook is None:
+            self._frames.append(output_df)
+        else:
+            self._write_rows(output_df)
+        self._seconds += time.perf_counter() - start
+
+    def _write_rows(self, output_df: pd.DataFrame) -> None:
+        # Typed per frame: a column that is blank throughout one frame reads as float
+        writers = [
+            _cell_writer(self._worksheet, dtype, cell_format, self.float_format)
+            for dtype, cell_format in zip(output_df.dtypes, self._cell_formats)
+        ]
+        # Cells are converted to Python objects a chunk at a time
+        for start in range(0, len(output_df), _ROW_CHUNK):
+            chunk = output_df.iloc[start : start + _ROW_CHUNK]
+            columns = [chunk.iloc[:, col].tolist() for col in range(chunk.shape[1])]
+            for row, values in enumerate(zip(*columns), start=self._next_row + start):
+                for col, (write, value) in enumerate(zip(writers, values)):
+                    write(row, col, value)
+        self._next_row += len(output_df)
+
+    def close(self) -> Dict[str, Any]:
+        """Finish the workbook; returns the engine, write seconds and traced peak."""
+        start = time.perf_counter()
+        try:
+            if self._workbook is not None:
+                self._workbook.close()
+            else:
+                frame = (
+                    pd.concat(self._frames, ignore_index=True)
+                    if self._frames
+                    else pd.DataFrame(columns=self.columns)
+                )
+                frame.to_excel(
+                    self.path, index=False, float_format=self.float_format, engine=self.engine
+                )
+            self._seconds += time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if self._trace else None
+        finally:
+            self._stop_trace()
+        return {
+            "engine": self.engine,
+            "seconds": round(self._seconds, 4),
+            "peak_memory_bytes": peak,
+        }
+
+    def abort(self) -> None:
+        """Drop a workbook that will not be finished."""
+        try:
+            if self._workbook is not None:
+                self._workbook.close()
+        except Exception:
+            pass
+        finally:
+            self._stop_trace()
+            self.path.unlink(missing_ok=True)
+
+    def _stop_trace(self) -> None:
+        if self._trace:
+            tracemalloc.stop()
+            self._trace = False
+
+
+def write_output_excel(
+    output_df: pd.DataFrame,
+    path: Union[str, Path],
+    layout: Optional[Dict[str, Tuple[Optional[str], int]]] = None,
+    float_format: Optional[str] = None,
+    engine: str = EXCEL_OUTPUT_ENGINE,
+) -> Dict[str, Any]:
+    """Write an output workbook (header row plus data, no index) to ``path``.
+
+    ``layout`` gives the number format and width of known columns, e.g.
+    ``PF_EXCEL_LAYOUT`` (xlsxwriter only; the pandas path ignores it).
+    Returns the engine used, the write time in seconds and the traced peak
+    memory in bytes (None unless EXCEL_WRITE_TRACE_MEMORY is set).
+    """
+    writer = ExcelOutputWriter(path, output_df.columns, layout, float_format, engine)
+    try:
+        writer.write(output_df)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
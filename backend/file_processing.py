@@ -0,0 +1,337 @@
+import concurrent.futures
+import os
+import uuid
+from collections import Counter
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifacts import OutputWriter
+from excel_reader import (
+    ESI_COLUMN_DTYPES,
+    ESI_REQUIRED_COLUMNS,
+    PF_COLUMN_DTYPES,
+    PF_REQUIRED_COLUMNS,
+)
+from ecr_store import StoreFragmentWriter
+from esi_engine import build_esi_ecr, esi_totals
+from id_validation import (
+    IdIndexWriter,
+    RejectsWriter,
+    find_cross_file_duplicates,
+    find_shared_digests,
+    read_id_digests,
+    read_id_occurrences,
+    split_esi_rows,
+    split_pf_rows,
+)
+from parse_cache import iter_required_chunks_cached
+from pf_engine import build_pf_ecr
+
+# "process" runs each workbook in its own worker process so parsing, the
+# pandas transforms and the Excel write are not serialised on the GIL. "thread" keeps
+# the previous in-process behaviour.
+PROCESSING_EXECUTOR = os.environ.get("PROCESSING_EXECUTOR", "process")
+PROCESSING_WORKERS = int(os.environ.get("PROCESSING_WORKERS", os.cpu_count() or 1))
+
+
+def make_processing_executor(
+    kind: str = PROCESSING_EXECUTOR, max_workers: int = PROCESSING_WORKERS
+) -> concurrent.futures.Executor:
+    if kind == "process":
+        return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    if kind == "thread":
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"Unknown PROCESSING_EXECUTOR: {kind}")
+
+
+_REQUIRED_COLUMNS = {
+    "pf": (PF_REQUIRED_COLUMNS, PF_COLUMN_DTYPES),
+    "esi": (ESI_REQUIRED_COLUMNS, ESI_COLUMN_DTYPES),
+}
+
+
+class NoValidRowsError(ValueError):
+    def __init__(self, scheme: str, rejects: str):
+        self.rejects = rejects
+        if scheme == "pf":
+            message = f"No valid UAN rows ({rejects})"
+        else:
+            message = f"No valid ESI data found after filtering invalid entries ({rejects})"
+        super().__init__(message)
+
+
+def open_workbook_chunks(
+    excel_file: Path, scheme: str
+) -> Tuple[Dict[str, str], Optional[Iterator[pd.DataFrame]]]:
+    """Probe the header and read the first chunk of a PF or ESI workbook.
+
+    Missing columns and errors reading the first chunk surface here, before
+    any output is created. Returns the column mapping and the chunks, which
+    are None when the sheet has no data rows.
+    """
+    required_columns, column_dtypes = _REQUIRED_COLUMNS[scheme]
+    column_mapping, chunks = iter_required_chunks_cached(
+        excel_file, required_columns, column_dtypes
+    )
+    try:
+        first = next(chunks, None)
+    except BaseException:
+        chunks.close()
+        raise
+    if first is None or first.empty:
+        chunks.close()
+        return column_mapping, None
+    return column_mapping, _resume(first, chunks)
+
+
+def _resume(first: pd.DataFrame, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    try:
+        yield first
+        yield from chunks
+    finally:
+        chunks.close()
+
+
+def convert_chunks(
+    scheme: str,
+    chunks: Iterator[pd.DataFrame],
+    column_mapping: Dict[str, str],
+    excel_file_path: Path,
+    text_file_path: Path,
+    upload_date: Optional[date] = None,
+) -> dict:
+    """Validate, convert and write the chunks of one workbook.
+
+    Each chunk is split into accepted rows and rejects, converted and
+    appended to the outputs, the rejects CSV and the pending store fragment,
+    so memory stays bounded by the chunk size rather than the sheet. Raises
+    ``NoValidRowsError`` when no row is accepted; on any failure the partial
+    outputs are removed. Returns the per-file results the callers record.
+    """
+    outputs = OutputWriter(excel_file_path, text_file_path, scheme)
+    store = StoreFragmentWriter(scheme, upload_date, text_file_path.stem)
+    rejects = RejectsWriter(text_file_path.with_name(f"{text_file_path.stem}_rejects.csv"))
+    uan_index = IdIndexWriter(uan_index_path(text_file_path))
+    excel_engine = None
+    parse_cache_hit = None
+    accepted = 0
+    totals = Counter()
+    try:
+        for chunk in chunks:
+            excel_engine = excel_engine or chunk.attrs.get("excel_engine")
+            if parse_cache_hit is None:
+                parse_cache_hit = chunk.attrs.get("parse_cache_hit")
+            if scheme == "pf":
+                # Malformed UANs go to the rejects file instead of the ECR
+                df, uan_no, chunk_rejects = split_pf_rows(chunk, column_mapping)
+            else:
+                # Invalid ESI numbers and rows without ESI gross go to the rejects file
+                df, esi_no, chunk_rejects = split_esi_rows(chunk, column_mapping)
+            rejects.write(chunk_rejects)
+            if df.empty:
+                continue
+
+            if scheme == "pf":
+                output_df = build_pf_ecr(
+                    df, column_mapping, uan_no=uan_no, wage_dates=upload_date
+                )
+                uan_index.write(uan_no)
+            else:
+                output_df = build_esi_ecr(
+                    df, column_mapping, wage_dates=upload_date, esi_no=esi_no
+                )
+                totals.update(esi_totals(output_df))
+            outputs.write(output_df)
+            store.write(output_df)
+            accepted += len(output_df)
+
+        if not accepted:
+            raise NoValidRowsError(scheme, rejects.describe())
+        excel_write = outputs.close()
+    except BaseException:
+        outputs.abort()
+        store.abort()
+        rejects.abort()
+        uan_index.abort()
+        raise
+    finally:
+        chunks.close()
+
+    result = {
+        "excel_engine": excel_engine,
+        "parse_cache_hit": parse_cache_hit,
+        "excel_write": excel_write,
+        # Published under the record id by the caller once the record is saved
+        "store_fragment": store.close(),
+        "rejected_rows": rejects.count,
+        "rejects_file": rejects.close(),
+    }
+    if scheme == "pf":
+        # Hashes of the distinct UANs for the batch-level duplicate check;
+        # the rows of the shared ones are read back from the UAN index
+        result["uan_digests"] = uan_index.digests()
+        result["uan_index"] = uan_index.close()
+    else:
+        result["totals"] = dict(totals)
+    return result
+
+
+def uan_index_path(text_file_path: Path) -> Path:
+    """The UAN index kept next to the ECR text file of a PF workbook."""
+    return text_file_path.with_name(f"{text_file_path.stem}_uans.npz")
+
+
+def find_batch_duplicate_uans(
+    indexes: Dict[str, Optional[str]],
+    submit: Callable[..., concurrent.futures.Future],
+    digests_by_file: Optional[Dict[str, np.ndarray]] = None,
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """UANs that occur in more than one workbook of a batch, with every (file, row).
+
+    ``indexes`` maps each workbook to its UAN index, ``digests_by_file`` the
+    ones just converted to the digests their worker returned; the digests of
+    the others (files reused from an earlier batch) are read from their
+    index. Only the rows of UANs shared with another file are read back.
+    The reads run through ``submit`` (the batch's worker pool). Returns the
+    duplicates and the files that could not be checked: no index, or an
+    index that failed to load.
+    """
+    unchecked = [file for file, index in indexes.items() if not index]
+    digests_by_file = {
+        file: digests
+        for file, digests in (digests_by_file or {}).items()
+        if indexes.get(file)
+    }
+    pending = {
+        submit(read_id_digests, index): file
+        for file, index in indexes.items()
+        if index and file not in digests_by_file
+    }
+    for future in concurrent.futures.as_completed(pending):
+        try:
+            digests_by_file[pending[future]] = future.result()
+        except Exception:
+            unchecked.append(pending[future])
+
+    pending = {
+        submit(read_id_occurrences, indexes[file], shared): file
+        for file, shared in find_shared_digests(digests_by_file).items()
+    }
+    ids_by_file = {}
+    for future in concurrent.futures.as_completed(pending):
+        try:
+            ids_by_file[pending[future]] = future.result()
+        except Exception:
+            unchecked.append(pending[future])
+    return find_cross_file_duplicates(ids_by_file), [file for file in indexes if file in unchecked]
+
+
+# The workers below run in pool processes: they take and return only plain,
+# picklable values (paths, status, message) and never touch the database.
+# The endpoints build the ProcessedFilePF/ProcessedFileESI rows from the result.
+
+
+def convert_pf_workbook(
+    excel_file: Path,
+    excel_output_dir: Path,
+    text_output_dir: Path,
+    upload_date: Optional[date] = None,
+) -> dict:
+    file_result = {
+        "file_path": str(excel_file),
+        "status": "success",
+        "message": "File processed successfully",
+        "output_files": None,
+        "excel_engine": None,
+        "parse_cache_hit": None,
+        "excel_write": None,
+        "store_fragment": None,
+        "rejected_rows": None,
+        "rejects_file": None,
+    }
+
+    try:
+        # Probe the header, then stream only the matched columns
+        column_mapping, chunks = open_workbook_chunks(excel_file, "pf")
+        if chunks is None:
+            raise ValueError("Excel file is empty")
+
+        # Generate output files
+        original_stem = excel_file.stem
+        unique_id = uuid.uuid4()
+        excel_filename = f"{original_stem}_{unique_id}.xlsx"
+        text_filename = f"{original_stem}_{unique_id}.txt"
+        excel_file_path = excel_output_dir / excel_filename
+        text_file_path = text_output_dir / text_filename
+
+        file_result.update(
+            convert_chunks(
+                "pf", chunks, column_mapping, excel_file_path, text_file_path, upload_date
+            )
+        )
+        file_result["output_files"] = (str(excel_file_path), str(text_file_path))
+
+    except Exception as e:
+        file_result.update(
+            {
+                "status": "error",
+                "message": f"Error processing file {excel_file.name}: {str(e)}",
+            }
+        )
+
+    return file_result
+
+
+def convert_esi_workbook(
+    excel_file: Path,
+    excel_output_dir: Path,
+    text_output_dir: Path,
+    upload_date: Optional[date] = None,
+) -> dict:
+    file_result = {
+        "file_path": str(excel_file),
+        "status": "success",
+        "message": "File processed successfully",
+        "output_files": None,
+        "excel_engine": None,
+        "parse_cache_hit": None,
+        "excel_write": None,
+        "store_fragment": None,
+        "rejected_rows": None,
+        "rejects_file": None,
+    }
+
+    try:
+        # Probe the header, then stream only the matched columns
+        column_mapping, chunks = open_workbook_chunks(excel_file, "esi")
+        if chunks is None:
+            raise ValueError("Excel file is empty")
+
+        # Generate output files
+        original_stem = excel_file.stem
+        unique_id = uuid.uuid4()
+        excel_filename = f"{original_stem}_{unique_id}_esi.xlsx"
+        text_filename = f"{original_stem}_{unique_id}_esi.txt"
+        excel_file_path = excel_output_dir / excel_filename
+        text_file_path = text_output_dir / text_filename
+
+        file_result.update(
+            convert_chunks(
+                "esi", chunks, column_mapping, excel_file_path, text_file_path, upload_date
+            )
+        )
+        file_result["output_files"] = (str(excel_file_path), str(text_file_path))
+
+    except Exception as e:
+        file_result.update(
+            {
+                "status": "error",
+                "message": f"Error processing file {excel_file.name}: {str(e)}",
+            }
+        )
+
+    return file_result
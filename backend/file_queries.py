@@ -0,0 +1,197 @@
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Query, Session
+
+from models import (
+    DashboardDelayRollup,
+    DashboardRollup,
+    ProcessedFileESI,
+    ProcessedFilePF,
+    UserModel,
+)
+
+
+def created_in_period(column, year: int, month: Optional[int] = None):
+    """``column`` falls in ``year`` (or one month of it), as a range predicate.
+
+    Unlike ``extract("year", column) == year`` this can use an index on the
+    column. The bounds are dates on purpose: SQLite keeps timestamps as
+    "YYYY-MM-DD HH:MM:SS" text and a date bound ("2025-01-01") compares
+    correctly with it, while a datetime bound gets a ".000000" suffix that
+    puts midnight on the wrong side.
+    """
+    if month is None:
+        start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    else:
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1)
+    return and_(column >= start, column < end)
+
+
+def processed_files_for_date(
+    db: Session, model, upload_date: date, user_id: Optional[int] = None
+) -> Query:
+    """Records of ``model`` uploaded on ``upload_date``, newest first.
+
+    Served by the (user_id, upload_date, created_at) index, or by
+    (upload_date, created_at) when ``user_id`` is None.
+    """
+    query = db.query(model).filter(model.upload_date == upload_date)
+    if user_id is not None:
+        query = query.filter(model.user_id == user_id)
+    return query.order_by(model.created_at.desc())
+
+
+def recent_processed_files(
+    db: Session,
+    model,
+    user_id: Optional[int] = None,
+    year: Optional[int] = None,
+    limit: int = 5,
+) -> Query:
+    """The ``limit`` newest records of ``model``, for the dashboard.
+
+    A range read of (user_id, created_at), or of (created_at) when
+    ``user_id`` is None, that stops after ``limit`` rows.
+    """
+    query = db.query(model)
+    if user_id is not None:
+        query = query.filter(model.user_id == user_id)
+    if year:
+        query = query.filter(created_in_period(model.created_at, year))
+    return query.order_by(model.created_at.desc()).limit(limit)
+
+
+def consolidation_sources(db: Session, upload_date: date, user_id: int) -> Query:
+    """A user's successful PF records of ``upload_date``, oldest first.
+
+    Served by the (user_id, upload_date, created_at) index.
+    """
+    return (
+        db.query(ProcessedFilePF)
+        .filter(
+            ProcessedFilePF.upload_date == upload_date,
+            ProcessedFilePF.user_id == user_id,
+            ProcessedFilePF.status == "success",
+        )
+        .order_by(ProcessedFilePF.created_at)
+    )
+
+
+def dashboard_counts(
+    db: Session, user_id: Optional[int] = None, year: Optional[int] = None
+) -> Dict[str, Any]:
+    """Every count on the dashboard, read from the rollup tables.
+
+    ``user_id`` None counts all users' records. As before, ``year`` only
+    narrows the PF/ESI totals; the monthly breakdown, remittance counts and
+    delay histogram cover all years. Returns a dict with "pf" and "esi"
+    totals ({"total", "success", "error"}), "monthly" (month number to the
+    per-month counters), "remittance" ({"submitted", "timely"}, PF only) and
+    "delays" ({"days", "count", "type"} rows, PF then ESI).
+    """
+    counts = db.query(
+        DashboardRollup.scheme,
+        DashboardRollup.year,
+        DashboardRollup.month,
+        func.sum(DashboardRollup.total).label("total"),
+        func.sum(DashboardRollup.success).label("success"),
+        func.sum(DashboardRollup.error).label("error"),
+        func.sum(DashboardRollup.remittance_submitted).label("submitted"),
+        func.sum(DashboardRollup.timely).label("timely"),
+    )
+    delay_counts = db.query(
+        DashboardDelayRollup.scheme,
+        DashboardDelayRollup.delay_days,
+        func.sum(DashboardDelayRollup.count).label("count"),
+    )
+    if user_id is not None:
+        counts = counts.filter(DashboardRollup.user_id == user_id)
+        delay_counts = delay_counts.filter(DashboardDelayRollup.user_id == user_id)
+    counts = counts.group_by(
+        DashboardRollup.scheme, DashboardRollup.year, DashboardRollup.month
+    )
+    delay_counts = delay_counts.group_by(
+        DashboardDelayRollup.scheme, DashboardDelayRollup.delay_days
+    )
+
+    totals = {scheme: {"total": 0, "success": 0, "error": 0} for scheme in ("pf", "esi")}
+    monthly = defaultdict(
+        lambda: {
+            "pf_total": 0,
+            "pf_success": 0,
+            "pf_error": 0,
+            "esi_total": 0,
+            "esi_success": 0,
+            "esi_error": 0,
+            "remittance_submitted": 0,
+        }
+    )
+    remittance = {"submitted": 0, "timely": 0}
+    for row in counts.all():
+        scheme = row.scheme
+        if not year or row.year == year:
+            totals[scheme]["total"] += row.total
+            totals[scheme]["success"] += row.success
+            totals[scheme]["error"] += row.error
+        month = monthly[row.month]
+        month[f"{scheme}_total"] += row.total
+        month[f"{scheme}_success"] += row.success
+        month[f"{scheme}_error"] += row.error
+        if scheme == "pf":
+            month["remittance_submitted"] += row.submitted
+            remittance["submitted"] += row.submitted
+            remittance["timely"] += row.timely
+
+    delays = sorted(
+        (("pf", "esi").index(row.scheme), row.delay_days, row.count)
+        for row in delay_counts.all()
+        if row.count
+    )
+    return {
+        **totals,
+        "monthly": monthly,
+        "remittance": remittance,
+        "delays": [
+            {"days": days, "count": count, "type": ("PF", "ESI")[scheme]}
+            for scheme, days, count in delays
+        ],
+    }
+
+
+def top_users_query(db: Session, limit: int = 5) -> Query:
+    """The query behind ``top_users_by_files``.
+
+    Each table is counted per user in its own subquery (an index-only scan
+    of (user_id, created_at)) before joining to users. Joining users to
+    both tables directly would pair every PF record of a user with every
+    ESI record, multiplying both counts and the rows scanned.
+    """
+    per_user = {}
+    for scheme, model in (("pf", ProcessedFilePF), ("esi", ProcessedFileESI)):
+        per_user[scheme] = (
+            db.query(model.user_id.label("user_id"), func.count().label("files"))
+            .group_by(model.user_id)
+            .subquery()
+        )
+    pf_files = func.coalesce(per_user["pf"].c.files, 0)
+    esi_files = func.coalesce(per_user["esi"].c.files, 0)
+    return (
+        db.query(
+            UserModel.username,
+            pf_files.label("pf_files"),
+            esi_files.label("esi_files"),
+        )
+        .outerjoin(per_user["pf"], per_user["pf"].c.user_id == UserModel.id)
+        .outerjoin(per_user["esi"], per_user["esi"].c.user_id == UserModel.id)
+        .order_by(pf_files.desc(), UserModel.username)
+        .limit(limit)
+    )
+
+
+def top_users_by_files(db: Session, limit: int = 5):
+    """The ``limit`` users with the most PF files, with their PF and ESI counts."""
+    return top_users_query(db, limit).all()
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from artifacts import artifacts_available
+from parse_cache import file_content_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are still serialised within a worker
+    fcntl = None
+
+MANIFEST_DIR = Path(os.environ.get("MANIFEST_DIR", "processing_manifests"))
+
+# Two runs over the same folder and date (a background job and a request,
+# or two workers) each save what they processed; the lock keeps one save
+# from overwriting the other's entries
+_save_locks: Dict[Path, threading.Lock] = defaultdict(threading.Lock)
+_save_locks_lock = threading.Lock()
+
+
+class FolderManifest:
+    """Fingerprints of the workbooks already processed for a folder and upload date.
+
+    Each entry maps the resolved workbook path to its size, mtime, content hash
+    and the id of the successful ProcessedFilePF/ProcessedFileESI record it
+    produced. A workbook whose size and mtime match is not re-hashed; one that
+    was only touched (new mtime, same hash) still counts as unchanged.
+    ``save`` merges this run's entries into the manifest as it is on disk.
+    """
+
+    def __init__(self, scheme: str, folder: Path, upload_date: date):
+        self.scheme = scheme
+        self.folder = str(Path(folder).resolve())
+        self.upload_date = upload_date.isoformat()
+        folder_key = hashlib.sha1(self.folder.encode()).hexdigest()[:16]
+        self.path = MANIFEST_DIR / scheme / self.upload_date / f"{folder_key}.json"
+        self.files = self._load()
+        self._fingerprints: Dict[str, dict] = {}
+        # Entries written by this run, the only ones save() writes back
+        self._updated: Dict[str, dict] = {}
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f).get("files", {})
+        except FileNotFoundError:
+            return {}
+
+    def _fingerprint(self, excel_file: Path) -> dict:
+        key = str(excel_file.resolve())
+        if key not in self._fingerprints:
+            stat = excel_file.stat()
+            fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime}
+            entry = self.files.get(key)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                fingerprint["content_hash"] = entry["content_hash"]
+            else:
+                fingerprint["content_hash"] = file_content_hash(excel_file)
+            self._fingerprints[key] = fingerprint
+        return self._fingerprints[key]
+
+    def _reusable(self, record, user_id: int) -> bool:
+        # Only a successful record of this user whose outputs are still there
+        if record is None or record.status != "success" or record.user_id != user_id:
+            return False
+        filepaths = (record.filepath or "").split(",")
+        return len(filepaths) == 2 and artifacts_available(
+            Path(filepaths[0]), Path(filepaths[1])
+        )
+
+    def split_unchanged(
+        self, excel_files: List[Path], db: Session, model, user_id: int
+    ) -> Tuple[List[Path], list]:
+        """Return the workbooks that need processing and the records of the rest.
+
+        A workbook is only skipped when its content is unchanged and its
+        record belongs to ``user_id`` and still has its outputs on disk.
+        """
+        changed, unchanged_records = [], []
+        for excel_file in excel_files:
+            key = str(excel_file.resolve())
+            entry = self.files.get(key)
+            if entry is None or self._fingerprint(excel_file)["content_hash"] != entry["content_hash"]:
+                changed.append(excel_file)
+                continue
+            record = db.get(model, entry["record_id"])
+            if not self._reusable(record, user_id):
+                changed.append(excel_file)
+                continue
+            entry.update(self._fingerprint(excel_file))
+            self._updated[key] = entry
+            unchanged_records.append(record)
+        return changed, unchanged_records
+
+    def mark_processed(self, excel_file: Path, record_id: int) -> None:
+        key = str(excel_file.resolve())
+        entry = dict(self._fingerprint(excel_file), record_id=record_id)
+        self.files[key] = self._updated[key] = entry
+
+    @contextmanager
+    def _locked(self):
+        with _save_locks_lock:
+            lock = _save_locks[self.path]
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path.with_name(f"{self.path.name}.lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def save(self) -> None:
+        """Write this run's entries over the manifest's current contents.
+
+        Re-read under the lock, so entries saved by a concurrent run since
+        this one started are kept; written to a temporary file and moved
+        into place, so readers never see a partial manifest.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._locked():
+            self.files = {**self._load(), **self._updated}
+            tmp_path = self.path.with_name(f"{self.path.name}.{uuid.uuid4().hex}.tmp")
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(
+                        {
+                            "folder": self.folder,
+                            "upload_date": self.upload_date,
+                            "scheme": self.scheme,
+                            "files": self.files,
+                        },
+                        f,
+                        indent=2,
+                    )
+                os.replace(tmp_path, self.path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,243 @@
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+UAN_LENGTH = 12
+ESI_NUMBER_LENGTH = 10
+
+# Reason codes written to the rejects file, checked in this order
+REJECT_REASONS = {
+    "MISSING_ID": "Identifier is blank or zero",
+    "SCIENTIFIC_NOTATION": "Identifier was stored by Excel in scientific notation",
+    "NON_NUMERIC": "Identifier contains characters other than digits",
+    "WRONG_LENGTH": "Identifier has the wrong number of digits",
+    "ZERO_GROSS": "ESI gross is blank or zero",
+}
+
+
+def validate_ids(values: pd.Series, length: int) -> Tuple[pd.Series, pd.Series]:
+    """Normalise UAN / ESI numbers and flag the ones EPFO/ESIC would reject.
+
+    Surrounding and embedded spaces, dashes and a trailing ".0" left by a
+    numeric cell are removed. Returns the cleaned identifiers and a reason
+    code per row (None when the identifier is valid).
+    """
+    blank = values.isna()
+    cleaned = (
+        values.astype(str)
+        .str.strip()
+        .str.replace(r"[\s-]", "", regex=True)
+        .str.replace(r"\.0+$", "", regex=True)
+    )
+    missing = blank | (cleaned == "") | cleaned.str.fullmatch(r"0+")
+    scientific = cleaned.str.fullmatch(r"\d+(\.\d+)?[eE]\+?\d+")
+    non_numeric = ~cleaned.str.fullmatch(r"\d+")
+    wrong_length = cleaned.str.len() != length
+    reasons = np.select(
+        [missing, scientific, non_numeric, wrong_length],
+        ["MISSING_ID", "SCIENTIFIC_NOTATION", "NON_NUMERIC", "WRONG_LENGTH"],
+        default=None,
+    )
+    return cleaned, pd.Series(reasons, index=values.index, dtype=object)
+
+
+def _split(
+    df: pd.DataFrame,
+    column_mapping: Dict[str, str],
+    ids: pd.Series,
+    reasons: pd.Series,
+) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    rejected = reasons.notna()
+    accepted = df[~rejected]
+    rejects = pd.DataFrame(
+        {
+            # The reader indexes each row by its sheet row number
+            "ROW": df.index[rejected],
+            "REASON": reasons[rejected],
+            **{field: df.loc[rejected, column] for field, column in column_mapping.items()},
+        }
+    )
+    return accepted, ids[~rejected], rejects
+
+
+def split_pf_rows(
+    df: pd.DataFrame, column_mapping: Dict[str, str]
+) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    """Return the accepted rows, their cleaned UANs and the rejects frame."""
+    uan_no, reasons = validate_ids(df[column_mapping["UAN No"]], UAN_LENGTH)
+    return _split(df, column_mapping, uan_no, reasons)
+
+
+def split_esi_rows(
+    df: pd.DataFrame, column_mapping: Dict[str, str]
+) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame]:
+    """Like ``split_pf_rows``; rows with no ESI gross are rejected as well."""
+    esi_no, reasons = validate_ids(df[column_mapping["ESI No"]], ESI_NUMBER_LENGTH)
+    gross = df[column_mapping["ESI Gross"]]
+    reasons = reasons.mask(reasons.isna() & (gross.isna() | (gross == 0)), "ZERO_GROSS")
+    return _split(df, column_mapping, esi_no, reasons)
+
+
+def describe_rejects(rejects: pd.DataFrame) -> str:
+    counts = rejects["REASON"].value_counts()
+    return ", ".join(f"{reason}: {count}" for reason, count in counts.items())
+
+
+def write_rejects(rejects: pd.DataFrame, path: Path) -> Optional[str]:
+    """Write the rejects CSV next to the outputs; nothing is written if empty."""
+    if rejects.empty:
+        return None
+    rejects.to_csv(path, index=False)
+    return str(path)
+
+
+class RejectsWriter:
+    """``write_rejects`` for a file validated chunk by chunk.
+
+    The CSV is created with the first reject, so a file without any has none.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.reasons: Counter = Counter()
+
+    @property
+    def count(self) -> int:
+        return sum(self.reasons.values())
+
+    def write(self, rejects: pd.DataFrame) -> None:
+        if rejects.empty:
+            return
+        first = not self.count
+        rejects.to_csv(self.path, mode="w" if first else "a", header=first, index=False)
+        self.reasons.update(rejects["REASON"])
+
+    def describe(self) -> str:
+        return ", ".join(f"{reason}: {count}" for reason, count in self.reasons.most_common())
+
+    def close(self) -> Optional[str]:
+        return str(self.path) if self.count else None
+
+    def abort(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def hash_ids(ids: Sequence[str]) -> np.ndarray:
+    """A 64-bit hash per identifier, aligned with ``ids``."""
+    return pd.util.hash_array(np.asarray(ids, dtype=object))
+
+
+def id_digests(ids: Sequence[str]) -> np.ndarray:
+    """Sorted 64-bit hashes of the distinct identifiers in ``ids``.
+
+    Eight bytes per identifier, whatever the number of rows it occurs on;
+    the batch workers return these instead of the identifiers and rows.
+    """
+    return np.unique(hash_ids(ids))
+
+
+class IdIndexWriter:
+    """The accepted identifiers of one file and their sheet rows, chunk by chunk.
+
+    The index is kept next to the outputs as an ``.npz`` file holding the
+    hash, identifier and row of every accepted row. A later batch that
+    reuses the file can take part in the duplicate check without the
+    workbook being read again.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._ids: List[np.ndarray] = []
+        self._rows: List[np.ndarray] = []
+
+    def write(self, ids: pd.Series) -> None:
+        self._ids.append(ids.to_numpy(dtype=str))
+        self._rows.append(ids.index.to_numpy(dtype=np.int64))
+
+    def digests(self) -> np.ndarray:
+        return id_digests(np.concatenate(self._ids)) if self._ids else np.array([], np.uint64)
+
+    def close(self) -> Optional[str]:
+        if not self._ids:
+            return None
+        ids = np.concatenate(self._ids)
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, hashes=hash_ids(ids), ids=ids, rows=np.concatenate(self._rows))
+        tmp_path.replace(self.path)
+        return str(self.path)
+
+    def abort(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+def read_id_digests(path: str) -> np.ndarray:
+    """The digests of the identifiers in an ``IdIndexWriter`` file."""
+    with np.load(path) as index:
+        return np.unique(index["hashes"])
+
+
+def read_id_occurrences(path: str, digests: np.ndarray) -> Tuple[List[str], List[int]]:
+    """The identifiers of an ``IdIndexWriter`` file whose hash is in ``digests``, with their rows."""
+    with np.load(path) as index:
+        hit = np.isin(index["hashes"], digests)
+        return index["ids"][hit].tolist(), index["rows"][hit].tolist()
+
+
+def find_shared_digests(digests_by_file: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """The digests of each file that also occur in another file of the batch.
+
+    A hash collision can only add a candidate: the identifiers behind the
+    digests are compared again by ``find_cross_file_duplicates``. Files with
+    no shared digest are left out.
+    """
+    digests = [file_digests for file_digests in digests_by_file.values() if len(file_digests)]
+    if not digests:
+        return {}
+    # Each file's digests are distinct, so a repeat means a second file
+    values, counts = np.unique(np.concatenate(digests), return_counts=True)
+    repeated = values[counts > 1]
+    shared = {
+        file: file_digests[np.isin(file_digests, repeated)]
+        for file, file_digests in digests_by_file.items()
+    }
+    return {file: file_digests for file, file_digests in shared.items() if len(file_digests)}
+
+
+def find_cross_file_duplicates(
+    ids_by_file: Dict[str, Tuple[Sequence[str], Sequence[int]]]
+) -> List[Dict[str, Any]]:
+    """Find identifiers that occur in more than one file of a batch.
+
+    ``ids_by_file`` maps each source file to its accepted identifiers and their
+    spreadsheet rows. All rows go into one frame and are indexed by hashing
+    (``drop_duplicates`` / ``duplicated``), so the pass is linear in the
+    number of rows. Returns one entry per duplicated identifier with every
+    (file, row) it occurs at.
+    """
+    frames = [
+        pd.DataFrame({"id": ids, "file": file, "row": rows})
+        for file, (ids, rows) in ids_by_file.items()
+        if len(ids)
+    ]
+    if not frames:
+        return []
+    index = pd.concat(frames, ignore_index=True)
+    per_file = index.drop_duplicates(["id", "file"])
+    repeated = per_file.loc[per_file["id"].duplicated(keep=False), "id"]
+    if repeated.empty:
+        return []
+    hits = index[index["id"].isin(repeated)].sort_values(["id", "file", "row"])
+    return [
+        {
+            "id": identifier,
+            "occurrences": [
+                {"file": file, "row": int(row)}
+                for file, row in zip(group["file"], group["row"])
+            ],
+        }
+        for identifier, group in hits.groupby("id", sort=False)
+    ]
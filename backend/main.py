@@ -19,6 +19,9 @@ import shutil
 from typing import Annotated
 from enum import Enum as PyEnum
 from fastapi.responses import FileResponse
+from ecr_writer import write_ecr_text
+from excel_writer import ESI_EXCEL_LAYOUT, PF_EXCEL_LAYOUT, write_output_excel
+from pf_engine import build_pf_ecr
 import zipfile
 from fastapi.responses import StreamingResponse
 from io  import BytesIO
@@ -254,9 +257,22 @@ async def read_users_me(current_user: UserModel = Depends(get_current_user)):
 @app.post("/process_folder", response_model=FileProcessResult)
 async def process_folder(
     folder_path: str = Form(...),
+    upload_date: Optional[str] = Form(
+        None, description="Date of upload in YYYY-MM-DD format; defaults to today"
+    ),
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    # The wage period of the ECR comes from the upload date, as in /process_folder_pf
+    upload_date_obj = None
+    if upload_date:
+        try:
+            upload_date_obj = datetime.strptime(upload_date, "%Y-%m-%d").date()
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid date format. Please use YYYY-MM-DD format"
+            )
     folder = Path(folder_path)
     if not folder.is_dir():
         error_message = f"Invalid folder path: {folder_path}"
@@ -389,35 +405,14 @@ async def process_folder(
 
                 # Process the data with correct logic
                 df[column_mapping["UAN No"]]=pd.to_numeric(df[column_mapping["UAN No"]],errors='coerce').fillna(0).astype(int)
-                uan_str = df[column_mapping["UAN No"]].astype(str)
-                uan_no = uan_str.str.replace("-","").astype("int64")
-                member_name = df[column_mapping["Employee Name"]]
-                gross_wages = df[column_mapping["Gross Wages"]].fillna(0).round().astype(int)
-                epf_wages = df[column_mapping["EPF Wages"]].fillna(0).round().astype(int)
-                lop_days = df[column_mapping["LOP Days"]]
-                
-                # Calculate derived fields
-                eps_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-                edli_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-                epf_contrib_remitted = (epf_wages * 0.12).round().astype(int)
-                eps_contrib_remitted = (eps_wages * 0.0833).round().astype(int)  # 8.33%
-                epf_eps_diff_remitted = (epf_contrib_remitted - eps_contrib_remitted).astype(int)
-                ncp_days = lop_days
-                refund_of_advances = 0
-
-                output_df = pd.DataFrame({
-                    "UAN No": uan_no,
-                    "MEMBER NAME": member_name,
-                    "GROSS WAGES": gross_wages,
-                    "EPF Wages": epf_wages,
-                    "EPS Wages": eps_wages,
-                    "EDLI WAGES": edli_wages,
-                    "EPF CONTRI REMITTED": epf_contrib_remitted,
-                    "EPS CONTRI REMITTED": eps_contrib_remitted,
-                    "EPF EPS DIFF REMITTED": epf_eps_diff_remitted,
-                    "NCP DAYS": ncp_days,
-                    "REFUND OF ADVANCES": refund_of_advances,
-                })
+                uan_no = df[column_mapping["UAN No"]].astype(str).str.replace("-","").astype("int64")
+                output_df = build_pf_ecr(
+                    df,
+                    column_mapping,
+                    uan_no=uan_no,
+                    ncp_days=df[column_mapping["LOP Days"]],
+                    wage_dates=upload_date_obj,
+                )
 
                 # Create output directories if they don't exist
                 excel_output_dir = Path("processed_excels")
@@ -430,16 +425,8 @@ async def process_folder(
                 text_filename = f"{original_stem}_{uuid.uuid4()}.txt"
                 excel_file_path = excel_output_dir / excel_filename
                 text_file_path = text_output_dir / text_filename
-                output_df.to_excel(excel_file_path, index=False)
-                # Prepare text file content
-                output_lines = [
-                    "#~#".join(map(str, row)) for row in output_df.values.tolist()
-                ]
-                header_line = "#~#".join(output_df.columns)
-                output_lines.insert(0, header_line)
-
-                with open(text_file_path, "w") as f:
-                    f.write("\n".join(output_lines))
+                write_output_excel(output_df, excel_file_path, PF_EXCEL_LAYOUT)
+                write_ecr_text(output_df, text_file_path)
 
                 # Save to database
                 db_file = ProcessedFile(
@@ -825,15 +812,8 @@ async def process_esi_file(
                 text_filename = f"{original_stem}_{uuid.uuid4()}_esi.txt"
                 excel_file_path = excel_output_dir / excel_filename
                 text_file_path = text_output_dir / text_filename
-                output_df.to_excel(excel_file_path, index=False)
-                # Prepare text file content
-                output_lines = [
-                    "#~#".join(map(str, row)) for row in output_df.values.tolist()
-                ]
-                header_line = "#~#".join(output_df.columns)
-                output_lines.insert(0, header_line)
-                with open(text_file_path, "w") as f:
-                    f.write("\n".join(output_lines))
+                write_output_excel(output_df, excel_file_path, ESI_EXCEL_LAYOUT)
+                write_ecr_text(output_df, text_file_path)
                 # Save to database
                 db_file = ProcessedFile(
                     user_id=current_user.id,
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Time, ForeignKey, Text, Enum, create_engine,Date
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Time, ForeignKey, Text, Enum, create_engine,Date, Index, inspect, text
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 from enum import Enum as PyEnum
@@ -34,6 +34,15 @@ class UserModel(Base):
     processed_files_esi = relationship("ProcessedFileESI", back_populates="user")
 class ProcessedFilePF(Base):
     __tablename__ = "processed_files_pf"
+    # Composite indexes for the listing (upload_date, user_id, newest first),
+    # consolidation and dashboard (user_id/status, created_at range) queries
+    __table_args__ = (
+        Index("ix_processed_files_pf_user_upload_created", "user_id", "upload_date", "created_at"),
+        Index("ix_processed_files_pf_upload_created", "upload_date", "created_at"),
+        Index("ix_processed_files_pf_user_created", "user_id", "created_at"),
+        Index("ix_processed_files_pf_status_created", "status", "created_at"),
+        Index("ix_processed_files_pf_created", "created_at"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     filename = Column(String, nullable=True)
@@ -46,9 +55,21 @@ class ProcessedFilePF(Base):
     remittance_submitted = Column(Boolean, default=False, nullable=False)
     remittance_date = Column(Date, nullable=True)
     remittance_challan_path = Column(String, nullable=True)
+    excel_engine = Column(String, nullable=True)
+    # Rows left out of the output by UAN / ESI number validation
+    rejected_rows = Column(Integer, nullable=True)
     user = relationship("UserModel", back_populates="processed_files_pf")
 class ProcessedFileESI(Base):
     __tablename__ = "processed_files_esi"
+    # Composite indexes for the listing (upload_date, user_id, newest first),
+    # consolidation and dashboard (user_id/status, created_at range) queries
+    __table_args__ = (
+        Index("ix_processed_files_esi_user_upload_created", "user_id", "upload_date", "created_at"),
+        Index("ix_processed_files_esi_upload_created", "upload_date", "created_at"),
+        Index("ix_processed_files_esi_user_created", "user_id", "created_at"),
+        Index("ix_processed_files_esi_status_created", "status", "created_at"),
+        Index("ix_processed_files_esi_created", "created_at"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     filename = Column(String, nullable=True)
@@ -61,7 +82,30 @@ class ProcessedFileESI(Base):
     remittance_submitted = Column(Boolean, default=False, nullable=False)
     remittance_date = Column(Date, nullable=True)
     remittance_challan_path = Column(String, nullable=True)
+    excel_engine = Column(String, nullable=True)
+    # Rows left out of the output by UAN / ESI number validation
+    rejected_rows = Column(Integer, nullable=True)
+    # Employee count, ESI gross and contribution sums of the output
+    totals = Column(JSON, nullable=True)
     user = relationship("UserModel", back_populates="processed_files_esi")
+class ConsolidatedFilePF(Base):
+    # One ECR merged from a user's PF files of an upload date. Kept out of
+    # processed_files_pf so it is not counted as a processed file by the
+    # dashboard, its rollups or the listings.
+    __tablename__ = "consolidated_files_pf"
+    __table_args__ = (
+        Index("ix_consolidated_files_pf_user_upload_created", "user_id", "upload_date", "created_at"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    filename = Column(String, nullable=True)
+    filepath = Column(String, nullable=True)
+    manifest_file = Column(String, nullable=True)
+    message = Column(Text, nullable=True)
+    upload_date = Column(Date, nullable=True)
+    source_files = Column(Integer, nullable=True)
+    employees = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
 UserModel.processed_files_pf = relationship("ProcessedFilePF", back_populates="user")
 UserModel.processed_files_esi = relationship("ProcessedFileESI", back_populates="user")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -85,4 +129,70 @@ class ProcessingSchedule(Base):
     last_run = Column(DateTime, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
 
-# Include all other SQLAlchemy models here
\ No newline at end of file
+class ProcessingJob(Base):
+    __tablename__ = "processing_jobs"
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    scheme = Column(String(10), nullable=False)
+    folder_path = Column(String, nullable=False)
+    upload_date = Column(Date, nullable=False)
+    incremental = Column(Boolean, default=False, nullable=False)
+    # queued -> running -> done, or failed if the job itself could not finish
+    status = Column(String(10), default="queued", nullable=False)
+    message = Column(Text, nullable=True)
+    total_files = Column(Integer, default=0, nullable=False)
+    processed_files = Column(Integer, default=0, nullable=False)
+    # One FileProcessResult per workbook, appended as each one finishes
+    results = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class DashboardRollup(Base):
+    # Processed-file counts per user, scheme and month of created_at, kept in
+    # step with processed_files_pf / processed_files_esi by dashboard_rollup.py.
+    # user_id 0 holds records without a user; year/month 0 those without created_at.
+    __tablename__ = "dashboard_rollups"
+    user_id = Column(Integer, primary_key=True)
+    scheme = Column(String(10), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    total = Column(Integer, default=0, nullable=False)
+    success = Column(Integer, default=0, nullable=False)
+    error = Column(Integer, default=0, nullable=False)
+    remittance_submitted = Column(Integer, default=0, nullable=False)
+    # Remittances submitted within 7 days of processing
+    timely = Column(Integer, default=0, nullable=False)
+
+class DashboardDelayRollup(Base):
+    # Submitted remittances per user, scheme and whole days between processing
+    # and remittance, over all months (the dashboard shows them for all years)
+    __tablename__ = "dashboard_delay_rollups"
+    user_id = Column(Integer, primary_key=True)
+    scheme = Column(String(10), primary_key=True)
+    delay_days = Column(Integer, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+# Include all other SQLAlchemy models here
+
+
+def migrate_schema(bind=engine):
+    # create_all() only creates missing tables, so add columns and indexes that
+    # were introduced after an existing database was created. New columns must be nullable.
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(
+                    text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                )
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
\ No newline at end of file
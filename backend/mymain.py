@@ -19,6 +19,9 @@ import shutil
 from fastapi.responses import StreamingResponse
 from typing import Annotated
 from fastapi.responses import FileResponse
+from ecr_writer import write_ecr_text
+from excel_writer import PF_EXCEL_LAYOUT, write_output_excel
+from pf_engine import build_pf_ecr
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Time, ForeignKey, Text, Enum, create_engine,Date
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
@@ -487,61 +490,16 @@ async def process_folder(
                 
 
                 # Process the data with correct logic
-                uan_no = df[column_mapping['UAN No']].astype(str).str.replace("-","")
-                member_name = df[column_mapping["Employee Name"]]
-                gross_wages = df[column_mapping["Gross Wages"]].fillna(0).round().astype(int)
-                epf_wages = df[column_mapping["EPF Wages"]].fillna(0).round().astype(int)
-                lop_days_raw = df[column_mapping["LOP Days"]]
-
-                def custom_round(x):
-                    if pd.isna(x):
-                        return 0
-                    decimal_part = x - int(x)
-                    if decimal_part >= 0.5:
-                        return math.ceil(x)
-                    else:
-                        return math.floor(x)
-                lop_days = lop_days_raw.apply(custom_round)
-
-                # Calculate derived fields
-                eps_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-                edli_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-                epf_contrib_remitted = (epf_wages * 0.12).round().astype(int)
-                eps_contrib_remitted = (eps_wages * 0.0833).round().astype(int)
-                epf_eps_diff_remitted = (epf_contrib_remitted - eps_contrib_remitted).astype(int)
-                ncp_days = lop_days
-                refund_of_advances = 0
-
-                output_df = pd.DataFrame({
-                    "UAN No": uan_no,
-                    "MEMBER NAME": member_name,
-                    "GROSS WAGES": gross_wages,
-                    "EPF Wages": epf_wages,
-                    "EPS Wages": eps_wages,
-                    "EDLI WAGES": edli_wages,
-                    "EPF CONTRI REMITTED": epf_contrib_remitted,
-                    "EPS CONTRI REMITTED": eps_contrib_remitted,
-                    "EPF EPS DIFF REMITTED": epf_eps_diff_remitted,
-                    "NCP DAYS": ncp_days,
-                    "REFUND OF ADVANCES": refund_of_advances,
-                })
+                output_df = build_pf_ecr(df, column_mapping, wage_dates=upload_date_obj)
 
                 original_stem = excel_file.stem
                 excel_filename = f"{original_stem}_{uuid.uuid4()}.xlsx"
                 text_filename = f"{original_stem}_{uuid.uuid4()}.txt"
                 excel_file_path = excel_output_dir / excel_filename
                 text_file_path = text_output_dir / text_filename
-                output_df.to_excel(excel_file_path, index=False)
+                write_output_excel(output_df, excel_file_path, PF_EXCEL_LAYOUT)
 
-                # Prepare text file content
-                output_lines = [
-                    "#~#".join(map(str, row)) for row in output_df.values.tolist()
-                ]
-                header_line = "#~#".join(output_df.columns)
-                output_lines.insert(0, header_line)
-
-                with open(text_file_path, "w") as f:
-                    f.write("\n".join(output_lines))
+                write_ecr_text(output_df, text_file_path)
 
                 # Save to database
                 db_file = ProcessedFilePF(
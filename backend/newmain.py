@@ -38,12 +38,53 @@ from apscheduler.triggers.cron import CronTrigger
 from models import *
 from schemas import *
 from utils import *
+from artifacts import artifacts_available, resolve_artifact
+from excel_reader import MissingColumnsError
+from dashboard_cache import (
+    dashboard_cache_key,
+    dashboard_cache_stats,
+    get_cached_dashboard,
+    get_dashboard_cache_backend,
+    invalidate_dashboard,
+    store_dashboard,
+)
+from dashboard_rollup import backfill_dashboard_rollups
+from ecr_consolidation import consolidate_pf_records
+from ecr_store import commit_store_fragment, discard_store_fragment
+from rate_tables import load_rate_tables
+from file_queries import (
+    consolidation_sources,
+    dashboard_counts,
+    processed_files_for_date,
+    recent_processed_files,
+    top_users_by_files,
+)
+from folder_manifest import FolderManifest
+from file_processing import (
+    NoValidRowsError,
+    convert_chunks,
+    convert_esi_workbook,
+    convert_pf_workbook,
+    find_batch_duplicate_uans,
+    open_workbook_chunks,
+    uan_index_path,
+)
+from processing_jobs import (
+    JOB_SCHEMES,
+    create_processing_job,
+    fail_interrupted_jobs,
+    run_processing_job,
+)
+from worker_pool import PoolSaturatedError, get_worker_pool, shutdown_worker_pool
 import zipfile
 from io import BytesIO
 import math
 
 # Create a FastAPI instance
 app = FastAPI()
+# Handlers that touch the database, the filesystem or pandas are declared with
+# plain `def`: FastAPI runs those in its worker threadpool, so a long folder job
+# does not stall the event loop serving /login, /dashboard or downloads.
 # Add CORS middleware to allow requests from your frontend
 app.add_middleware(
     CORSMiddleware,
@@ -54,9 +95,85 @@ app.add_middleware(
 )
 
 
+@app.on_event("shutdown")
+def stop_worker_pool():
+    shutdown_worker_pool()
+
+
+def open_worker_batch(user_id: int, tasks: int):
+    # Admit a folder run of up to ``tasks`` pool tasks, or refuse it straight away
+    try:
+        return get_worker_pool().open_batch(user_id, tasks)
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+def reused_file_result(record) -> FileProcessResult:
+    # Result reported for a workbook skipped by incremental processing
+    return FileProcessResult(
+        file_path=record.filepath,
+        status=record.status,
+        message="File unchanged since last run; existing output reused.",
+        upload_date=record.upload_date,
+        excel_engine=record.excel_engine,
+        record_id=record.id,
+        totals=getattr(record, "totals", None),
+        rejected_rows=record.rejected_rows,
+    )
+
+
+def consolidate_pf_outputs(
+    db: Session, records: list, user_id: int, upload_date_obj: date
+) -> FileProcessResult:
+    # Write one ECR for all the records. It is saved in its own table, not as
+    # a processed PF file, and served by /processed_files_pf/consolidated
+    date_folder_name = upload_date_obj.strftime("%Y-%m-%d")
+    excel_output_dir = Path("processed_excels_pf_new") / date_folder_name
+    text_output_dir = Path("processed_texts_pf_new") / date_folder_name
+    excel_output_dir.mkdir(parents=True, exist_ok=True)
+    text_output_dir.mkdir(parents=True, exist_ok=True)
+    consolidated = consolidate_pf_records(
+        records, upload_date_obj, excel_output_dir, text_output_dir
+    )
+    message = (
+        f"Consolidated ECR of {consolidated['sources']} files: "
+        f"{consolidated['employees']} employees, "
+        f"{consolidated['merged_uans']} UAN(s) merged across files."
+    )
+    if consolidated["capped_ncp_days"]:
+        message += (
+            f" NCP days of {consolidated['capped_ncp_days']} UAN(s) exceeded the "
+            "days in the month and were capped; see the manifest."
+        )
+    db_file = ConsolidatedFilePF(
+        user_id=user_id,
+        filename=f"CONSOLIDATED_{date_folder_name}",
+        filepath=",".join(consolidated["output_files"]),
+        manifest_file=consolidated["manifest_file"],
+        message=message,
+        upload_date=upload_date_obj,
+        source_files=consolidated["sources"],
+        employees=consolidated["employees"],
+    )
+    db.add(db_file)
+    db.commit()
+    return FileProcessResult(
+        file_path=db_file.filepath,
+        status="success",
+        message=message,
+        upload_date=upload_date_obj,
+        record_id=db_file.id,
+        manifest_file=consolidated["manifest_file"],
+    )
+
+
 # Endpoint for user registration
 @app.post("/register", response_model=UserResponse)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+def register_user(user: UserCreate, db: Session = Depends(get_db)):
     db_user = db.query(UserModel).filter(UserModel.username == user.username).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Username already taken")
@@ -85,7 +202,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
 
 # Endpoint for user login and token generation
 @app.post("/login", response_model=Token)
-async def login_user(
+def login_user(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
 ):
     user = db.query(UserModel).filter(UserModel.username == form_data.username).first()
@@ -106,7 +223,7 @@ async def login_user(
 
 
 @app.put("/change_pass", response_model=MessageResponse)
-async def change_password(
+def change_password(
     password_data: ChangePasswordRequest,
     db: Session = Depends(get_db),
 ):
@@ -140,7 +257,7 @@ async def read_users_me(current_user: UserModel = Depends(get_current_user)):
 
 
 @app.get("/users")
-async def read_users(
+def read_users(
     current_user: UserModel = Depends(get_current_user), db: Session = Depends(get_db)
 ):
     result = []
@@ -170,10 +287,11 @@ def refresh_token(req:RefreshTokenRequest,db:Session = Depends(get_db)):
 
 
 @app.post("/process_folder_pf", response_model=FileProcessResult)
-async def process_folder(
+def process_folder(
     folder_path: str = Form(..., min_length=3, max_length=500),
     current_user: UserModel = Depends(require_hr_or_admin),
     upload_date: str = Form(..., description="Date of Upload in YYYY-MM-DD"),
+    incremental: bool = Form(False, description="Skip workbooks unchanged since the last run"),
     db: Session = Depends(get_db),
 ):
     try:
@@ -197,6 +315,7 @@ async def process_folder(
         )
         db.add(db_file)
         db.commit()
+        invalidate_dashboard(current_user.id)
         raise HTTPException(status_code=400, detail=error_message)
 
     excel_files = list(folder.glob("*.xls*"))
@@ -211,11 +330,18 @@ async def process_folder(
         )
         db.add(db_file)
         db.commit()
+        invalidate_dashboard(current_user.id)
         raise HTTPException(status_code=400, detail=error_message)
 
     processed_files = []
     overall_status = "success"
     overall_message = "All files processed successfully."
+    manifest = FolderManifest("pf", folder, upload_date_obj)
+    if incremental:
+        excel_files, unchanged_records = manifest.split_unchanged(
+            excel_files, db, ProcessedFilePF, current_user.id
+        )
+        processed_files.extend(reused_file_result(record) for record in unchanged_records)
     excel_output_dir = Path("processed_excels_pf_new") / date_folder_name
     text_output_dir = Path("processed_texts_pf_new") / date_folder_name
     excel_output_dir.mkdir(parents=True, exist_ok=True)
@@ -224,12 +350,10 @@ async def process_folder(
     for excel_file in excel_files:
         try:
             try:
-                if excel_file.suffix == ".xlsx":
-                    df = pd.read_excel(excel_file, dtype={"UAN No": str})
-                else:
-                    df = pd.read_excel(excel_file, engine="xlrd", dtype={"UAN No": str})
+                # Probe the header first so missing columns fail before the body is read
+                column_mapping, chunks = open_workbook_chunks(excel_file, "pf")
 
-                if df.empty:
+                if chunks is None:
                     error_message = f"Excel file {excel_file.name} is empty."
                     db_file = ProcessedFilePF(
                         user_id=current_user.id,
@@ -251,8 +375,8 @@ async def process_folder(
                     )
                     continue
 
-            except Exception as e:
-                error_message = f"Error reading Excel file {excel_file.name}: {str(e)}"
+            except MissingColumnsError as e:
+                error_message = f"Missing required columns in {excel_file.name}: {', '.join(e.missing)}"
                 db_file = ProcessedFilePF(
                     user_id=current_user.id,
                     filename=excel_file.name,
@@ -272,102 +396,29 @@ async def process_folder(
                     )
                 )
                 continue
-            try:
-                # Check for required columns with alternative names
-                required_columns = {
-                    "UAN No": ["UAN No"],
-                    "Employee Name": ["Employee Name"],
-                    "Gross Wages": ["Total Salary", "Gross Salary"],
-                    "EPF Wages": ["PF Gross", "EPF Gross"],
-                    "LOP Days": ["LOP", "LOP Days"],
-                }
-
-                # Find actual column names in the DataFrame
-                column_mapping = {}
-                missing_columns = []
-
-                for field, alternatives in required_columns.items():
-                    found = False
-                    for alt in alternatives:
-                        if alt in df.columns:
-                            column_mapping[field] = alt
-                            found = True
-                            break
-                    if not found:
-                        missing_columns.append(field)
-
-                if missing_columns:
-                    error_message = f"Missing required columns in {excel_file.name}: {', '.join(missing_columns)}"
-                    db_file = ProcessedFilePF(
-                        user_id=current_user.id,
-                        filename=excel_file.name,
-                        filepath=str(excel_file),
+            except Exception as e:
+                error_message = f"Error reading Excel file {excel_file.name}: {str(e)}"
+                db_file = ProcessedFilePF(
+                    user_id=current_user.id,
+                    filename=excel_file.name,
+                    filepath=str(excel_file),
+                    status="error",
+                    message=error_message,
+                )
+                db.add(db_file)
+                db.commit()
+                overall_status = "error"
+                overall_message = "Some files had errors during processing."
+                processed_files.append(
+                    FileProcessResult(
+                        file_path=str(excel_file),
                         status="error",
                         message=error_message,
                     )
-                    db.add(db_file)
-                    db.commit()
-                    overall_status = "error"
-                    overall_message = "Some files had errors during processing."
-                    processed_files.append(
-                        FileProcessResult(
-                            file_path=str(excel_file),
-                            status="error",
-                            message=error_message,
-                        )
-                    )
-                    continue
-
-                # Process the data with correct logic
-                uan_no = df[column_mapping["UAN No"]].astype(str).str.replace("-", "")
-                member_name = df[column_mapping["Employee Name"]]
-                gross_wages = (
-                    df[column_mapping["Gross Wages"]].fillna(0).round().astype(int)
-                )
-                epf_wages = (
-                    df[column_mapping["EPF Wages"]].fillna(0).round().astype(int)
-                )
-                lop_days_raw = df[column_mapping["LOP Days"]]
-
-                def custom_round(x):
-                    if pd.isna(x):
-                        return 0
-                    decimal_part = x - int(x)
-                    if decimal_part >= 0.5:
-                        return math.ceil(x)
-                    else:
-                        return math.floor(x)
-
-                lop_days = lop_days_raw.apply(custom_round)
-                # non_textual_rows = df[~df["Employee Name"].astype(str).str.contains("total", case=False, na=False)]
-                # Calculate derived fields
-                eps_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-                edli_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-                epf_contrib_remitted = (epf_wages * 0.12).round().astype(int)
-                eps_contrib_remitted = (eps_wages * 0.0833).round().astype(int)  # 8.33%
-                epf_eps_diff_remitted = (
-                    epf_contrib_remitted - eps_contrib_remitted
-                ).astype(int)
-                ncp_days = lop_days
-                refund_of_advances = 0
-
-                output_df = pd.DataFrame(
-                    {
-                        "UAN No": uan_no,
-                        "MEMBER NAME": member_name,
-                        "GROSS WAGES": gross_wages,
-                        "EPF Wages": epf_wages,
-                        "EPS Wages": eps_wages,
-                        "EDLI WAGES": edli_wages,
-                        "EPF CONTRI REMITTED": epf_contrib_remitted,
-                        "EPS CONTRI REMITTED": eps_contrib_remitted,
-                        "EPF EPS DIFF REMITTED": epf_eps_diff_remitted,
-                        "NCP DAYS": ncp_days,
-                        "REFUND OF ADVANCES": refund_of_advances,
-                    }
                 )
-
-                # Create output directories if they don't exist
+                continue
+            result = None
+            try:
                 """excel_output_dir = Path("processed_excels_pf")
                 excel_output_dir.mkdir(parents=True, exist_ok=True)
                 text_output_dir = Path("processed_texts_pf")
@@ -378,17 +429,15 @@ async def process_folder(
                 text_filename = f"{original_stem}_{uuid.uuid4()}.txt"
                 excel_file_path = excel_output_dir / excel_filename
                 text_file_path = text_output_dir / text_filename
-                output_df.to_excel(excel_file_path, index=False)
-                # Prepare text file conten
-
-                output_lines = [
-                    "#~#".join(map(str, row)) for row in output_df.values.tolist()
-                ]
-                header_line = "#~#".join(output_df.columns)
-                output_lines.insert(0, header_line)
-
-                with open(text_file_path, "w") as f:
-                    f.write("\n".join(output_lines))
+                # Validated, converted and written a chunk at a time
+                result = convert_chunks(
+                    "pf",
+                    chunks,
+                    column_mapping,
+                    excel_file_path,
+                    text_file_path,
+                    upload_date_obj,
+                )
 
                 # Save to database
                 db_file = ProcessedFilePF(
@@ -398,18 +447,32 @@ async def process_folder(
                     status="success",
                     message="File processed successfully.",
                     upload_date=upload_date_obj,
+                    excel_engine=result["excel_engine"],
+                    rejected_rows=result["rejected_rows"],
                 )
                 db.add(db_file)
                 db.commit()
+                manifest.mark_processed(excel_file, db_file.id)
+                # Best-effort copy to the ECR store: a failure is logged and
+                # leaves the committed record alone
+                commit_store_fragment(result["store_fragment"], db_file.id)
                 processed_files.append(
                     FileProcessResult(
                         file_path=f"{str(excel_file_path)},{str(text_file_path)}",
                         status="success",
                         message="File processed successfully.",
+                        excel_engine=result["excel_engine"],
+                        parse_cache_hit=result["parse_cache_hit"],
+                        excel_write=result["excel_write"],
+                        record_id=db_file.id,
+                        rejected_rows=result["rejected_rows"],
+                        rejects_file=result["rejects_file"],
                     )
                 )
 
             except Exception as e:
+                if result is not None:
+                    discard_store_fragment(result["store_fragment"])
                 error_message = f"Error processing file {excel_file.name}: {str(e)}"
                 db_file = ProcessedFilePF(
                     user_id=current_user.id,
@@ -441,22 +504,28 @@ async def process_folder(
             )
             db.add(db_file)
             db.commit()
+            invalidate_dashboard(current_user.id)
             raise HTTPException(status_code=500, detail=error_message)
 
+    invalidate_dashboard(current_user.id)
+    manifest.save()
     return FileProcessResult(
         file_path=folder_path,
         status=overall_status,
         message=overall_message,
         upload_date=upload_date_obj,
+        files=processed_files,
     )
 
 
 # **********************************concurrent processing of files endpoint**********************************
 @app.post("/process_folder_pf_concurrent", response_model=FileProcessResult)
-async def process_folder(
+def process_folder(
     folder_path: str = Form(..., min_length=3, max_length=500),
     current_user: UserModel = Depends(require_hr_or_admin),
     upload_date: str = Form(..., description="Date of Upload in YYYY-MM-DD"),
+    incremental: bool = Form(False, description="Skip workbooks unchanged since the last run"),
+    consolidate: bool = Form(False, description="Also write one ECR merging every file of the batch"),
     db: Session = Depends(get_db),
 ):
     try:
@@ -481,6 +550,7 @@ async def process_folder(
         )
         db.add(db_file)
         db.commit()
+        invalidate_dashboard(current_user.id)
         raise HTTPException(status_code=400, detail=error_message)
 
     excel_files = list(folder.glob("*.xls*"))
@@ -495,6 +565,7 @@ async def process_folder(
         )
         db.add(db_file)
         db.commit()
+        invalidate_dashboard(current_user.id)
         raise HTTPException(status_code=400, detail=error_message)
 
     # Prepare output directories
@@ -503,200 +574,167 @@ async def process_folder(
     excel_output_dir.mkdir(parents=True, exist_ok=True)
     text_output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Function to process a single file
-    def process_single_file(excel_file: Path) -> dict:
-        file_result = {
-            "file_path": str(excel_file),
-            "status": "success",
-            "message": "File processed successfully",
-            "db_record": None,
-            "output_files": None,
-        }
-
-        try:
-            # Read Excel file
-            if excel_file.suffix == ".xlsx":
-                df = pd.read_excel(excel_file, dtype={"UAN No": str})
-            else:
-                df = pd.read_excel(excel_file, engine="xlrd", dtype={"UAN No": str})
-
-            if df.empty:
-                raise ValueError("Excel file is empty")
-
-            # Check for required columns
-            required_columns = {
-                "UAN No": ["UAN No"],
-                "Employee Name": ["Employee Name"],
-                "Gross Wages": ["Total Salary", "Gross Salary"],
-                "EPF Wages": ["PF Gross", "EPF Gross"],
-                "LOP Days": ["LOP", "LOP Days"],
-            }
-
-            column_mapping = {}
-            missing_columns = []
-            for field, alternatives in required_columns.items():
-                found = False
-                for alt in alternatives:
-                    if alt in df.columns:
-                        column_mapping[field] = alt
-                        found = True
-                        break
-                if not found:
-                    missing_columns.append(field)
-
-            if missing_columns:
-                raise ValueError(
-                    f"Missing required columns: {', '.join(missing_columns)}"
-                )
-
-            # Process data
-            uan_no = df[column_mapping["UAN No"]].astype(str).str.replace("-", "")
-            member_name = df[column_mapping["Employee Name"]]
-            gross_wages = (
-                df[column_mapping["Gross Wages"]].fillna(0).round().astype(int)
-            )
-            epf_wages = df[column_mapping["EPF Wages"]].fillna(0).round().astype(int)
-            lop_days_raw = df[column_mapping["LOP Days"]]
-
-            def custom_round(x):
-                if pd.isna(x):
-                    return 0
-                decimal_part = x - int(x)
-                if decimal_part >= 0.5:
-                    return math.ceil(x)
-                else:
-                    return math.floor(x)
-
-            lop_days = lop_days_raw.apply(custom_round)
-            eps_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-            edli_wages = epf_wages.apply(lambda x: min(x, 15000) if x > 0 else 0)
-            epf_contrib_remitted = (epf_wages * 0.12).round().astype(int)
-            eps_contrib_remitted = (eps_wages * 0.0833).round().astype(int)
-            epf_eps_diff_remitted = (
-                epf_contrib_remitted - eps_contrib_remitted
-            ).astype(int)
-            ncp_days = lop_days
-            refund_of_advances = 0
-
-            output_df = pd.DataFrame(
-                {
-                    "UAN No": uan_no,
-                    "MEMBER NAME": member_name,
-                    "GROSS WAGES": gross_wages,
-                    "EPF Wages": epf_wages,
-                    "EPS Wages": eps_wages,
-                    "EDLI WAGES": edli_wages,
-                    "EPF CONTRI REMITTED": epf_contrib_remitted,
-                    "EPS CONTRI REMITTED": eps_contrib_remitted,
-                    "EPF EPS DIFF REMITTED": epf_eps_diff_remitted,
-                    "NCP DAYS": ncp_days,
-                    "REFUND OF ADVANCES": refund_of_advances,
-                }
-            )
-
-            # Generate output files
-            original_stem = excel_file.stem
-            unique_id = uuid.uuid4()
-            excel_filename = f"{original_stem}_{unique_id}.xlsx"
-            text_filename = f"{original_stem}_{unique_id}.txt"
-            excel_file_path = excel_output_dir / excel_filename
-            text_file_path = text_output_dir / text_filename
-
-            output_df.to_excel(excel_file_path, index=False)
-
-            output_lines = [
-                "#~#".join(map(str, row)) for row in output_df.values.tolist()
-            ]
-            header_line = "#~#".join(output_df.columns)
-            output_lines.insert(0, header_line)
-
-            with open(text_file_path, "w") as f:
-                f.write("\n".join(output_lines))
-
-            # Prepare DB record
-            db_record = ProcessedFilePF(
-                user_id=current_user.id,
-                filename=excel_file.name,
-                filepath=f"{str(excel_file_path)},{str(text_file_path)}",
-                status="success",
-                message="File processed successfully.",
-                upload_date=upload_date_obj,
-            )
-
-            file_result.update(
-                {
-                    "db_record": db_record,
-                    "output_files": (str(excel_file_path), str(text_file_path)),
-                }
-            )
-
-        except Exception as e:
-            file_result.update(
-                {
-                    "status": "error",
-                    "message": f"Error processing file {excel_file.name}: {str(e)}",
-                    "db_record": ProcessedFilePF(
-                        user_id=current_user.id,
-                        filename=excel_file.name,
-                        filepath=str(excel_file),
-                        status="error",
-                        message=f"Error processing file {excel_file.name}: {str(e)}",
-                    ),
-                }
-            )
-
-        return file_result
-
     # Process files in parallel
     processed_files = []
     overall_status = "success"
     overall_message = "All files processed successfully."
-    db_records = []
+    file_results = []
+    manifest = FolderManifest("pf", folder, upload_date_obj)
+    unchanged_records = []
+    if incremental:
+        excel_files, unchanged_records = manifest.split_unchanged(
+            excel_files, db, ProcessedFilePF, current_user.id
+        )
+        processed_files.extend(reused_file_result(record) for record in unchanged_records)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    # One task per workbook converted or reused index read, then at most one
+    # occurrence read per file for the duplicate check
+    tasks = 2 * (len(excel_files) + len(unchanged_records))
+    with open_worker_batch(current_user.id, tasks) as batch:
         future_to_file = {
-            executor.submit(process_single_file, file): file for file in excel_files
+            batch.submit(
+                convert_pf_workbook, file, excel_output_dir, text_output_dir, upload_date_obj
+            ): file
+            for file in excel_files
         }
 
         for future in concurrent.futures.as_completed(future_to_file):
-            file_result = future.result()
-            processed_files.append(
-                FileProcessResult(
-                    file_path=file_result["file_path"],
-                    status=file_result["status"],
+            excel_file = future_to_file[future]
+            try:
+                file_result = future.result()
+            except Exception as e:
+                # e.g. a worker process killed by the OS (BrokenProcessPool)
+                file_result = {
+                    "file_path": str(excel_file),
+                    "status": "error",
+                    "message": f"Error processing file {excel_file.name}: {str(e)}",
+                    "output_files": None,
+                    "excel_engine": None,
+                }
+            # Workers only return paths and status; the DB rows are built here
+            if file_result["status"] == "success":
+                file_result["db_record"] = ProcessedFilePF(
+                    user_id=current_user.id,
+                    filename=excel_file.name,
+                    filepath=",".join(file_result["output_files"]),
+                    status="success",
+                    message="File processed successfully.",
+                    upload_date=upload_date_obj,
+                    excel_engine=file_result["excel_engine"],
+                    rejected_rows=file_result["rejected_rows"],
+                )
+            else:
+                file_result["db_record"] = ProcessedFilePF(
+                    user_id=current_user.id,
+                    filename=excel_file.name,
+                    filepath=str(excel_file),
+                    status="error",
                     message=file_result["message"],
                 )
-            )
-
-            if file_result["db_record"]:
-                db_records.append(file_result["db_record"])
+            file_results.append(file_result)
 
             if file_result["status"] == "error":
                 overall_status = "error"
                 overall_message = "Some files had errors during processing."
 
-    # Bulk insert all records
+        # The same employee in two branch workbooks would be remitted twice.
+        # Workbooks reused by incremental mode take part through their UAN index.
+        indexes = {
+            str(folder / record.filename): str(uan_index_path(Path(record.filepath.split(",")[1])))
+            for record in unchanged_records
+        }
+        digests = {}
+        for file_result in file_results:
+            if file_result["status"] == "success":
+                indexes[file_result["file_path"]] = file_result["uan_index"]
+                digests[file_result["file_path"]] = file_result["uan_digests"]
+        duplicate_uans, duplicate_check_skipped = find_batch_duplicate_uans(
+            indexes, batch.submit, digests
+        )
+
+    # Insert all records in one transaction; add_all (unlike bulk_save_objects)
+    # fills in the ids needed by the manifest
     try:
-        db.bulk_save_objects(db_records)
+        db.add_all(
+            [file_result["db_record"] for file_result in file_results if file_result["db_record"]]
+        )
         db.commit()
     except Exception as e:
         db.rollback()
+        for file_result in file_results:
+            discard_store_fragment(file_result.get("store_fragment"))
         raise HTTPException(
             status_code=500, detail=f"Error saving records to database: {str(e)}"
         )
+    # The commit hook invalidates too; this keeps the endpoint correct on its own
+    invalidate_dashboard(current_user.id)
+
+    for file_result in file_results:
+        db_record = file_result["db_record"]
+        if file_result["status"] == "success":
+            manifest.mark_processed(Path(file_result["file_path"]), db_record.id)
+            commit_store_fragment(file_result.get("store_fragment"), db_record.id)
+        processed_files.append(
+            FileProcessResult(
+                file_path=file_result["file_path"],
+                status=file_result["status"],
+                message=file_result["message"],
+                excel_engine=file_result["excel_engine"],
+                parse_cache_hit=file_result.get("parse_cache_hit"),
+                excel_write=file_result.get("excel_write"),
+                record_id=db_record.id if db_record else None,
+                rejected_rows=file_result.get("rejected_rows"),
+                rejects_file=file_result.get("rejects_file"),
+            )
+        )
+    manifest.save()
+
+    if duplicate_uans:
+        overall_message += (
+            f" {len(duplicate_uans)} UAN(s) appear in more than one file."
+        )
+    if duplicate_check_skipped:
+        overall_message += (
+            f" Duplicate UAN check incomplete: {len(duplicate_check_skipped)}"
+            " file(s) could not be checked."
+        )
+
+    consolidated = None
+    success_records = unchanged_records + [
+        file_result["db_record"]
+        for file_result in file_results
+        if file_result["status"] == "success"
+    ]
+    if consolidate and success_records:
+        try:
+            # Sorted so a UAN merged across files keeps the same member name every run
+            consolidated = consolidate_pf_outputs(
+                db,
+                sorted(success_records, key=lambda record: record.filename),
+                current_user.id,
+                upload_date_obj,
+            )
+        except Exception as e:
+            overall_status = "error"
+            overall_message += f" Consolidation failed: {str(e)}"
 
     return FileProcessResult(
         file_path=folder_path,
         status=overall_status,
         message=overall_message,
         upload_date=upload_date_obj,
+        duplicate_uans=duplicate_uans,
+        duplicate_check_skipped=duplicate_check_skipped or None,
+        consolidated=consolidated,
+        files=processed_files,
     )
 
 
 @app.post("/esi_upload_concurrent", response_model=FileProcessResult)
-async def process_esi_file(
+def process_esi_file(
     folder_path: str = Form(..., min_length=3, max_length=500),
     upload_date: str = Form(..., description="Date of Upload in YYYY-MM-DD format"),
+    incremental: bool = Form(False, description="Skip workbooks unchanged since the last run"),
     current_user: UserModel = Depends(require_hr_or_admin),
     db: Session = Depends(get_db),
 ):
@@ -721,6 +759,7 @@ async def process_esi_file(
         )
         db.add(db_file)
         db.commit()
+        invalidate_dashboard(current_user.id)
         raise HTTPException(status_code=400, detail=error_message)
 
     excel_files = list(folder.glob("*.xls*"))
@@ -735,6 +774,7 @@ async def process_esi_file(
         )
         db.add(db_file)
         db.commit()
+        invalidate_dashboard(current_user.id)
         raise HTTPException(status_code=400, detail=error_message)
 
     # Prepare output directories
@@ -743,206 +783,184 @@ async def process_esi_file(
     excel_output_dir.mkdir(parents=True, exist_ok=True)
     text_output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Function to process a single ESI file
-    def process_single_esi_file(excel_file: Path) -> dict:
-        file_result = {
-            "file_path": str(excel_file),
-            "status": "success",
-            "message": "File processed successfully",
-            "db_record": None,
-            "output_files": None,
-        }
-
-        try:
-            # Read Excel file
-            if excel_file.suffix == ".xlsx":
-                df = pd.read_excel(excel_file, dtype={"ESI N0": str})
-            else:
-                df = pd.read_excel(excel_file, engine="xlrd", dtype={"ESI N0": str})
-
-            if df.empty:
-                raise ValueError("Excel file is empty")
-
-            # Check for required columns
-            required_columns = {
-                "ESI No": ["ESI N0"],
-                "Employee Name": ["Employee Name"],
-                "ESI Gross": ["ESI Gross"],
-                "Worked Days": ["Worked days"],
-            }
-
-            column_mapping = {}
-            missing_columns = []
-            for field, alternatives in required_columns.items():
-                found = False
-                for alt in alternatives:
-                    if alt in df.columns:
-                        column_mapping[field] = alt
-                        found = True
-                        break
-                if not found:
-                    missing_columns.append(field)
-
-            if missing_columns:
-                raise ValueError(
-                    f"Missing required columns: {', '.join(missing_columns)}"
-                )
-
-            # Filter out invalid ESI numbers and gross values
-            esi_column = df[column_mapping["ESI No"]]
-            esi_column_gross = df[column_mapping["ESI Gross"]]
-
-            valid_esi_mask = ~(
-                (esi_column == 0)
-                | (esi_column == "0")
-                | (esi_column == "0.0")
-                | (esi_column.isna())
-                | (esi_column.isnull())
-                | (esi_column == "")
-            )
-
-            valid_esi_gross_mask = ~(
-                (esi_column_gross == 0)
-                | (esi_column_gross.isna())
-                | (esi_column_gross.isnull())
-            )
-
-            valid_rows_mask = valid_esi_mask & valid_esi_gross_mask
-            df = df[valid_rows_mask]
-
-            if df.empty:
-                raise ValueError(
-                    "No valid ESI data found after filtering invalid entries"
-                )
-
-            # Process valid data
-            esi_no = df[column_mapping["ESI No"]].astype(str).str.replace("-", "")
-            member_name = df[column_mapping["Employee Name"]]
-            esi_gross = df[column_mapping["ESI Gross"]].fillna(0).round().astype(int)
-            worked_days_raw = df[column_mapping["Worked Days"]]
-
-            def custom_round(x):
-                if pd.isna(x):
-                    return 0
-                decimal_part = x - int(x)
-                if decimal_part >= 0.5:
-                    return math.ceil(x)
-                else:
-                    return math.floor(x)
-
-            worked_days = worked_days_raw.apply(custom_round)
-
-            output_df = pd.DataFrame(
-                {
-                    "ESI No": esi_no,
-                    "MEMBER NAME": member_name,
-                    "ESI GROSS": esi_gross,
-                    "WORKED DAYS": worked_days,
-                }
-            )
-
-            # Generate output files
-            original_stem = excel_file.stem
-            unique_id = uuid.uuid4()
-            excel_filename = f"{original_stem}_{unique_id}_esi.xlsx"
-            text_filename = f"{original_stem}_{unique_id}_esi.txt"
-            excel_file_path = excel_output_dir / excel_filename
-            text_file_path = text_output_dir / text_filename
-
-            output_df.to_excel(excel_file_path, index=False, float_format="%.0f")
-
-            output_lines = [
-                "#~#".join(map(str, row)) for row in output_df.values.tolist()
-            ]
-            header_line = "#~#".join(output_df.columns)
-            output_lines.insert(0, header_line)
-
-            with open(text_file_path, "w") as f:
-                f.write("\n".join(output_lines))
-
-            # Prepare DB record
-            db_record = ProcessedFileESI(
-                user_id=current_user.id,
-                filename=excel_file.name,
-                filepath=f"{str(excel_file_path)},{str(text_file_path)}",
-                status="success",
-                message="File processed successfully.",
-                upload_date=upload_date_obj,
-            )
-
-            file_result.update(
-                {
-                    "db_record": db_record,
-                    "output_files": (str(excel_file_path), str(text_file_path)),
-                }
-            )
-
-        except Exception as e:
-            file_result.update(
-                {
-                    "status": "error",
-                    "message": f"Error processing file {excel_file.name}: {str(e)}",
-                    "db_record": ProcessedFileESI(
-                        user_id=current_user.id,
-                        filename=excel_file.name,
-                        filepath=str(excel_file),
-                        status="error",
-                        message=f"Error processing file {excel_file.name}: {str(e)}",
-                    ),
-                }
-            )
-
-        return file_result
-
     # Process files in parallel
     processed_files = []
     overall_status = "success"
     overall_message = "All files processed successfully."
-    db_records = []
+    file_results = []
+    manifest = FolderManifest("esi", folder, upload_date_obj)
+    if incremental:
+        excel_files, unchanged_records = manifest.split_unchanged(
+            excel_files, db, ProcessedFileESI, current_user.id
+        )
+        processed_files.extend(reused_file_result(record) for record in unchanged_records)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    with open_worker_batch(current_user.id, len(excel_files)) as batch:
         future_to_file = {
-            executor.submit(process_single_esi_file, file): file for file in excel_files
+            batch.submit(
+                convert_esi_workbook, file, excel_output_dir, text_output_dir, upload_date_obj
+            ): file
+            for file in excel_files
         }
 
         for future in concurrent.futures.as_completed(future_to_file):
-            file_result = future.result()
-            processed_files.append(
-                FileProcessResult(
-                    file_path=file_result["file_path"],
-                    status=file_result["status"],
+            excel_file = future_to_file[future]
+            try:
+                file_result = future.result()
+            except Exception as e:
+                # e.g. a worker process killed by the OS (BrokenProcessPool)
+                file_result = {
+                    "file_path": str(excel_file),
+                    "status": "error",
+                    "message": f"Error processing file {excel_file.name}: {str(e)}",
+                    "output_files": None,
+                    "excel_engine": None,
+                }
+            # Workers only return paths and status; the DB rows are built here
+            if file_result["status"] == "success":
+                file_result["db_record"] = ProcessedFileESI(
+                    user_id=current_user.id,
+                    filename=excel_file.name,
+                    filepath=",".join(file_result["output_files"]),
+                    status="success",
+                    message="File processed successfully.",
+                    upload_date=upload_date_obj,
+                    excel_engine=file_result["excel_engine"],
+                    rejected_rows=file_result["rejected_rows"],
+                    totals=file_result["totals"],
+                )
+            else:
+                file_result["db_record"] = ProcessedFileESI(
+                    user_id=current_user.id,
+                    filename=excel_file.name,
+                    filepath=str(excel_file),
+                    status="error",
                     message=file_result["message"],
                 )
-            )
-
-            if file_result["db_record"]:
-                db_records.append(file_result["db_record"])
+            file_results.append(file_result)
 
             if file_result["status"] == "error":
                 overall_status = "error"
                 overall_message = "Some files had errors during processing."
 
-    # Bulk insert all records
+    # Insert all records in one transaction; add_all (unlike bulk_save_objects)
+    # fills in the ids needed by the manifest
     try:
-        db.bulk_save_objects(db_records)
+        db.add_all(
+            [file_result["db_record"] for file_result in file_results if file_result["db_record"]]
+        )
         db.commit()
     except Exception as e:
         db.rollback()
+        for file_result in file_results:
+            discard_store_fragment(file_result.get("store_fragment"))
         raise HTTPException(
             status_code=500, detail=f"Error saving records to database: {str(e)}"
         )
+    # The commit hook invalidates too; this keeps the endpoint correct on its own
+    invalidate_dashboard(current_user.id)
+
+    for file_result in file_results:
+        db_record = file_result["db_record"]
+        if file_result["status"] == "success":
+            manifest.mark_processed(Path(file_result["file_path"]), db_record.id)
+            commit_store_fragment(file_result.get("store_fragment"), db_record.id)
+        processed_files.append(
+            FileProcessResult(
+                file_path=file_result["file_path"],
+                status=file_result["status"],
+                message=file_result["message"],
+                excel_engine=file_result["excel_engine"],
+                parse_cache_hit=file_result.get("parse_cache_hit"),
+                excel_write=file_result.get("excel_write"),
+                record_id=db_record.id if db_record else None,
+                rejected_rows=file_result.get("rejected_rows"),
+                rejects_file=file_result.get("rejects_file"),
+                totals=file_result.get("totals"),
+            )
+        )
+    manifest.save()
 
     return FileProcessResult(
         file_path=folder_path,
         status=overall_status,
         message=overall_message,
         upload_date=upload_date_obj,
+        files=processed_files,
     )
 
 
+# **********************************background processing jobs**********************************
+@app.post("/jobs/{scheme}", response_model=ProcessingJobResponse, status_code=202)
+def submit_processing_job(
+    scheme: ProcessingType,
+    background_tasks: BackgroundTasks,
+    folder_path: str = Form(..., min_length=3, max_length=500),
+    upload_date: str = Form(..., description="Date of Upload in YYYY-MM-DD"),
+    incremental: bool = Form(False, description="Skip workbooks unchanged since the last run"),
+    current_user: UserModel = Depends(require_hr_or_admin),
+    db: Session = Depends(get_db),
+):
+    # Same checks as /process_folder_pf, but the workbooks are converted after
+    # the response is sent; poll GET /jobs/{job_id} for progress and results.
+    try:
+        upload_date_obj = datetime.strptime(upload_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="Invalid date format. Please use YYYY-MM-DD format"
+        )
+    model = JOB_SCHEMES[scheme.value][1]
+    folder = Path(folder_path)
+    excel_files = list(folder.glob("*.xls*"))
+    if not folder.is_dir():
+        error_message = f"Invalid folder path: {folder_path}"
+    elif not excel_files:
+        error_message = f"No Excel files found in the folder: {folder_path}"
+    else:
+        error_message = None
+    if error_message:
+        db_file = model(
+            user_id=current_user.id,
+            filename="N/A",
+            filepath=folder_path,
+            status="error",
+            message=error_message,
+        )
+        db.add(db_file)
+        db.commit()
+        invalidate_dashboard(current_user.id)
+        raise HTTPException(status_code=400, detail=error_message)
+
+    # The pool slot is taken now so an overloaded server refuses the job up front
+    batch = open_worker_batch(current_user.id, len(excel_files))
+    try:
+        job = create_processing_job(
+            db, scheme.value, current_user.id, folder_path, upload_date_obj, incremental
+        )
+    except Exception:
+        batch.close()
+        raise
+    background_tasks.add_task(run_processing_job, job.id, batch)
+    return ProcessingJobResponse.from_orm(job)
+
+
+@app.get("/jobs/{job_id}", response_model=ProcessingJobResponse)
+def get_processing_job(
+    job_id: str,
+    current_user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    job = db.get(ProcessingJob, job_id)
+    if job is None or (
+        current_user.role != Role.ADMIN and job.user_id != current_user.id
+    ):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return ProcessingJobResponse.from_orm(job)
+
+
 # *********************************************************************************************************************************************************************
 @app.get("/processed_files_pf", response_model=List[ProcessedFileResponse])
-async def get_processed_files_pf(
+def get_processed_files_pf(
     upload_date: date = Query(..., description="Date of upload in YYYY-MM-DD format"),
     current_user: UserModel = Depends(get_current_user),
     user_id: Optional[int] = Query(
@@ -950,34 +968,111 @@ async def get_processed_files_pf(
     ),
     db: Session = Depends(get_db),
 ):
-    query = db.query(ProcessedFilePF).filter(ProcessedFilePF.upload_date == upload_date)
     if current_user.role == Role.ADMIN:
         # Admin can see all files or filter by specific user_id
-        if user_id is not None:
-            query = query.filter(ProcessedFilePF.user_id == user_id)
+        owner_id = user_id
     elif current_user.role == Role.HR:
         # HR can only see their own files
-        query = query.filter(ProcessedFilePF.user_id == current_user.id)
+        owner_id = current_user.id
     else:
         # Regular users can only see their own files
-        query = query.filter(ProcessedFilePF.user_id == current_user.id)
-    files = query.order_by(ProcessedFilePF.created_at.desc()).all()
+        owner_id = current_user.id
+    files = processed_files_for_date(db, ProcessedFilePF, upload_date, owner_id).all()
     valid_files = []
     for file in files:
         if file.status == "success":
             filepaths = file.filepath.split(",")
             if len(filepaths) == 2:
-                excel_path = Path(filepaths[0])
-                text_path = Path(filepaths[1])
-                if excel_path.exists() and text_path.exists():
+                if artifacts_available(Path(filepaths[0]), Path(filepaths[1])):
                     valid_files.append(file)
         else:
             valid_files.append(file)
     return [ProcessedFileResponse.from_orm(file) for file in valid_files]
 
 
+@app.post("/processed_files_pf/consolidate", response_model=FileProcessResult)
+def consolidate_processed_files_pf(
+    upload_date: date = Form(..., description="Date of upload in YYYY-MM-DD format"),
+    user_id: Optional[int] = Form(
+        None, description="Consolidate another user's files (Admin only)"
+    ),
+    current_user: UserModel = Depends(require_hr_or_admin),
+    db: Session = Depends(get_db),
+):
+    owner_id = current_user.id
+    if user_id is not None and current_user.role == Role.ADMIN:
+        owner_id = user_id
+    records = consolidation_sources(db, upload_date, owner_id).all()
+    # A workbook processed more than once that day counts once, with its latest output
+    latest_by_source = {}
+    for record in records:
+        filepaths = record.filepath.split(",")
+        if len(filepaths) == 2 and artifacts_available(
+            Path(filepaths[0]), Path(filepaths[1])
+        ):
+            latest_by_source[record.filename] = record
+    records = list(latest_by_source.values())
+    if not records:
+        raise HTTPException(
+            status_code=404, detail=f"No processed PF files found for {upload_date}"
+        )
+    try:
+        return consolidate_pf_outputs(db, records, owner_id, upload_date)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error consolidating PF files: {str(e)}"
+        )
+
+
+@app.get("/processed_files_pf/consolidated", response_model=List[ConsolidatedFileResponse])
+def get_consolidated_files_pf(
+    upload_date: date = Query(..., description="Date of upload in YYYY-MM-DD format"),
+    current_user: UserModel = Depends(get_current_user),
+    user_id: Optional[int] = Query(
+        None, description="Specific user ID to filter by (Admin only)"
+    ),
+    db: Session = Depends(get_db),
+):
+    # Same visibility as /processed_files_pf: admins see everyone's
+    owner_id = user_id if current_user.role == Role.ADMIN else current_user.id
+    files = processed_files_for_date(db, ConsolidatedFilePF, upload_date, owner_id).all()
+    return [ConsolidatedFileResponse.from_orm(file) for file in files]
+
+
+@app.get("/processed_files_pf/consolidated/{file_id}/download")
+def download_consolidated_pf_file(
+    file_id: int,
+    file_type: Optional[str] = None,
+    current_user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    file = db.query(ConsolidatedFilePF).filter(ConsolidatedFilePF.id == file_id).first()
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+    if current_user.role == Role.USER and file.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only download your own files",
+        )
+
+    excel_path, text_path = map(Path, file.filepath.split(","))
+    if file_type and file_type.lower() == "txt":
+        kind, media_type, suffix = "text", "text/plain", ".txt"
+    else:
+        kind = "excel"
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        suffix = ".xlsx"
+    file_path = resolve_artifact(excel_path, text_path, kind, "pf")
+    if file_path is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"File not found on server: {excel_path if kind == 'excel' else text_path}",
+        )
+    return FileResponse(path=file_path, filename=file.filename + suffix, media_type=media_type)
+
+
 @app.post("/processed_files_pf/{file_id}/submit_remittance")
-async def submit_remittance(
+def submit_remittance(
     file_id: int,
     remittance_date: date = Form(...),
     remittance_file: UploadFile = File(...),
@@ -1024,13 +1119,14 @@ async def submit_remittance(
     file.remittance_date = remittance_date
     file.remittance_challan_path = str(file_path)
     db.commit()
+    invalidate_dashboard(file.user_id)
 
     return {"message": "Remittance submitted successfully", "file_path": str(file_path)}
 
 
 # New endpoint to download remittance challan
 @app.get("/processed_files_pf/{file_id}/remittance_challan")
-async def download_remittance_challan(
+def download_remittance_challan(
     file_id: int,
     current_user: UserModel = Depends(require_hr_or_admin),
     db: Session = Depends(get_db),
@@ -1064,7 +1160,7 @@ async def download_remittance_challan(
 
 
 @app.get("/processed_files_pf/{file_id}/download")
-async def download_pf_file(
+def download_pf_file(
     file_id: int,
     file_type: Optional[str] = None,
     current_user: UserModel = Depends(get_current_user),
@@ -1102,23 +1198,23 @@ async def download_pf_file(
 
     # Determine which file to download based on file_type query parameter
     if file_type and file_type.lower() == "txt":
-        file_path = text_path
+        kind = "text"
         media_type = "text/plain"
     else:
         # Default to Excel if file_type is not specified or is not "txt"
-        file_path = excel_path
+        kind = "excel"
         media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
-    # Verify the file exists
-    if not file_path.exists():
-        fallback_path = Path(
-            text_path if file_type and file_type.lower() == "txt" else excel_path
+    # Served as written, or rendered from the canonical file in lazy artifact
+    # mode; falls back to the paths stored on the record
+    file_path = resolve_artifact(
+        excel_path, text_path, kind, "pf"
+    ) or resolve_artifact(Path(filepaths[0]), Path(filepaths[1]), kind, "pf")
+    if file_path is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"File not found on server: {excel_path if kind == 'excel' else text_path}",
         )
-        if not fallback_path.exists():
-            raise HTTPException(
-                status_code=404, detail=f"File not found on server: {file_path}"
-            )
-        file_path = fallback_path
 
     # Get the original filename from the file record
     original_filename = file.filename
@@ -1136,7 +1232,7 @@ async def download_pf_file(
 
 
 @app.get("/directory_files_pf", response_model=Dict[str, List[DirectoryFile]])
-async def list_esi_directory_files(
+def list_esi_directory_files(
     current_user: UserModel = Depends(get_current_user),
 ):
     excel_dir = "D:\\MyProject\\backend\\processed_excels_pf"
@@ -1189,7 +1285,7 @@ async def list_esi_directory_files(
 
 # Add this endpoint to download files directly from directories
 @app.get("/directory_files_pf/{file_type}/{filename}")
-async def download_directory_file(
+def download_directory_file(
     file_type: str,
     filename: str,
     current_user: UserModel = Depends(require_hr_or_admin),
@@ -1226,7 +1322,7 @@ async def download_directory_file(
 
 
 @app.get("/processed_files_pf/batch_download")
-async def download_multiple_pf_files(
+def download_multiple_pf_files(
     file_ids: str = Query(..., description="Comma-separated list of file IDs"),
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -1276,14 +1372,13 @@ async def download_multiple_pf_files(
             # Add both files to the zip with appropriate names
             original_name = os.path.splitext(file.filename)[0]
             zip_dir = f"{date_folder}/{original_name}" if date_folder else original_name
-            if excel_path.exists():
-                zip_file.write(excel_path, f"{zip_dir}/{original_name}.xlsx")
-            elif Path(filepaths[0]).exists():
-                zip_file.write(Path(filepaths[0]), f"{zip_dir}/{original_name}.xlsx")
-            if text_path.exists():
-                zip_file.write(text_path, f"{zip_dir}/{original_name}.txt")
-            elif Path(filepaths[1]).exists():  # Fallback to original path
-                zip_file.write(Path(filepaths[1]), f"{zip_dir}/{original_name}.txt")
+            for kind, extension in (("excel", "xlsx"), ("text", "txt")):
+                # Fallback to the paths stored on the record
+                artifact = resolve_artifact(
+                    excel_path, text_path, kind, "pf"
+                ) or resolve_artifact(Path(filepaths[0]), Path(filepaths[1]), kind, "pf")
+                if artifact is not None:
+                    zip_file.write(artifact, f"{zip_dir}/{original_name}.{extension}")
     if zipfile.ZipFile(zip_buffer, "r").testzip() is not None:
         raise HTTPException(status_code=404, detail="No valid files found for download")
 
@@ -1307,9 +1402,10 @@ async def download_multiple_pf_files(
 
 # **********************************************************************************#
 @app.post("/esi_upload", response_model=FileProcessResult)
-async def process_esi_file(
+def process_esi_file(
     folder_path: str = Form(...),
     upload_date: str = Form(..., description="Date of Upload in YYYY-MM-DD format"),
+    incremental: bool = Form(False, description="Skip workbooks unchanged since the last run"),
     current_user: UserModel = Depends(require_hr_or_admin),
     db: Session = Depends(get_db),
 ):
@@ -1333,6 +1429,7 @@ async def process_esi_file(
         )
         db.add(db_file)
         db.commit()
+        invalidate_dashboard(current_user.id)
         raise HTTPException(status_code=400, detail=error_message)
 
     excel_files = list(folder.glob("*.xls*"))
@@ -1347,6 +1444,7 @@ async def process_esi_file(
         )
         db.add(db_file)
         db.commit()
+        invalidate_dashboard(current_user.id)
         raise HTTPException(status_code=400, detail=error_message)
     excel_output_dir = Path("processed_excels_esi_new") / date_folder_name
     text_output_dir = Path("processed_texts_esi_new") / date_folder_name
@@ -1355,16 +1453,19 @@ async def process_esi_file(
     processed_files = []
     overall_status = "success"
     overall_message = "All files processed successfully."
-
+    manifest = FolderManifest("esi", folder, upload_date_obj)
+    if incremental:
+        excel_files, unchanged_records = manifest.split_unchanged(
+            excel_files, db, ProcessedFileESI, current_user.id
+        )
+        processed_files.extend(reused_file_result(record) for record in unchanged_records)
     for excel_file in excel_files:
         try:
             try:
-                if excel_file.suffix == ".xlsx":
-                    df = pd.read_excel(excel_file, dtype={"ESI N0": str})
-                else:
-                    df = pd.read_excel(excel_file, engine="xlrd", dtype={"ESI N0": str})
+                # Probe the header first so missing columns fail before the body is read
+                column_mapping, chunks = open_workbook_chunks(excel_file, "esi")
 
-                if df.empty:
+                if chunks is None:
                     error_message = f"Excel file {excel_file.name} is empty."
                     db_file = ProcessedFileESI(
                         user_id=current_user.id,
@@ -1386,8 +1487,8 @@ async def process_esi_file(
                     )
                     continue
 
-            except Exception as e:
-                error_message = f"Error reading Excel file {excel_file.name}: {str(e)}"
+            except MissingColumnsError as e:
+                error_message = f"Missing required columns in {excel_file.name}: {', '.join(e.missing)}"
                 db_file = ProcessedFileESI(
                     user_id=current_user.id,
                     filename=excel_file.name,
@@ -1407,128 +1508,30 @@ async def process_esi_file(
                     )
                 )
                 continue
-
-            try:
-                required_columns = {
-                    "ESI No": ["ESI N0"],
-                    "Employee Name": ["Employee Name"],
-                    "ESI Gross": ["ESI Gross"],
-                    "Worked Days": ["Worked days"],
-                }
-
-                column_mapping = {}
-                missing_columns = []
-
-                for field, alternatives in required_columns.items():
-                    found = False
-                    for alt in alternatives:
-                        if alt in df.columns:
-                            column_mapping[field] = alt
-                            found = True
-                            break
-                    if not found:
-                        missing_columns.append(field)
-
-                if missing_columns:
-                    error_message = f"Missing required columns in {excel_file.name}: {', '.join(missing_columns)}"
-                    db_file = ProcessedFileESI(
-                        user_id=current_user.id,
-                        filename=excel_file.name,
-                        filepath=str(excel_file),
-                        status="error",
-                        message=error_message,
-                    )
-                    db.add(db_file)
-                    db.commit()
-                    overall_status = "error"
-                    overall_message = "Some files had errors during processing."
-                    processed_files.append(
-                        FileProcessResult(
-                            file_path=str(excel_file),
-                            status="error",
-                            message=error_message,
-                        )
-                    )
-                    continue
-                # Filter out rows where ESI number is invalid
-                esi_column = df[column_mapping["ESI No"]]
-
-                # Create mask to identify valid ESI numbers (not 0, not null, not NaN, not empty)
-                valid_esi_mask = ~(
-                    (esi_column == 0)
-                    | (esi_column == "0")
-                    | (esi_column == "0.0")
-                    | (esi_column.isna())
-                    | (esi_column.isnull())
-                    | (esi_column == "")
-                )
-
-                # Filter the dataframe to keep only rows with valid ESI numbers
-                # df = df[valid_esi_mask]
-                esi_column_gross = df[column_mapping["ESI Gross"]]
-                valid_esi_gross_mask = ~(
-                    (esi_column_gross == 0)
-                    | (esi_column_gross.isna())
-                    | (esi_column_gross.isnull())
+            except Exception as e:
+                error_message = f"Error reading Excel file {excel_file.name}: {str(e)}"
+                db_file = ProcessedFileESI(
+                    user_id=current_user.id,
+                    filename=excel_file.name,
+                    filepath=str(excel_file),
+                    status="error",
+                    message=error_message,
                 )
-                # df = df[esi_column_gross]
-                valid_rows_mask = valid_esi_mask & valid_esi_gross_mask
-                df = df[valid_rows_mask]
-                # Check if we still have data after filtering
-                if df.empty:
-                    error_message = f"No valid ESI data found in {excel_file.name} after filtering invalid entries"
-                    db_file = ProcessedFileESI(
-                        user_id=current_user.id,
-                        filename=excel_file.name,
-                        filepath=str(excel_file),
+                db.add(db_file)
+                db.commit()
+                overall_status = "error"
+                overall_message = "Some files had errors during processing."
+                processed_files.append(
+                    FileProcessResult(
+                        file_path=str(excel_file),
                         status="error",
                         message=error_message,
                     )
-                    db.add(db_file)
-                    db.commit()
-                    overall_status = "error"
-                    overall_message = "Some files had errors during processing."
-                    processed_files.append(
-                        FileProcessResult(
-                            file_path=str(excel_file),
-                            status="error",
-                            message=error_message,
-                        )
-                    )
-                    continue
-
-                # Now process the valid ESI numbers
-                esi_no = df[column_mapping["ESI No"]].astype(str).str.replace("-", "")
-                member_name = df[column_mapping["Employee Name"]]
-                esi_gross = (
-                    df[column_mapping["ESI Gross"]].fillna(0).round().astype(int)
-                )
-
-                # Apply custom rounding to Worked Days (same logic as LOP days)
-                worked_days_raw = df[column_mapping["Worked Days"]]
-
-                # Custom rounding function: ≥5 round up, <5 round down
-                def custom_round(x):
-                    if pd.isna(x):
-                        return 0
-                    decimal_part = x - int(x)
-                    if decimal_part >= 0.5:
-                        return math.ceil(x)  # Round up
-                    else:
-                        return math.floor(x)  # Round down
-
-                worked_days = worked_days_raw.apply(custom_round)
-
-                output_df = pd.DataFrame(
-                    {
-                        "ESI No": esi_no,
-                        "MEMBER NAME": member_name,
-                        "ESI GROSS": esi_gross,
-                        "WORKED DAYS": worked_days,
-                    }
                 )
+                continue
 
-                # Create output directories if they don't exist
+            result = None
+            try:
                 """excel_output_dir = Path("processed_excels_esi")
                 excel_output_dir.mkdir(parents=True, exist_ok=True)
                 text_output_dir = Path("processed_texts_esi")
@@ -1540,17 +1543,15 @@ async def process_esi_file(
                 excel_file_path = excel_output_dir / excel_filename
                 text_file_path = text_output_dir / text_filename
 
-                output_df.to_excel(excel_file_path, index=False, float_format="%.0f")
-
-                # Prepare text file content
-                output_lines = [
-                    "#~#".join(map(str, row)) for row in output_df.values.tolist()
-                ]
-                header_line = "#~#".join(output_df.columns)
-                output_lines.insert(0, header_line)
-
-                with open(text_file_path, "w") as f:
-                    f.write("\n".join(output_lines))
+                # Validated, converted and written a chunk at a time
+                result = convert_chunks(
+                    "esi",
+                    chunks,
+                    column_mapping,
+                    excel_file_path,
+                    text_file_path,
+                    upload_date_obj,
+                )
 
                 # Save to database
                 db_file = ProcessedFileESI(
@@ -1560,19 +1561,60 @@ async def process_esi_file(
                     status="success",
                     message="File processed successfully.",
                     upload_date=upload_date_obj,
+                    excel_engine=result["excel_engine"],
+                    totals=result["totals"],
+                    rejected_rows=result["rejected_rows"],
                 )
                 db.add(db_file)
                 db.commit()
+                manifest.mark_processed(excel_file, db_file.id)
+                # Best-effort copy to the ECR store: a failure is logged and
+                # leaves the committed record alone
+                commit_store_fragment(result["store_fragment"], db_file.id)
 
                 processed_files.append(
                     FileProcessResult(
                         file_path=f"{str(excel_file_path)},{str(text_file_path)}",
                         status="success",
                         message="File processed successfully.",
+                        excel_engine=result["excel_engine"],
+                        parse_cache_hit=result["parse_cache_hit"],
+                        excel_write=result["excel_write"],
+                        record_id=db_file.id,
+                        rejected_rows=result["rejected_rows"],
+                        rejects_file=result["rejects_file"],
+                        totals=db_file.totals,
+                    )
+                )
+
+            except NoValidRowsError as e:
+                # Check if we still have data after filtering
+                error_message = (
+                    f"No valid ESI data found in {excel_file.name} after filtering "
+                    f"invalid entries ({e.rejects})"
+                )
+                db_file = ProcessedFileESI(
+                    user_id=current_user.id,
+                    filename=excel_file.name,
+                    filepath=str(excel_file),
+                    status="error",
+                    message=error_message,
+                )
+                db.add(db_file)
+                db.commit()
+                overall_status = "error"
+                overall_message = "Some files had errors during processing."
+                processed_files.append(
+                    FileProcessResult(
+                        file_path=str(excel_file),
+                        status="error",
+                        message=error_message,
                     )
                 )
 
             except Exception as e:
+                if result is not None:
+                    discard_store_fragment(result["store_fragment"])
                 error_message = f"Error processing file {excel_file.name}: {str(e)}"
                 db_file = ProcessedFileESI(
                     user_id=current_user.id,
@@ -1604,18 +1646,22 @@ async def process_esi_file(
             )
             db.add(db_file)
             db.commit()
+            invalidate_dashboard(current_user.id)
             raise HTTPException(status_code=500, detail=error_message)
 
+    invalidate_dashboard(current_user.id)
+    manifest.save()
     return FileProcessResult(
         file_path=folder_path,
         status=overall_status,
         message=overall_message,
         upload_date=upload_date_obj,
+        files=processed_files,
     )
 
 
 @app.get("/directory_files_esi", response_model=Dict[str, List[DirectoryFile]])
-async def list_esi_directory_files(
+def list_esi_directory_files(
     current_user: UserModel = Depends(require_hr_or_admin),
 ):
     excel_dir = "D:\\MyProject\\backend\\processed_excels_esi"
@@ -1667,7 +1713,7 @@ async def list_esi_directory_files(
 
 
 @app.get("/processed_files_esi", response_model=List[ProcessedFileResponse])
-async def get_processed_files_esi(
+def get_processed_files_esi(
     upload_date: date = Query(..., description="Date of upload in YYYY-MM-DD format"),
     user_id: Optional[int] = Query(
         None, description="Specific user ID to filter by (Admin only)"
@@ -1675,24 +1721,14 @@ async def get_processed_files_esi(
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    query = db.query(ProcessedFileESI).filter(
-        ProcessedFileESI.upload_date == upload_date
-    )
-    if current_user.role == Role.ADMIN:
-        if user_id is not None:
-            query = query.filter(ProcessedFileESI.user_id == user_id)
-    else:
-        query = query.filter(ProcessedFileESI.user_id == current_user.id)
-
-    files = query.order_by(ProcessedFileESI.created_at.desc()).all()
+    owner_id = user_id if current_user.role == Role.ADMIN else current_user.id
+    files = processed_files_for_date(db, ProcessedFileESI, upload_date, owner_id).all()
     valid_files = []
     for file in files:
         if file.status == "success":
             filepaths = file.filepath.split(",")
             if len(filepaths) == 2:
-                excel_path = Path(filepaths[0])
-                text_path = Path(filepaths[1])
-                if excel_path.exists() and text_path.exists():
+                if artifacts_available(Path(filepaths[0]), Path(filepaths[1])):
                     valid_files.append(file)
         else:
             valid_files.append(file)
@@ -1700,7 +1736,7 @@ async def get_processed_files_esi(
 
 
 @app.get("/processed_files_esi/{file_id}/download")
-async def download_esi_file(
+def download_esi_file(
     file_id: int,
     file_type: Optional[str] = None,
     current_user: UserModel = Depends(get_current_user),
@@ -1741,23 +1777,23 @@ async def download_esi_file(
 
     # Determine which file to download based on file_type query parameter
     if file_type and file_type.lower() == "txt":
-        file_path = text_path
+        kind = "text"
         media_type = "text/plain"
     else:
         # Default to Excel if file_type is not specified or is not "txt"
-        file_path = excel_path
+        kind = "excel"
         media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
-    # Verify the file exists
-    if not file_path.exists():
-        fallback_path = Path(
-            text_path if file_type and file_type.lower() == "txt" else excel_path
+    # Served as written, or rendered from the canonical file in lazy artifact
+    # mode; falls back to the paths stored on the record
+    file_path = resolve_artifact(
+        excel_path, text_path, kind, "esi"
+    ) or resolve_artifact(Path(filepaths[0]), Path(filepaths[1]), kind, "esi")
+    if file_path is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"File not found on server: {excel_path if kind == 'excel' else text_path}",
         )
-        if not fallback_path.exists():
-            raise HTTPException(
-                status_code=404, detail=f"File not found on server: {file_path}"
-            )
-        file_path = fallback_path
     # Get the original filename from the file record
     original_filename = file.filename
 
@@ -1774,7 +1810,7 @@ async def download_esi_file(
 
 
 @app.get("/processed_files_esi/batch_download")
-async def download_multiple_esi_files(
+def download_multiple_esi_files(
     file_ids: str = Query(..., description="Comma-separated list of file IDs"),
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -1833,14 +1869,13 @@ async def download_multiple_esi_files(
             # Add both files to the zip with appropriate names
             original_name = os.path.splitext(file.filename)[0]
             zip_dir = f"{date_folder}/{original_name}" if date_folder else original_name
-            if excel_path.exists():
-                zip_file.write(excel_path, f"{zip_dir}/{original_name}.xlsx")
-            elif Path(filepaths[0]).exists():
-                zip_file.write(Path(filepaths[0]), f"{zip_dir}/{original_name}.xlsx")
-            if text_path.exists():
-                zip_file.write(text_path, f"{zip_dir}/{original_name}.txt")
-            elif Path(filepaths[1]).exists():
-                zip_file.write(Path(filepaths[1]), f"{zip_dir}/{original_name}.txt")
+            for kind, extension in (("excel", "xlsx"), ("text", "txt")):
+                # Fallback to the paths stored on the record
+                artifact = resolve_artifact(
+                    excel_path, text_path, kind, "esi"
+                ) or resolve_artifact(Path(filepaths[0]), Path(filepaths[1]), kind, "esi")
+                if artifact is not None:
+                    zip_file.write(artifact, f"{zip_dir}/{original_name}.{extension}")
     if zipfile.ZipFile(zip_buffer, "r").testzip() is not None:
         raise HTTPException(status_code=404, detail="No valid files found for download")
     # Return the zip file
@@ -1862,7 +1897,7 @@ async def download_multiple_esi_files(
 
 
 @app.post("/processed_files_esi/{file_id}/submit_remittance")
-async def submit_remittance(
+def submit_remittance(
     file_id: int,
     remittance_date: date = Form(...),
     remittance_file: UploadFile = File(...),
@@ -1909,12 +1944,13 @@ async def submit_remittance(
     file.remittance_date = remittance_date
     file.remittance_challan_path = str(file_path)
     db.commit()
+    invalidate_dashboard(file.user_id)
 
     return {"message": "Remittance submitted successfully", "file_path": str(file_path)}
 
 
 @app.get("/processed_files_esi/{file_id}/remittance_challan")
-async def download_remittance_challan(
+def download_remittance_challan(
     file_id: int,
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -1948,109 +1984,43 @@ async def download_remittance_challan(
 
 
 @app.get("/dashboard", response_model=DashboardStats)
-async def get_dashboard_stats(
+def get_dashboard_stats(
     year: int = Query(None, description="Filter by specific year"),
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    # Initialize base queries
-    pf_query = db.query(ProcessedFilePF)
-    esi_query = db.query(ProcessedFileESI)
-
-    # Apply user-specific filters if not admin
-    if current_user.role not in [Role.ADMIN]:
-        pf_query = pf_query.filter(ProcessedFilePF.user_id == current_user.id)
-        esi_query = esi_query.filter(ProcessedFileESI.user_id == current_user.id)
-
-    # Apply year filter if provided
-    if year:
-        pf_query = pf_query.filter(extract("year", ProcessedFilePF.created_at) == year)
-        esi_query = esi_query.filter(
-            extract("year", ProcessedFileESI.created_at) == year
-        )
-
-    # Get counts for PF files
-    pf_total = pf_query.count()
-    pf_success = pf_query.filter(ProcessedFilePF.status == "success").count()
-    pf_error = pf_query.filter(ProcessedFilePF.status == "error").count()
-
-    # Get counts for ESI files
-    esi_total = esi_query.count()
-    esi_success = esi_query.filter(ProcessedFileESI.status == "success").count()
-    esi_error = esi_query.filter(ProcessedFileESI.status == "error").count()
+    # Non-admins only see their own records
+    owner_id = None if current_user.role in [Role.ADMIN] else current_user.id
+
+    # Served from the cache until the TTL runs out or a write invalidates it
+    cache_key = dashboard_cache_key(current_user.role, owner_id, year)
+    cached = get_cached_dashboard(cache_key)
+    if cached is not None:
+        return cached
+
+    # Every count comes from the per-month rollups (see dashboard_rollup.py)
+    counts = dashboard_counts(db, owner_id, year)
+    pf_total, pf_success, pf_error = (
+        counts["pf"][k] for k in ("total", "success", "error")
+    )
+    esi_total, esi_success, esi_error = (
+        counts["esi"][k] for k in ("total", "success", "error")
+    )
 
     # Combine totals
     total_files = pf_total + esi_total
     success_files = pf_success + esi_success
     error_files = pf_error + esi_error
 
-    # Get recent files (only user's files unless admin)
-    pf_recent = pf_query.order_by(ProcessedFilePF.created_at.desc()).limit(5).all()
-    esi_recent = esi_query.order_by(ProcessedFileESI.created_at.desc()).limit(5).all()
+    # Get recent files (only user's files unless admin); each is an index
+    # range read of five rows
+    pf_recent = recent_processed_files(db, ProcessedFilePF, owner_id, year).all()
+    esi_recent = recent_processed_files(db, ProcessedFileESI, owner_id, year).all()
     all_recent = sorted(
         pf_recent + esi_recent, key=lambda x: x.created_at, reverse=True
     )[:5]
 
-    # Monthly data collection
-    monthly_data = defaultdict(
-        lambda: {
-            "pf_total": 0,
-            "pf_success": 0,
-            "pf_error": 0,
-            "esi_total": 0,
-            "esi_success": 0,
-            "esi_error": 0,
-            "remittance_submitted": 0,
-        }
-    )
-
-    # PF monthly stats (user-specific or all for admin)
-    pf_monthly_query = db.query(
-        extract("month", ProcessedFilePF.created_at).label("month"),
-        func.count().label("total"),
-        func.sum(case((ProcessedFilePF.status == "success", 1), else_=0)).label(
-            "success"
-        ),
-        func.sum(case((ProcessedFilePF.status == "error", 1), else_=0)).label("error"),
-        func.sum(
-            case((ProcessedFilePF.remittance_submitted == True, 1), else_=0)
-        ).label("remittance"),
-    )
-
-    if current_user.role not in [Role.ADMIN]:
-        pf_monthly_query = pf_monthly_query.filter(
-            ProcessedFilePF.user_id == current_user.id
-        )
-
-    pf_monthly = pf_monthly_query.group_by("month").all()
-
-    for month in pf_monthly:
-        monthly_data[month.month]["pf_total"] += month.total
-        monthly_data[month.month]["pf_success"] += month.success
-        monthly_data[month.month]["pf_error"] += month.error
-        monthly_data[month.month]["remittance_submitted"] += month.remittance
-
-    # ESI monthly stats (user-specific or all for admin)
-    esi_monthly_query = db.query(
-        extract("month", ProcessedFileESI.created_at).label("month"),
-        func.count().label("total"),
-        func.sum(case((ProcessedFileESI.status == "success", 1), else_=0)).label(
-            "success"
-        ),
-        func.sum(case((ProcessedFileESI.status == "error", 1), else_=0)).label("error"),
-    )
-
-    if current_user.role not in [Role.ADMIN]:
-        esi_monthly_query = esi_monthly_query.filter(
-            ProcessedFileESI.user_id == current_user.id
-        )
-
-    esi_monthly = esi_monthly_query.group_by("month").all()
-
-    for month in esi_monthly:
-        monthly_data[month.month]["esi_total"] += month.total
-        monthly_data[month.month]["esi_success"] += month.success
-        monthly_data[month.month]["esi_error"] += month.error
+    monthly_data = counts["monthly"]
 
     # Format monthly data for response
     formatted_monthly = {
@@ -2082,41 +2052,16 @@ async def get_dashboard_stats(
     }
 
     # Remittance statistics (user-specific or all for admin)
-    remittance_query = db.query(ProcessedFilePF)
-    if current_user.role not in [Role.ADMIN]:
-        remittance_query = remittance_query.filter(
-            ProcessedFilePF.user_id == current_user.id
-        )
-
     remittance_stats = {
-        "total_submitted": remittance_query.filter(
-            ProcessedFilePF.remittance_submitted == True
-        ).count(),
-        "pending": pf_success
-        - remittance_query.filter(ProcessedFilePF.remittance_submitted == True).count(),
-        "timely_submissions": remittance_query.filter(
-            ProcessedFilePF.remittance_submitted == True,
-            ProcessedFilePF.remittance_date
-            <= ProcessedFilePF.created_at + timedelta(days=7),
-        ).count(),
+        "total_submitted": counts["remittance"]["submitted"],
+        "pending": pf_success - counts["remittance"]["submitted"],
+        "timely_submissions": counts["remittance"]["timely"],
     }
 
     # User activity (only for admins)
     user_activity = {}
     if current_user.role == Role.ADMIN:
-        active_users = (
-            db.query(
-                UserModel.username,
-                func.count(ProcessedFilePF.id).label("pf_files"),
-                func.count(ProcessedFileESI.id).label("esi_files"),
-            )
-            .outerjoin(ProcessedFilePF, UserModel.id == ProcessedFilePF.user_id)
-            .outerjoin(ProcessedFileESI, UserModel.id == ProcessedFileESI.user_id)
-            .group_by(UserModel.username)
-            .order_by(func.count(ProcessedFilePF.id).desc())
-            .limit(5)
-            .all()
-        )
+        active_users = top_users_by_files(db, limit=5)
 
         user_activity = {
             "top_users": [
@@ -2131,53 +2076,9 @@ async def get_dashboard_stats(
         }
 
     # Remittance delays (user-specific or all for admin)
-    remittance_delays_pf_query = db.query(
-        func.cast(
-            func.julianday(ProcessedFilePF.remittance_date)
-            - func.julianday(ProcessedFilePF.created_at),
-            Integer,
-        ).label("delay_days"),
-        func.count().label("count"),
-    ).filter(
-        ProcessedFilePF.remittance_submitted == True,
-        ProcessedFilePF.remittance_date.isnot(None),
-    )
-
-    if current_user.role not in [Role.ADMIN]:
-        remittance_delays_pf_query = remittance_delays_pf_query.filter(
-            ProcessedFilePF.user_id == current_user.id
-        )
-
-    remittance_delays_pf = remittance_delays_pf_query.group_by("delay_days").all()
-
-    remittance_delays_esi_query = db.query(
-        func.cast(
-            func.julianday(ProcessedFileESI.remittance_date)
-            - func.julianday(ProcessedFileESI.created_at),
-            Integer,
-        ).label("delay_days"),
-        func.count().label("count"),
-    ).filter(
-        ProcessedFileESI.remittance_submitted == True,
-        ProcessedFileESI.remittance_date.isnot(None),
-    )
-
-    if current_user.role not in [Role.ADMIN]:
-        remittance_delays_esi_query = remittance_delays_esi_query.filter(
-            ProcessedFileESI.user_id == current_user.id
-        )
-
-    remittance_delays_esi = remittance_delays_esi_query.group_by("delay_days").all()
-
-    # Combine delay data
-    delay_data = []
-    for d in remittance_delays_pf:
-        delay_data.append({"days": int(d.delay_days), "count": d.count, "type": "PF"})
-
-    for d in remittance_delays_esi:
-        delay_data.append({"days": int(d.delay_days), "count": d.count, "type": "ESI"})
+    delay_data = counts["delays"]
 
-    return DashboardStats(
+    stats = DashboardStats(
         total_files=total_files or 0,
         success_files=success_files or 0,
         error_files=error_files or 0,
@@ -2193,6 +2094,13 @@ async def get_dashboard_stats(
         user_activity=user_activity,
         remittance_delays=delay_data,
     )
+    store_dashboard(cache_key, stats)
+    return stats
+
+
+@app.get("/dashboard/cache_stats")
+def get_dashboard_cache_stats(current_user: UserModel = Depends(require_admin)):
+    return dashboard_cache_stats()
 
 
 """@app.get("/dashboard", response_model=DashboardStats)
@@ -2376,7 +2284,17 @@ async def get_dashboard_stats(
 # Function to create the database tables
 def create_db_tables():
     Base.metadata.create_all(bind=engine)
+    migrate_schema(engine)
+    # Background jobs do not survive a restart; report them instead of leaving them "running"
+    with SessionLocal() as db:
+        fail_interrupted_jobs(db)
+        # A database from before the dashboard rollups gets them built once
+        backfill_dashboard_rollups(db)
 
 
 # Call the function to create tables
 create_db_tables()
+# Read the statutory rate tables now so a malformed file fails at startup
+load_rate_tables()
+# Likewise connect the dashboard cache, so an unusable Redis fails here
+get_dashboard_cache_backend()
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import os
+import pickle
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from excel_reader import EXCEL_CHUNK_SIZE, concat_chunks, iter_required_chunks
+
+# Bump whenever excel_reader changes how cells are parsed or normalised so that
+# frames cached by an older parser are not reused.
+PARSER_VERSION = "3"
+PARSE_CACHE_DIR = Path(os.environ.get("PARSE_CACHE_DIR", "parsed_cache"))
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def file_content_hash(path: Path, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_key(
+    content_hash: str,
+    required_columns: Dict[str, List[str]],
+    column_dtypes: Optional[Dict[str, Any]],
+) -> str:
+    # The alias map and dtypes are part of the key: changing the rules
+    # changes the projected frame even when the workbook is identical.
+    rules = {
+        "parser": PARSER_VERSION,
+        "columns": required_columns,
+        "dtypes": {
+            field: getattr(column_type, "__name__", str(column_type))
+            for field, column_type in (column_dtypes or {}).items()
+        },
+    }
+    rules_hash = hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+    return f"{content_hash[:32]}{rules_hash[:16]}"
+
+
+def _use_parquet() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _cache_path(key: str) -> Path:
+    suffix = ".parquet" if _use_parquet() else ".pkl"
+    return PARSE_CACHE_DIR / key[:2] / f"{key}{suffix}"
+
+
+def _blanks_as_nan(chunk: pd.DataFrame) -> pd.DataFrame:
+    # Parquet hands blanks in text columns back as None; the pipelines expect NaN
+    for column in chunk.columns:
+        if chunk[column].dtype == object:
+            chunk[column] = chunk[column].where(chunk[column].notna(), np.nan)
+    return chunk
+
+
+def _read_entry(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        batches = parquet_file.iter_batches(batch_size=chunk_size)
+        empty = parquet_file.schema_arrow.empty_table()
+        engine = (parquet_file.schema_arrow.metadata or {}).get(b"excel_engine", b"").decode()
+        try:
+            for batch in batches:
+                yield _with_engine(batch.to_pandas(), engine)
+        finally:
+            parquet_file.close()
+        if not parquet_file.metadata.num_rows:
+            yield _with_engine(empty.to_pandas(), engine)
+        return
+    # Pickle entries are a sequence of chunks, which keep their attrs
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _with_engine(chunk: pd.DataFrame, engine: str) -> pd.DataFrame:
+    chunk.attrs["excel_engine"] = engine or None
+    return chunk
+
+
+def iter_cached_chunks(
+    key: str, chunk_size: int = EXCEL_CHUNK_SIZE
+) -> Optional[Iterator[pd.DataFrame]]:
+    """The chunks of a cache entry, or None on a miss.
+
+    The first chunk is read before returning, so a truncated or unreadable
+    entry is treated as a miss (and deleted) rather than failing the caller.
+    """
+    path = _cache_path(key)
+    chunks = _read_entry(path, chunk_size)
+    try:
+        first = next(chunks)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        chunks.close()
+        path.unlink(missing_ok=True)
+        return None
+    # Touch the entry so eviction drops the least recently used files first
+    os.utime(path)
+    return _normalised(first, chunks)
+
+
+def _normalised(first: pd.DataFrame, rest: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    try:
+        yield _blanks_as_nan(first)
+        for chunk in rest:
+            yield _blanks_as_nan(chunk)
+    finally:
+        rest.close()
+
+
+class _EntryWriter:
+    """Writes the chunks of one cache entry to a temporary file.
+
+    Caching is best effort: a chunk that cannot be written (say a text
+    column holding numbers in one chunk and names in the next) abandons the
+    entry and the file is parsed again next time.
+    """
+
+    def __init__(self, key: str):
+        self.path = _cache_path(key)
+        self.tmp_path = self.path.with_name(f"{self.path.name}.{uuid.uuid4().hex}.tmp")
+        self._file = None
+        self._writer = None
+        self.failed = False
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self.failed:
+            return
+        try:
+            if self.path.suffix == ".parquet":
+                self._write_parquet(chunk)
+            else:
+                if self._file is None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._file = open(self.tmp_path, "wb")
+                pickle.dump(chunk, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            self.abort()
+            self.failed = True
+
+    def _write_parquet(self, chunk: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # The index holds the sheet row numbers, which rejects and duplicates report
+        table = pa.Table.from_pandas(chunk, preserve_index=True)
+        if self._writer is None:
+            # All-blank columns of the first chunk are typed as text
+            schema = pa.schema(
+                [
+                    field.with_type(pa.large_string()) if pa.types.is_null(field.type) else field
+                    for field in table.schema
+                ],
+                metadata=table.schema.metadata,
+            )
+            # The engine that parsed the workbook is reported again on a hit
+            engine = chunk.attrs.get("excel_engine") or ""
+            schema = schema.with_metadata({**schema.metadata, b"excel_engine": engine.encode()})
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.tmp_path, schema)
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def commit(self) -> None:
+        """Move the finished entry into place; readers never see a partial file."""
+        if self.failed:
+            return
+        try:
+            if self._writer is not None:
+                self._writer.close()
+            elif self._file is not None:
+                self._file.close()
+            os.replace(self.tmp_path, self.path)
+        except Exception:
+            self.failed = True
+        finally:
+            self.abort()
+        evict_parse_cache()
+
+    def abort(self) -> None:
+        for handle in (self._writer, self._file):
+            if handle is not None:
+                try:
+                    handle.close()
+                except Exception:
+                    pass
+        self._writer = self._file = None
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def _caching(key: str, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    # The entry is only published once the caller has consumed every chunk
+    entry = _EntryWriter(key)
+    try:
+        for chunk in chunks:
+            entry.write(chunk)
+            yield chunk
+        entry.commit()
+    finally:
+        entry.abort()
+        chunks.close()
+
+
+def evict_parse_cache(max_bytes: int = PARSE_CACHE_MAX_BYTES) -> None:
+    """Delete the least recently used entries until the cache fits ``max_bytes``."""
+    if not PARSE_CACHE_DIR.exists():
+        return
+    entries = []
+    for path in PARSE_CACHE_DIR.glob("*/*"):
+        if path.suffix not in (".parquet", ".pkl"):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def iter_required_chunks_cached(
+    excel_file: Path,
+    required_columns: Dict[str, List[str]],
+    column_dtypes: Optional[Dict[str, Any]] = None,
+    chunk_size: int = EXCEL_CHUNK_SIZE,
+) -> Tuple[Dict[str, str], Iterator[pd.DataFrame]]:
+    """``iter_required_chunks`` backed by a content-hash cache of parsed chunks.
+
+    The chunks are keyed by field name (``column_mapping`` maps each field to
+    itself), so cached and freshly parsed chunks look the same to the
+    pipelines. A miss stores the chunks as the caller reads them and
+    publishes the entry once the last one is read. A cache hit costs one
+    hash of the file plus one cache read. Each chunk's ``attrs`` keep the
+    ``excel_engine`` that parsed the workbook, cached or not, and say in
+    ``parse_cache_hit`` whether it came from the cache.
+    """
+    key = _cache_key(file_content_hash(excel_file), required_columns, column_dtypes)
+    column_mapping = {field: field for field in required_columns}
+    cached = iter_cached_chunks(key, chunk_size)
+    if cached is not None:
+        return column_mapping, _cache_hit(cached, True)
+
+    parsed_mapping, parsed = iter_required_chunks(
+        excel_file, required_columns, column_dtypes, chunk_size
+    )
+    return column_mapping, _cache_hit(_caching(key, _by_field(parsed, parsed_mapping)), False)
+
+
+def _cache_hit(chunks: Iterator[pd.DataFrame], hit: bool) -> Iterator[pd.DataFrame]:
+    try:
+        for chunk in chunks:
+            chunk.attrs["parse_cache_hit"] = hit
+            yield chunk
+    finally:
+        chunks.close()
+
+
+def _by_field(
+    chunks: Iterator[pd.DataFrame], column_mapping: Dict[str, str]
+) -> Iterator[pd.DataFrame]:
+    try:
+        for parsed in chunks:
+            chunk = pd.DataFrame(
+                {field: parsed[column] for field, column in column_mapping.items()},
+                index=parsed.index,
+            )
+            chunk.attrs["excel_engine"] = parsed.attrs.get("excel_engine")
+            yield chunk
+    finally:
+        chunks.close()
+
+
+def read_required_columns_cached(
+    excel_file: Path,
+    required_columns: Dict[str, List[str]],
+    column_dtypes: Optional[Dict[str, Any]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Like ``iter_required_chunks_cached``, with the chunks in one frame."""
+    column_mapping, chunks = iter_required_chunks_cached(
+        excel_file, required_columns, column_dtypes
+    )
+    return concat_chunks(list(chunks)), column_mapping
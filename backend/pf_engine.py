@@ -0,0 +1,82 @@
+from datetime import date
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from rate_tables import rates_for_dates
+from rounding import round_half_up_days
+
+# Column order of the ECR Excel and "#~#" text outputs
+PF_OUTPUT_COLUMNS = [
+    "UAN No",
+    "MEMBER NAME",
+    "GROSS WAGES",
+    "EPF Wages",
+    "EPS Wages",
+    "EDLI WAGES",
+    "EPF CONTRI REMITTED",
+    "EPS CONTRI REMITTED",
+    "EPF EPS DIFF REMITTED",
+    "NCP DAYS",
+    "REFUND OF ADVANCES",
+]
+
+
+def build_pf_ecr(
+    df: pd.DataFrame,
+    column_mapping: Optional[Dict[str, str]] = None,
+    uan_no: Optional[pd.Series] = None,
+    ncp_days: Optional[pd.Series] = None,
+    wage_dates: Union[date, pd.Series, None] = None,
+) -> pd.DataFrame:
+    """Compute the ECR rows for a column-projected PF frame.
+
+    ``column_mapping`` maps the PF fields ("UAN No", "Employee Name",
+    "Gross Wages", "EPF Wages", "LOP Days") to columns of ``df``; by default
+    ``df`` is keyed by the field names. ``uan_no`` and ``ncp_days`` replace
+    the default normalisation (dashes stripped from the UAN, LOP rounded half
+    up) for callers that format those columns differently.
+
+    Rates and the EPS/EDLI ceiling come from the PF rate table for
+    ``wage_dates``: the wage period of the whole file, or a per-row Series
+    when the rows span several periods. Defaults to today's rates.
+    """
+    column_mapping = column_mapping or {}
+
+    def column(field: str) -> pd.Series:
+        return df[column_mapping.get(field, field)]
+
+    if uan_no is None:
+        uan_no = column("UAN No").astype(str).str.replace("-", "")
+    if ncp_days is None:
+        ncp_days = round_half_up_days(column("LOP Days"))
+    gross_wages = column("Gross Wages").fillna(0).round().astype(int)
+    epf_wages = column("EPF Wages").fillna(0).round().astype(int)
+
+    rates = rates_for_dates(
+        "pf", date.today() if wage_dates is None else wage_dates, df.index
+    )
+    # Wages above the ceiling are capped, zero or negative wages count as 0
+    eps_wages = np.minimum(epf_wages.clip(lower=0), rates["wage_ceiling"])
+    edli_wages = eps_wages.copy()
+    epf_contrib_remitted = (epf_wages * rates["epf_rate"]).round().astype(int)
+    eps_contrib_remitted = (eps_wages * rates["eps_rate"]).round().astype(int)
+    epf_eps_diff_remitted = (epf_contrib_remitted - eps_contrib_remitted).astype(int)
+
+    return pd.DataFrame(
+        {
+            "UAN No": uan_no,
+            "MEMBER NAME": column("Employee Name"),
+            "GROSS WAGES": gross_wages,
+            "EPF Wages": epf_wages,
+            "EPS Wages": eps_wages,
+            "EDLI WAGES": edli_wages,
+            "EPF CONTRI REMITTED": epf_contrib_remitted,
+            "EPS CONTRI REMITTED": eps_contrib_remitted,
+            "EPF EPS DIFF REMITTED": epf_eps_diff_remitted,
+            "NCP DAYS": ncp_days,
+            "REFUND OF ADVANCES": 0,
+        },
+        columns=PF_OUTPUT_COLUMNS,
+    )
@@ -0,0 +1,223 @@
+import concurrent.futures
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from dashboard_cache import invalidate_dashboard
+from models import ProcessedFileESI, ProcessedFilePF, ProcessingJob, SessionLocal
+from schemas import FileProcessResult
+from ecr_store import commit_store_fragment, discard_store_fragment
+from folder_manifest import FolderManifest
+from file_processing import convert_esi_workbook, convert_pf_workbook
+from worker_pool import WorkerBatch
+
+# scheme -> (worker, record model, excel output root, text output root).
+# Jobs write to the same folders as /process_folder_pf and /esi_upload so the
+# existing download and batch zip endpoints serve their outputs.
+JOB_SCHEMES = {
+    "pf": (
+        convert_pf_workbook,
+        ProcessedFilePF,
+        Path("processed_excels_pf_new"),
+        Path("processed_texts_pf_new"),
+    ),
+    "esi": (
+        convert_esi_workbook,
+        ProcessedFileESI,
+        Path("processed_excels_esi_new"),
+        Path("processed_texts_esi_new"),
+    ),
+}
+
+
+def create_processing_job(
+    db: Session,
+    scheme: str,
+    user_id: int,
+    folder_path: str,
+    upload_date: date,
+    incremental: bool = False,
+) -> ProcessingJob:
+    job = ProcessingJob(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        scheme=scheme,
+        folder_path=folder_path,
+        upload_date=upload_date,
+        incremental=incremental,
+        status="queued",
+        results=[],
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _record_for_result(model, file_result: dict, excel_file: Path, job: ProcessingJob):
+    if file_result["status"] == "success":
+        record = model(
+            user_id=job.user_id,
+            filename=excel_file.name,
+            filepath=",".join(file_result["output_files"]),
+            status="success",
+            message="File processed successfully.",
+            upload_date=job.upload_date,
+            excel_engine=file_result["excel_engine"],
+            rejected_rows=file_result["rejected_rows"],
+        )
+        if file_result.get("totals") is not None:
+            record.totals = file_result["totals"]
+        return record
+    return model(
+        user_id=job.user_id,
+        filename=excel_file.name,
+        filepath=str(excel_file),
+        status="error",
+        message=file_result["message"],
+    )
+
+
+def _append_result(db: Session, job: ProcessingJob, result: FileProcessResult) -> None:
+    # Reassign rather than append in place so SQLAlchemy sees the JSON change
+    job.results = list(job.results or []) + [result.model_dump(mode="json")]
+    job.processed_files = len(job.results)
+    db.commit()
+
+
+def run_processing_job(job_id: str, batch: WorkerBatch) -> None:
+    """Convert every workbook of a queued job, persisting progress per file.
+
+    Runs after the POST has returned (FastAPI background task), so it opens
+    its own session instead of using the request's. ``batch`` is the shared
+    pool slot admitted for the job and is released when the job ends.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(ProcessingJob, job_id)
+        if job is None or job.status != "queued":
+            return
+        worker, model, excel_root, text_root = JOB_SCHEMES[job.scheme]
+        job.status = "running"
+        job.started_at = datetime.now()
+        db.commit()
+
+        try:
+            folder = Path(job.folder_path)
+            excel_files = list(folder.glob("*.xls*"))
+            manifest = FolderManifest(job.scheme, folder, job.upload_date)
+            unchanged_records = []
+            if job.incremental:
+                excel_files, unchanged_records = manifest.split_unchanged(
+                    excel_files, db, model, job.user_id
+                )
+            job.total_files = len(excel_files) + len(unchanged_records)
+            db.commit()
+            for record in unchanged_records:
+                _append_result(
+                    db,
+                    job,
+                    FileProcessResult(
+                        file_path=record.filepath,
+                        status=record.status,
+                        message="File unchanged since last run; existing output reused.",
+                        upload_date=record.upload_date,
+                        excel_engine=record.excel_engine,
+                        record_id=record.id,
+                        totals=getattr(record, "totals", None),
+                        rejected_rows=record.rejected_rows,
+                    ),
+                )
+
+            date_folder_name = job.upload_date.strftime("%Y-%m-%d")
+            excel_output_dir = excel_root / date_folder_name
+            text_output_dir = text_root / date_folder_name
+            excel_output_dir.mkdir(parents=True, exist_ok=True)
+            text_output_dir.mkdir(parents=True, exist_ok=True)
+
+            has_errors = False
+            with batch:
+                future_to_file = {
+                    batch.submit(
+                        worker, file, excel_output_dir, text_output_dir, job.upload_date
+                    ): file
+                    for file in excel_files
+                }
+                for future in concurrent.futures.as_completed(future_to_file):
+                    excel_file = future_to_file[future]
+                    try:
+                        file_result = future.result()
+                    except Exception as e:
+                        file_result = {
+                            "file_path": str(excel_file),
+                            "status": "error",
+                            "message": f"Error processing file {excel_file.name}: {str(e)}",
+                            "output_files": None,
+                            "excel_engine": None,
+                        }
+                    # Each file is committed as it finishes so GET /jobs/{id}
+                    # reports progress and a crash keeps the finished files
+                    db_record = _record_for_result(model, file_result, excel_file, job)
+                    try:
+                        db.add(db_record)
+                        db.flush()
+                        if file_result["status"] == "success":
+                            manifest.mark_processed(excel_file, db_record.id)
+                        else:
+                            has_errors = True
+                        _append_result(
+                            db,
+                            job,
+                            FileProcessResult(
+                                file_path=file_result["file_path"],
+                                status=file_result["status"],
+                                message=file_result["message"],
+                                upload_date=job.upload_date,
+                                excel_engine=file_result["excel_engine"],
+                                parse_cache_hit=file_result.get("parse_cache_hit"),
+                                excel_write=file_result.get("excel_write"),
+                                record_id=db_record.id,
+                                totals=file_result.get("totals"),
+                                rejected_rows=file_result.get("rejected_rows"),
+                                rejects_file=file_result.get("rejects_file"),
+                            ),
+                        )
+                    except Exception:
+                        discard_store_fragment(file_result.get("store_fragment"))
+                        raise
+                    commit_store_fragment(file_result.get("store_fragment"), db_record.id)
+            manifest.save()
+
+            job.status = "done"
+            job.message = (
+                "Some files had errors during processing."
+                if has_errors
+                else "All files processed successfully."
+            )
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.message = f"Unexpected error processing folder: {str(e)}"
+        job.finished_at = datetime.now()
+        db.commit()
+        invalidate_dashboard(job.user_id)
+    finally:
+        batch.close()
+        db.close()
+
+
+def fail_interrupted_jobs(db: Session) -> int:
+    """Mark jobs left queued or running by a previous server process as failed."""
+    interrupted = (
+        db.query(ProcessingJob)
+        .filter(ProcessingJob.status.in_(["queued", "running"]))
+        .all()
+    )
+    for job in interrupted:
+        job.status = "failed"
+        job.message = "Job interrupted by a server restart; submit the folder again."
+        job.finished_at = datetime.now()
+    db.commit()
+    return len(interrupted)
@@ -0,0 +1,58 @@
+import json
+import os
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+# Statutory PF/ESI rates and wage ceilings by effective date. Each entry applies
+# from its effective_from date until the next entry of the same scheme starts.
+RATE_TABLES_PATH = Path(
+    os.environ.get("RATE_TABLES_PATH", Path(__file__).with_name("rate_tables.json"))
+)
+
+
+@lru_cache(maxsize=None)
+def load_rate_tables(path: Path = RATE_TABLES_PATH) -> Dict[str, pd.DataFrame]:
+    """Read the rate file once per process: scheme -> periods sorted by start date."""
+    with open(path) as f:
+        raw = json.load(f)
+    tables = {}
+    for scheme, periods in raw.items():
+        table = pd.DataFrame(periods)
+        table["effective_from"] = pd.to_datetime(table["effective_from"])
+        table = table.sort_values("effective_from", ignore_index=True)
+        if table["effective_from"].duplicated().any():
+            raise ValueError(f"Duplicate effective_from dates in the {scheme} rate table")
+        tables[scheme] = table
+    return tables
+
+
+def rates_for_dates(
+    scheme: str, dates: Union[date, pd.Series], index: pd.Index = None
+) -> pd.DataFrame:
+    """Return the rates in effect on each date, one row per date.
+
+    ``dates`` is a single wage-period date applied to every row of ``index``,
+    or a Series of per-row dates (a batch spanning several rate periods). Each
+    date is mapped to its period with one ``searchsorted`` over the table.
+    """
+    table = load_rate_tables()[scheme]
+    if isinstance(dates, pd.Series):
+        index = dates.index
+        wanted = pd.to_datetime(dates).to_numpy(dtype="datetime64[D]")
+    else:
+        wanted = np.full(len(index), np.datetime64(dates, "D"))
+    if np.isnat(wanted).any():
+        raise ValueError(f"Missing wage period date for {scheme.upper()} rates")
+    starts = table["effective_from"].to_numpy(dtype="datetime64[D]")
+    positions = np.searchsorted(starts, wanted, side="right") - 1
+    if (positions < 0).any():
+        first_missing = wanted[positions < 0].min()
+        raise ValueError(f"No {scheme.upper()} rates in effect on {first_missing}")
+    rates = table.drop(columns="effective_from").iloc[positions]
+    rates.index = index
+    return rates
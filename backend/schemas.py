@@ -81,6 +81,45 @@ class FileProcessResult(BaseModel):
     status: str
     message: str
     upload_date: Optional[date] = None
+    excel_engine: Optional[str] = None
+    # Whether the parsed workbook was reused from the parse cache
+    parse_cache_hit: Optional[bool] = None
+    # Output workbook engine, write seconds and traced peak memory
+    excel_write: Optional[Dict[str, Any]] = None
+    record_id: Optional[int] = None
+    totals: Optional[Dict[str, Any]] = None
+    rejected_rows: Optional[int] = None
+    rejects_file: Optional[str] = None
+    # UANs found in more than one file of the batch, with their file and row
+    duplicate_uans: Optional[List[Dict[str, Any]]] = None
+    # Files left out of the duplicate UAN check (no UAN index, or unreadable)
+    duplicate_check_skipped: Optional[List[str]] = None
+    manifest_file: Optional[str] = None
+    # Single ECR merged from every successful file of the batch, if requested
+    consolidated: Optional["FileProcessResult"] = None
+    files: Optional[List["FileProcessResult"]] = None
+
+
+class ProcessingJobResponse(BaseModel):
+    id: str
+    scheme: str
+    folder_path: str
+    upload_date: date
+    status: str
+    message: Optional[str] = None
+    total_files: int = 0
+    processed_files: int = 0
+    results: List[FileProcessResult] = []
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @validator("results", pre=True)
+    def handle_none_results(cls, v):
+        return v if v is not None else []
+
+    class Config:
+        from_attributes = True
 
 
 class ProcessedFileResponse(BaseModel):
@@ -94,6 +133,9 @@ class ProcessedFileResponse(BaseModel):
     remittance_submitted: bool = False
     remittance_date: Optional[date] = None
     remittance_challan_path: Optional[str] = None
+    excel_engine: Optional[str] = None
+    totals: Optional[Dict[str, Any]] = None
+    rejected_rows: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -105,6 +147,22 @@ class ProcessedFileResponse(BaseModel):
         from_attributes = True
 
 
+class ConsolidatedFileResponse(BaseModel):
+    id: int
+    user_id: int
+    filename: str
+    filepath: str
+    manifest_file: Optional[str] = None
+    message: str
+    upload_date: Optional[date] = None
+    source_files: Optional[int] = None
+    employees: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class DashboardStats(BaseModel):
     total_files: int
     success_files: int
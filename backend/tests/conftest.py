@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The backend modules are imported flat, as the app and the benchmarks do
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
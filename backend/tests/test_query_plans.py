@@ -0,0 +1,139 @@
+"""The processed-file listing and dashboard queries must not scan a whole table.
+
+The tables are not filled: sqlite_stat1 is written by hand so that the
+planner costs every query as if processed_files_pf, processed_files_esi and
+consolidated_files_pf each held 1M rows. The plans are then those of a
+database of that size, whatever the rows actually present.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from file_queries import (
+    consolidation_sources,
+    processed_files_for_date,
+    recent_processed_files,
+    top_users_query,
+)
+from models import (
+    Base,
+    ConsolidatedFilePF,
+    ProcessedFileESI,
+    ProcessedFilePF,
+    UserModel,
+    migrate_schema,
+)
+
+ROWS = 1_000_000
+USERS = 200
+# Distinct values per column at ROWS rows: three years of uploads, two statuses
+DISTINCT = {"user_id": USERS, "upload_date": 3 * 365, "status": 2}
+SCANNED_TABLES = ("processed_files_pf", "processed_files_esi", "consolidated_files_pf")
+
+
+def _index_stat(rows: int, columns) -> str:
+    # "rows, then the average rows per value of each leading column prefix"
+    stat, distinct = [rows], 1
+    for column in columns:
+        distinct *= DISTINCT.get(column, rows)
+        stat.append(max(1, rows // distinct))
+    return " ".join(map(str, stat))
+
+
+def _simulate_scale(connection) -> None:
+    connection.execute(text("ANALYZE"))
+    connection.execute(text("DELETE FROM sqlite_stat1"))
+    sizes = {table: ROWS for table in SCANNED_TABLES}
+    sizes[UserModel.__tablename__] = USERS
+    for table, rows in sizes.items():
+        connection.execute(
+            text("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (:tbl, NULL, :stat)"),
+            {"tbl": table, "stat": str(rows)},
+        )
+        for index in Base.metadata.tables[table].indexes:
+            connection.execute(
+                text("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (:tbl, :idx, :stat)"),
+                {
+                    "tbl": table,
+                    "idx": index.name,
+                    "stat": _index_stat(rows, [column.name for column in index.columns]),
+                },
+            )
+    # Reload the statistics into the planner
+    connection.execute(text("ANALYZE sqlite_schema"))
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    migrate_schema(engine)
+    with engine.begin() as connection:
+        _simulate_scale(connection)
+    yield engine
+    engine.dispose()
+
+
+def _queries(db: Session):
+    upload_date, user_id, year = date(2024, 3, 1), 7, 2024
+    for model in (ProcessedFilePF, ProcessedFileESI, ConsolidatedFilePF):
+        name = model.__tablename__
+        yield f"{name} listing for a user", processed_files_for_date(
+            db, model, upload_date, user_id
+        )
+        yield f"{name} listing for an admin", processed_files_for_date(db, model, upload_date)
+    for model in (ProcessedFilePF, ProcessedFileESI):
+        name = model.__tablename__
+        yield f"{name} dashboard recent for a user", recent_processed_files(db, model, user_id)
+        for owner in (user_id, None):
+            yield (
+                f"{name} dashboard recent in {year}, user={owner}",
+                recent_processed_files(db, model, owner, year),
+            )
+    yield "consolidation sources", consolidation_sources(db, upload_date, user_id)
+
+
+def _plan(engine, query):
+    sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def _scans(plan, allow_covering_index: bool = False):
+    return [
+        step
+        for step in plan
+        if step.startswith("SCAN ")
+        and step.split()[1] in SCANNED_TABLES
+        and not (allow_covering_index and "USING COVERING INDEX" in step)
+    ]
+
+
+def test_listing_and_dashboard_queries_search_an_index(engine):
+    with Session(engine) as db:
+        queries = list(_queries(db))
+    failures = {
+        label: plan for label, query in queries if _scans(plan := _plan(engine, query))
+    }
+    assert not failures, failures
+
+
+@pytest.mark.parametrize("model", [ProcessedFilePF, ProcessedFileESI])
+def test_admin_recent_files_stop_after_the_limit(engine, model):
+    # With no filter at all the newest rows are read in created_at order
+    # from the index, stopping after five, with no sort of the whole table
+    with Session(engine) as db:
+        plan = _plan(engine, recent_processed_files(db, model))
+    table = model.__tablename__
+    assert plan == [f"SCAN {table} USING INDEX ix_{table}_created"], plan
+
+
+def test_top_users_reads_only_the_user_index(engine):
+    # Counting every user's files reads every row; it must do so from the
+    # (user_id, created_at) index and never from the table itself
+    with Session(engine) as db:
+        plan = _plan(engine, top_users_query(db))
+    assert not _scans(plan, allow_covering_index=True), plan
+    assert any("USING COVERING INDEX" in step for step in plan), plan
@@ -0,0 +1,89 @@
+"""rounding.round_half_up_days must match the per-cell custom_round it replaced.
+
+Every case compares the vectorised result with ``Series.apply(custom_round)``
+exactly, value and dtype.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rounding import round_half_up_days
+
+
+def custom_round(x):
+    # The function previously defined inline in each pipeline
+    if pd.isna(x):
+        return 0
+    decimal_part = x - int(x)
+    if decimal_part >= 0.5:
+        return math.ceil(x)
+    else:
+        return math.floor(x)
+
+
+def assert_matches_custom_round(series: pd.Series) -> None:
+    expected = series.apply(custom_round)
+    if expected.dtype != "int64":
+        # apply() keeps an all-blank float column as float
+        expected = expected.astype("int64")
+    pd.testing.assert_series_equal(round_half_up_days(series), expected)
+
+
+def random_days(rng: np.random.Generator, rows: int) -> pd.Series:
+    kind = rng.integers(0, 6, rows)
+    values = np.select(
+        [kind == 0, kind == 1, kind == 2, kind == 3, kind == 4],
+        [
+            rng.integers(-40, 40, rows) + 0.5,  # exact halves, both signs
+            rng.integers(0, 31, rows).astype(float),  # whole days
+            rng.uniform(-31, 31, rows).round(rng.integers(1, 4)),  # typed decimals
+            rng.uniform(-1e12, 1e12, rows),  # large values
+            np.nextafter(rng.integers(0, 31, rows) + 0.5, 0),  # just below a half
+        ],
+        default=np.nan,  # blanks
+    )
+    return pd.Series(values, name="LOP Days")
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_inputs(seed):
+    assert_matches_custom_round(random_days(np.random.default_rng(seed), 1000))
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [np.nan] * 5,
+        [np.nan, 1.5, np.nan, 2.0],
+        [np.nan, -0.5, None],
+    ],
+    ids=["all-blank", "some-blank", "blank-and-none"],
+)
+def test_blanks(values):
+    assert_matches_custom_round(pd.Series(values, dtype="float64"))
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [-0.4, -0.5, -0.6, -1.0, -1.5, -2.5],
+        [-1e12 - 0.5, -31.25, -0.0],
+    ],
+    ids=["small", "large"],
+)
+def test_negatives(values):
+    assert_matches_custom_round(pd.Series(values))
+
+
+def test_half_boundaries():
+    halves = np.arange(-10, 31) + 0.5
+    values = np.concatenate(
+        [halves, np.nextafter(halves, -np.inf), np.nextafter(halves, np.inf)]
+    )
+    assert_matches_custom_round(pd.Series(values))
+
+
+def test_integer_column():
+    assert_matches_custom_round(pd.Series([0, 3, -2, 7], dtype="int64"))
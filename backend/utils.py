@@ -37,7 +37,7 @@ def decode_access_token(token: str) -> dict:
 
 
 # Dependency to get the current user
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UserModel:
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UserModel:
     try:
         payload = decode_access_token(token)
         username: str = payload.get("sub")
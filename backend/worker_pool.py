@@ -0,0 +1,322 @@
+import concurrent.futures
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from file_processing import (
+    PROCESSING_EXECUTOR,
+    PROCESSING_WORKERS,
+    make_processing_executor,
+)
+
+# A batch is one folder run (a request to a concurrent endpoint or a job).
+# At most POOL_MAX_BATCHES may be admitted at once across all users, and at most
+# POOL_MAX_BATCHES_PER_USER for any one user; the rest are refused immediately.
+POOL_MAX_BATCHES = int(os.environ.get("POOL_MAX_BATCHES", 8))
+POOL_MAX_BATCHES_PER_USER = int(os.environ.get("POOL_MAX_BATCHES_PER_USER", 2))
+# Tasks waiting for a worker, counting those reserved by admitted batches but
+# not submitted yet. A batch is refused if its tasks would not fit.
+POOL_MAX_QUEUED_TASKS = int(os.environ.get("POOL_MAX_QUEUED_TASKS", 2000))
+POOL_MAX_QUEUED_TASKS_PER_USER = int(os.environ.get("POOL_MAX_QUEUED_TASKS_PER_USER", 500))
+
+
+class PoolSaturatedError(Exception):
+    """Raised when a batch cannot be admitted; maps to a 429/503 response."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class WorkerBatch:
+    """Handle for the workbooks of one folder run; use as a context manager.
+
+    ``reserved`` queue slots were set aside for the batch when it was
+    admitted; submitting past them raises ``PoolSaturatedError`` if the
+    queue is full.
+    """
+
+    def __init__(self, pool: "SharedWorkerPool", user_id: int, reserved: int = 0):
+        self._pool = pool
+        self.user_id = user_id
+        self.reserved = reserved
+        self._futures = []
+        self._closed = False
+
+    def submit(self, fn: Callable, *args: Any) -> concurrent.futures.Future:
+        future = self._pool._enqueue(self.user_id, fn, args, reserved=self.reserved > 0)
+        self.reserved = max(0, self.reserved - 1)
+        self._futures.append(future)
+        return future
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        # Tasks still waiting for a worker are dropped if the caller bailed out
+        for future in self._futures:
+            future.cancel()
+        self._pool._close_batch(self.user_id, self.reserved)
+        self.reserved = 0
+
+    def __enter__(self) -> "WorkerBatch":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SharedWorkerPool:
+    """One executor for the lifetime of the app, shared by every folder run.
+
+    At most ``max_workers`` workbooks run at a time. Waiting workbooks are kept
+    in one queue per user and handed to the executor round-robin as workers
+    free up, so a 300-file folder does not hold up a colleague's 5-file
+    folder until it is done. The queues are bounded by ``max_queued`` and
+    ``max_queued_per_user``.
+
+    If a worker process dies (out of memory, a crash in a native Excel
+    engine) the executor is broken for good: the workbooks it was running
+    fail, and it is replaced by a fresh one for everything still queued.
+    """
+
+    def __init__(
+        self,
+        kind: str = PROCESSING_EXECUTOR,
+        max_workers: int = PROCESSING_WORKERS,
+        max_batches: int = POOL_MAX_BATCHES,
+        max_batches_per_user: int = POOL_MAX_BATCHES_PER_USER,
+        max_queued: int = POOL_MAX_QUEUED_TASKS,
+        max_queued_per_user: int = POOL_MAX_QUEUED_TASKS_PER_USER,
+    ):
+        self._kind = kind
+        self._executor = make_processing_executor(kind, max_workers)
+        self.max_workers = max_workers
+        self.max_batches = max_batches
+        self.max_batches_per_user = max_batches_per_user
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self._lock = threading.Lock()
+        self._open_batches: Dict[int, int] = {}
+        # Queue slots set aside for admitted batches, per user
+        self._reserved: Dict[int, int] = {}
+        self._queues: "OrderedDict[int, Deque[Tuple[concurrent.futures.Future, Callable, tuple]]]" = OrderedDict()
+        self._running = 0
+        # Moving average of seconds per workbook, used for the Retry-After hint
+        self._avg_task_seconds = 5.0
+        self._closed = False
+
+    def open_batch(self, user_id: int, tasks: int = 0) -> WorkerBatch:
+        """Admit a batch that will submit up to ``tasks`` tasks, or refuse it."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Worker pool is shut down")
+            if tasks > self.max_queued_per_user:
+                raise PoolSaturatedError(
+                    f"This folder needs {tasks} tasks; at most {self.max_queued_per_user} "
+                    "can be queued per user. Split it into smaller folders.",
+                    429,
+                    self._retry_after_locked(),
+                )
+            if self._open_batches.get(user_id, 0) >= self.max_batches_per_user:
+                raise PoolSaturatedError(
+                    f"You already have {self.max_batches_per_user} folders processing; "
+                    "wait for one to finish.",
+                    429,
+                    self._retry_after_locked(),
+                )
+            if sum(self._open_batches.values()) >= self.max_batches:
+                raise PoolSaturatedError(
+                    "The server is busy processing other folders; try again shortly.",
+                    503,
+                    self._retry_after_locked(),
+                )
+            self._check_queue_locked(user_id, tasks)
+            self._open_batches[user_id] = self._open_batches.get(user_id, 0) + 1
+            if tasks:
+                self._reserved[user_id] = self._reserved.get(user_id, 0) + tasks
+        return WorkerBatch(self, user_id, tasks)
+
+    def _close_batch(self, user_id: int, unused_reservation: int = 0) -> None:
+        with self._lock:
+            remaining = self._open_batches.get(user_id, 0) - 1
+            if remaining > 0:
+                self._open_batches[user_id] = remaining
+            else:
+                self._open_batches.pop(user_id, None)
+            self._release_locked(user_id, unused_reservation)
+            # Drop the tasks the batch cancelled so they stop counting against the cap
+            queue = self._queues.get(user_id)
+            if queue:
+                queue = deque(item for item in queue if not item[0].cancelled())
+                if queue:
+                    self._queues[user_id] = queue
+                else:
+                    del self._queues[user_id]
+
+    def _release_locked(self, user_id: int, tasks: int) -> None:
+        reserved = self._reserved.get(user_id, 0) - tasks
+        if reserved > 0:
+            self._reserved[user_id] = reserved
+        else:
+            self._reserved.pop(user_id, None)
+
+    def _queued_locked(self, user_id: Optional[int] = None) -> int:
+        if user_id is None:
+            return sum(len(queue) for queue in self._queues.values()) + sum(
+                self._reserved.values()
+            )
+        return len(self._queues.get(user_id, ())) + self._reserved.get(user_id, 0)
+
+    def _check_queue_locked(self, user_id: int, tasks: int) -> None:
+        if self._queued_locked(user_id) + tasks > self.max_queued_per_user:
+            raise PoolSaturatedError(
+                f"You already have {self._queued_locked(user_id)} workbooks waiting; "
+                "wait for some to finish.",
+                429,
+                self._retry_after_locked(),
+            )
+        if self._queued_locked() + tasks > self.max_queued:
+            raise PoolSaturatedError(
+                "The server is busy processing other folders; try again shortly.",
+                503,
+                self._retry_after_locked(),
+            )
+
+    def _retry_after_locked(self) -> int:
+        backlog = self._running + self._queued_locked()
+        return max(1, math.ceil(backlog * self._avg_task_seconds / self.max_workers))
+
+    def _enqueue(
+        self, user_id: int, fn: Callable, args: tuple, reserved: bool = False
+    ) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Worker pool is shut down")
+            if reserved:
+                # The slot moves from the batch's reservation to the queue
+                self._release_locked(user_id, 1)
+            else:
+                self._check_queue_locked(user_id, 1)
+            self._queues.setdefault(user_id, deque()).append((future, fn, args))
+        self._dispatch()
+        return future
+
+    def _dispatch(self) -> None:
+        while True:
+            with self._lock:
+                if self._closed or self._running >= self.max_workers or not self._queues:
+                    return
+                user_id, queue = next(iter(self._queues.items()))
+                future, fn, args = queue.popleft()
+                # The user goes to the back of the line after each dispatched task
+                if queue:
+                    self._queues.move_to_end(user_id)
+                else:
+                    del self._queues[user_id]
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._running += 1
+            # Submit outside the lock: the executor may run callbacks inline
+            started = time.monotonic()
+            try:
+                inner, executor = self._submit(fn, args)
+            except Exception as e:
+                with self._lock:
+                    self._running -= 1
+                future.set_exception(e)
+                continue
+            inner.add_done_callback(
+                lambda inner, future=future, started=started, executor=executor: (
+                    self._task_done(inner, future, started, executor)
+                )
+            )
+
+    def _submit(self, fn: Callable, args: tuple):
+        with self._lock:
+            executor = self._executor
+        try:
+            return executor.submit(fn, *args), executor
+        except BrokenProcessPool:
+            # Broken by a task that has not reported back yet; this one never
+            # started, so it goes to the replacement
+            self._replace_executor(executor)
+            with self._lock:
+                executor = self._executor
+            return executor.submit(fn, *args), executor
+
+    def _task_done(
+        self,
+        inner: concurrent.futures.Future,
+        future: concurrent.futures.Future,
+        started: float,
+        executor: concurrent.futures.Executor,
+    ) -> None:
+        with self._lock:
+            self._running -= 1
+            elapsed = time.monotonic() - started
+            self._avg_task_seconds = 0.8 * self._avg_task_seconds + 0.2 * elapsed
+        if inner.cancelled():
+            future.set_exception(concurrent.futures.CancelledError())
+        elif inner.exception() is not None:
+            if isinstance(inner.exception(), BrokenProcessPool):
+                self._replace_executor(executor)
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+        self._dispatch()
+
+    def _replace_executor(self, broken: concurrent.futures.Executor) -> None:
+        """Swap in a new executor for ``broken``, once however many tasks report it."""
+        with self._lock:
+            if self._closed or self._executor is not broken:
+                return
+            self._executor = make_processing_executor(self._kind, self.max_workers)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "reserved": sum(self._reserved.values()),
+                "max_queued": self.max_queued,
+                "open_batches": dict(self._open_batches),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            self._closed = True
+            queued = [item for queue in self._queues.values() for item in queue]
+            self._queues.clear()
+        for future, _, _ in queued:
+            future.cancel()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_worker_pool: Optional[SharedWorkerPool] = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> SharedWorkerPool:
+    """Return the app-wide pool, creating it on first use."""
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = SharedWorkerPool()
+        return _worker_pool
+
+
+def shutdown_worker_pool(wait: bool = True) -> None:
+    global _worker_pool
+    with _worker_pool_lock:
+        pool, _worker_pool = _worker_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)